@@ -0,0 +1,8 @@
+from api import admin, auth, consulta, documents, solicitudes, tramites
+
+# Blueprints de la API (todas las rutas cuelgan de /api)
+BLUEPRINTS = (auth.bp, solicitudes.bp, tramites.bp, documents.bp, consulta.bp, admin.bp)
+
+def register_blueprints(app):
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
@@ -0,0 +1,55 @@
+import datetime
+
+import jwt
+from flask import Blueprint, current_app
+
+import table_versions
+from api.auth import password_hasher, token_cache
+from api.consulta import consulta_cache
+from background import change_feed_reader
+from extensions import db
+from models import TableVersion, User
+from serializers import jsonify
+
+bp = Blueprint('admin', __name__, url_prefix='/api')
+
+# Ruta para reiniciar la base de datos (solo para pruebas)
+@bp.route('/reset_db', methods=['GET'])
+def reset_db():
+    try:
+        # Borrar todas las tablas
+        db.drop_all()
+        
+        # Recrear todas las tablas
+        db.create_all()
+        table_versions.seed(db.session.connection(), TableVersion.__table__)
+        token_cache.clear()
+        consulta_cache.clear()
+        change_feed_reader.reset()
+        
+        # Crear un usuario de prueba
+        hashed_password = password_hasher.hash('password')
+        test_user = User(
+            name='Usuario de Prueba',
+            email='test@example.com',
+            password=hashed_password
+        )
+        db.session.add(test_user)
+        db.session.commit()
+        
+        # Generar un token para este usuario
+        token = jwt.encode({
+            'user_id': test_user.id,
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+        }, current_app.config['SECRET_KEY'], algorithm="HS256")
+        
+        return jsonify({
+            'message': 'Base de datos reiniciada correctamente',
+            'test_user': {
+                'email': 'test@example.com',
+                'password': 'password',
+                'token': token
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'Error al reiniciar la base de datos: {str(e)}'}), 500
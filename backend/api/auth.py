@@ -0,0 +1,210 @@
+import datetime
+import logging
+import os
+import time
+from functools import wraps
+
+
+import jwt
+from flask import Blueprint, current_app, request
+from sqlalchemy import event
+
+import metrics
+import passwords
+import response_cache
+from auth_cache import CachedUser, TokenCache
+from extensions import db
+from models import User
+from serializers import jsonify
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('auth', __name__, url_prefix='/api')
+
+# Función auxiliar para verificar token desde parámetro de consulta o header
+def get_token_from_request():
+    # Primero intentar desde el header de Authorization
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    
+    # Si no está en el header, intentar desde parámetros de consulta
+    return request.args.get('token')
+
+# Caché de tokens verificados para no consultar User en cada petición autenticada.
+# La invalidación es local a cada proceso; entre workers el TTL acota la antigüedad de los datos
+token_cache = TokenCache(
+    max_size=int(os.environ.get('AUTH_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('AUTH_CACHE_TTL', 60))
+)
+
+metrics.registry.callback_gauge('auth_token_cache_hit_ratio', 'Proporción de aciertos de la caché de tokens',
+                                lambda: token_cache.stats()['hit_rate'])
+metrics.registry.callback_gauge('auth_token_cache_entries', 'Entradas en la caché de tokens',
+                                lambda: token_cache.stats()['size'])
+
+# Hash de contraseñas en un pool acotado (ver passwords.py)
+password_hasher = passwords.hasher_from_env()
+
+metrics.registry.callback_gauge('password_hash_waiting', 'Peticiones esperando hueco en el pool de hash',
+                                lambda: password_hasher.stats()['waiting'])
+
+# Límites de intentos por IP y por email. Se comprueban antes de buscar al usuario
+# y de calcular ningún hash, así que rechazar una ráfaga no cuesta CPU
+login_ip_limiter = response_cache.rate_limiter_from_env('login_ip', limit=20, window=60)
+login_email_limiter = response_cache.rate_limiter_from_env('login_email', limit=10, window=300)
+
+def throttled(*checks):
+    # checks: (limitador, clave); devuelve la respuesta 429 o None
+    for limiter, key in checks:
+        try:
+            allowed, retry_after = limiter.hit(key)
+        except Exception:
+            logger.exception("Error en el límite de intentos de acceso; se permite la petición")
+            continue
+        if not allowed:
+            metrics.RATE_LIMITED.inc(route=metrics.current_route())
+            response = jsonify({'message': 'Demasiados intentos. Inténtelo de nuevo más tarde'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+    return None
+
+def hasher_busy():
+    response = jsonify({'message': 'Servidor ocupado. Inténtelo de nuevo en unos segundos'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, int(password_hasher.queue_timeout)))
+    return response
+
+# Invalidación explícita cuando cambian o se eliminan los datos de un usuario
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
+
+# Verifica el token de la petición y devuelve (usuario, None) o (None, respuesta de error)
+def authenticate_request():
+    token = get_token_from_request()
+
+    if not token:
+        return None, (jsonify({'message': 'Token no proporcionado'}), 401)
+
+    current_user = token_cache.get(token)
+    if current_user is not None:
+        return current_user, None
+
+    try:
+        started = time.perf_counter()
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        metrics.JWT_DECODE_DURATION.observe(time.perf_counter() - started)
+        user = User.query.filter_by(id=data['user_id']).first()
+        if not user:
+            raise Exception('Usuario no encontrado')
+    except Exception as e:
+        return None, (jsonify({'message': f'Token inválido: {str(e)}'}), 401)
+
+    current_user = CachedUser(id=user.id, name=user.name, email=user.email)
+    token_cache.set(token, current_user, token_exp=data.get('exp'))
+    return current_user, None
+
+# Decorador para validar token (modificado para soportar query params)
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = authenticate_request()
+        if error:
+            return error
+
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+# Rutas de autenticación
+@bp.route('/register', methods=['POST'])
+def register():
+    data = request.json
+
+    limited = throttled((login_ip_limiter, request.remote_addr or '-'))
+    if limited:
+        return limited
+
+    # Validar que se proporcione la clave secreta
+    if not data or not data.get('clave_secreta') or data.get('clave_secreta') != 'Workana2025':
+        return jsonify({'message': 'Clave secreta incorrecta'}), 403
+
+    # Validar que se proporcionen los datos necesarios
+    if not data.get('name') or not data.get('email') or not data.get('password'):
+        return jsonify({'message': 'Faltan datos requeridos'}), 400
+
+    # Verificar si el correo ya está registrado
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({'message': 'Este correo ya está registrado'}), 400
+
+    # Crear nuevo usuario
+    try:
+        hashed_password = password_hasher.hash(data['password'])
+    except passwords.HasherBusy:
+        return hasher_busy()
+    new_user = User(
+        name=data['name'],
+        email=data['email'],
+        password=hashed_password
+    )
+    db.session.add(new_user)
+    db.session.commit()
+
+    return jsonify({'message': 'Usuario registrado exitosamente'}), 201
+
+@bp.route('/login', methods=['POST'])
+def login():
+    data = request.json
+
+    if not data or not data.get('email') or not data.get('password'):
+        return jsonify({'message': 'Faltan datos requeridos'}), 400
+
+    limited = throttled((login_ip_limiter, request.remote_addr or '-'),
+                        (login_email_limiter, data['email'].strip().lower()))
+    if limited:
+        return limited
+
+    user = User.query.filter_by(email=data['email']).first()
+
+    if not user:
+        return jsonify({'message': 'Credenciales inválidas'}), 401
+
+    try:
+        if not password_hasher.verify(user.password, data['password']):
+            return jsonify({'message': 'Credenciales inválidas'}), 401
+    except passwords.HasherBusy:
+        return hasher_busy()
+
+    # Si el hash se generó con otro método o coste (PASSWORD_HASH_METHOD), se
+    # recalcula ahora que se conoce la contraseña. Si el pool está lleno se deja
+    # para el próximo inicio de sesión
+    if password_hasher.needs_rehash(user.password):
+        try:
+            user.password = password_hasher.hash(data['password'])
+            db.session.commit()
+        except passwords.HasherBusy:
+            logger.info("Pool de hash ocupado; se pospone la actualización del hash del usuario %s", user.id)
+
+    # Generar token JWT
+    token = jwt.encode({
+        'user_id': user.id,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+    return jsonify({'token': token}), 200
+
+@bp.route('/user', methods=['GET'])
+@token_required
+def get_user_info(current_user):
+    return jsonify({
+        'id': current_user.id,
+        'name': current_user.name,
+        'email': current_user.email
+    }), 200
+
+# Estadísticas de la caché de autenticación
+@bp.route('/auth/cache', methods=['GET'])
+@token_required
+def auth_cache_stats(current_user):
+    return jsonify(token_cache.stats()), 200
@@ -0,0 +1,133 @@
+import logging
+
+from flask import Blueprint, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+import metrics
+import response_cache
+from extensions import db
+from models import Tramite, TramiteArchivado
+from serializers import jsonify
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('consulta', __name__, url_prefix='/api')
+
+# Caché de la consulta pública por (tipo, valor) y límite de consultas por IP.
+# Con RESPONSE_CACHE_URL ambos se comparten entre workers (ver response_cache.py)
+consulta_cache = response_cache.cache_from_env('consulta')
+consulta_limiter = response_cache.rate_limiter_from_env('consulta')
+
+def consulta_cache_keys(tramite):
+    # Claves de caché que pueden contener el trámite, con los valores actuales y anteriores
+    state = inspect(tramite)
+    keys = set()
+    for tipo, attr in (('expediente', 'numeroExpediente'), ('email', 'email')):
+        history = state.attrs[attr].history
+        for value in (getattr(tramite, attr),) + tuple(history.deleted or ()):
+            if value:
+                keys.add((tipo, str(value)))
+    return keys
+
+# Las claves afectadas se recogen al hacer flush y se invalidan tras el commit, para
+# que una consulta concurrente no vuelva a cachear los datos anteriores al cambio
+@event.listens_for(Tramite, 'after_insert')
+@event.listens_for(Tramite, 'after_update')
+@event.listens_for(Tramite, 'after_delete')
+def collect_consulta_keys(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('consulta_keys', set()).update(consulta_cache_keys(target))
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_consulta_cache(session):
+    # Con RESPONSE_CACHE_URL el borrado llega a todos los workers; con la caché
+    # local solo a este (los demás dependen del TTL, ver response_cache.cache_from_env)
+    keys = session.info.pop('consulta_keys', None)
+    if keys:
+        try:
+            consulta_cache.delete(*keys)
+        except Exception:
+            logger.exception("No se pudo invalidar la caché de consultas")
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_consulta_keys(session):
+    session.info.pop('consulta_keys', None)
+
+def consulta_response(body, status, cache_status):
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['X-Cache'] = cache_status
+    return response
+
+def consulta_body(tramite):
+    return {
+        'id': tramite.id,
+        'numeroExpediente': tramite.numeroExpediente,
+        'tipo': tramite.tipo,
+        'nombreCliente': tramite.nombreCliente,
+        'email': tramite.email,
+        'cups': tramite.cups,
+        'direccion': tramite.direccion,
+        'estado': tramite.estado,
+        'fechaCreacion': tramite.fecha.strftime('%Y-%m-%d'),
+        'comentarios': 'Su expediente está siendo procesado por nuestro equipo' if tramite.estado == 'Pendiente' else 'Su expediente ha sido completado satisfactoriamente'
+    }
+
+# Ruta pública para consultar expedientes
+@bp.route('/expedientes/consulta', methods=['GET'])
+def consultar_expediente():
+    # El límite se comprueba antes que nada para que una ráfaga no llegue a la base de datos
+    try:
+        allowed, retry_after = consulta_limiter.hit(request.remote_addr or '-')
+    except Exception:
+        logger.exception("Error en el límite de consultas; se permite la petición")
+        allowed, retry_after = True, 0
+    if not allowed:
+        metrics.RATE_LIMITED.inc(route=metrics.current_route())
+        response = jsonify({'message': 'Demasiadas consultas. Inténtelo de nuevo en unos segundos'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    tipo = request.args.get('tipo')
+    valor = request.args.get('valor')
+    
+    if not tipo or not valor:
+        return jsonify({'message': 'Se requieren los parámetros tipo y valor'}), 400
+    
+    if tipo not in ['expediente', 'email']:
+        return jsonify({'message': 'El tipo debe ser expediente o email'}), 400
+    
+    key = (tipo, valor)
+    try:
+        cached = consulta_cache.get(key)
+    except Exception:
+        logger.exception("Error al leer la caché de consultas")
+        cached = None
+    metrics.CONSULTA_CACHE.inc(result='hit' if cached is not None else 'miss')
+    if cached is not None:
+        return consulta_response(cached['body'], cached['status'], 'HIT')
+
+    try:
+        # Buscar por número de expediente o por email; si no está entre los trámites
+        # activos, en los archivados (ver archive.py)
+        field = 'numeroExpediente' if tipo == 'expediente' else 'email'
+        tramite = Tramite.query.filter_by(**{field: valor}).first()
+        if not tramite:
+            tramite = TramiteArchivado.query.filter_by(**{field: valor}).first()
+        
+        if not tramite:
+            # También se cachea el "no encontrado"; se invalida al crear el trámite
+            body, status = {'message': 'No se encontró ningún expediente con los datos proporcionados'}, 404
+        else:
+            body, status = consulta_body(tramite), 200
+    except Exception as e:
+        return jsonify({'message': f'Error al consultar el expediente: {str(e)}'}), 500
+
+    try:
+        consulta_cache.set(key, {'body': body, 'status': status})
+    except Exception:
+        logger.exception("Error al guardar en la caché de consultas")
+    return consulta_response(body, status, 'MISS')
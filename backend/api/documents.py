@@ -0,0 +1,159 @@
+import os
+import time
+
+from flask import Blueprint, Response, current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+import config
+import file_refs
+import metrics
+from api.auth import token_required
+from extensions import db, upload_store
+from models import FILE_REFERENCE_SOURCES, Document, DocumentFile
+from serializers import jsonify
+
+bp = Blueprint('documents', __name__, url_prefix='/api')
+
+ALLOWED_EXTENSIONS = {'pdf'}
+
+# Función para verificar extensiones permitidas
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+# Función para guardar archivo y obtener el nombre con el que se referencia
+def save_file(file):
+    if file and allowed_file(file.filename):
+        filename = secure_filename(file.filename)
+        # El nombre incluye el hash del contenido, así que no hay colisiones
+        started = time.perf_counter()
+        stored = upload_store.save(file, filename)
+        metrics.UPLOAD_SAVE_DURATION.observe(time.perf_counter() - started)
+        metrics.UPLOAD_BYTES.inc(stored.size, deduplicated=stored.deduplicated)
+        metrics.UPLOAD_FILES.inc(deduplicated=stored.deduplicated)
+        return stored.name
+    return None
+
+# Los documentos subidos no cambian nunca (su nombre depende del contenido), así que
+# se cachean en el navegador con un ETag fuerte basado en el SHA-256
+DOCUMENTS_MAX_AGE = int(os.environ.get('DOCUMENTS_MAX_AGE', 365 * 24 * 3600))
+# '' (Flask envía los bytes), 'x-sendfile' (Apache/lighttpd) o 'x-accel-redirect' (nginx)
+DOCUMENTS_SENDFILE = os.environ.get('DOCUMENTS_SENDFILE', '').lower()
+DOCUMENTS_ACCEL_PREFIX = os.environ.get('DOCUMENTS_ACCEL_PREFIX', '/protected-uploads/')
+
+def send_document(filename, as_attachment=False):
+    relative = upload_store.relative_path(filename)
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], relative)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    etag = upload_store.digest(relative)
+    download_name = upload_store.download_name(filename)
+
+    if DOCUMENTS_SENDFILE in ('x-sendfile', 'x-accel-redirect'):
+        # El proxy sirve los bytes (y los rangos); aquí solo se resuelven los 304
+        response = Response(mimetype='application/pdf')
+        response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline',
+                             filename=download_name)
+        response.set_etag(etag)
+        response.last_modified = os.path.getmtime(path)
+        response = response.make_conditional(request)
+        if response.status_code == 200:
+            if DOCUMENTS_SENDFILE == 'x-sendfile':
+                response.headers['X-Sendfile'] = path
+            else:
+                response.headers['X-Accel-Redirect'] = DOCUMENTS_ACCEL_PREFIX + relative.replace(os.sep, '/')
+    else:
+        # send_file gestiona If-None-Match/If-Modified-Since (304) y Range (206)
+        response = send_from_directory(
+            current_app.config['UPLOAD_FOLDER'],
+            relative,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            etag=etag,
+            conditional=True
+        )
+        # El visor PDF del navegador solo pide rangos si la respuesta completa lo anuncia
+        response.headers.setdefault('Accept-Ranges', 'bytes')
+
+    response.cache_control.no_cache = None
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = DOCUMENTS_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+# Rutas para obtener documentos
+@bp.route('/documents/<filename>', methods=['GET'])
+@token_required
+def get_document(current_user, filename):
+    try:
+        return send_document(filename)
+    except RequestedRangeNotSatisfiable:
+        raise
+    except Exception as e:
+        return jsonify({'message': f'Error al obtener el documento: {str(e)}'}), 404
+
+@bp.route('/documents/download/<filename>', methods=['GET'])
+@token_required
+def download_document(current_user, filename):
+    try:
+        return send_document(filename, as_attachment=True)
+    except RequestedRangeNotSatisfiable:
+        raise
+    except Exception as e:
+        return jsonify({'message': f'Error al descargar el documento: {str(e)}'}), 404
+
+# Metadatos del análisis de un documento; ?texto=1 incluye el texto extraído
+@bp.route('/documents/<filename>/info', methods=['GET'])
+@token_required
+def get_document_info(current_user, filename):
+    document = Document.query.filter_by(nombre=filename).first()
+    if document is None:
+        return jsonify({'message': 'Documento no encontrado'}), 404
+    info = {
+        'nombre': document.nombre,
+        'estado': document.estado,
+        'tamano': document.tamano,
+        'paginas': document.paginas,
+        'miniatura': f'/api/documents/{document.nombre}/thumbnail' if document.miniatura else None,
+        'error': document.error,
+        'procesado': document.processed_at.strftime('%Y-%m-%d %H:%M:%S') if document.processed_at else None
+    }
+    if request.args.get('texto', '').lower() in ('1', 'true'):
+        info['texto'] = document.texto
+    return jsonify(info), 200
+
+# Miniatura de la primera página para el listado del panel. Depende solo del contenido
+# del PDF, así que se cachea como los documentos
+@bp.route('/documents/<filename>/thumbnail', methods=['GET'])
+@token_required
+def get_document_thumbnail(current_user, filename):
+    document = Document.query.filter_by(nombre=filename).first()
+    if document is None or not document.miniatura:
+        estado = document.estado if document is not None else None
+        return jsonify({'message': 'Miniatura no disponible', 'estado': estado}), 404
+    response = send_from_directory(config.THUMBNAIL_FOLDER, document.miniatura, mimetype='image/png',
+                                   etag=document.digest, conditional=True)
+    response.cache_control.no_cache = None
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = DOCUMENTS_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+# Espacio que ocupan los documentos del usuario por tipo de trámite (bytes lógicos:
+# un PDF adjunto a dos trámites cuenta dos veces). El informe global lo da clean_uploads.py --report
+@bp.route('/documents/storage', methods=['GET'])
+@token_required
+def get_storage_usage(current_user):
+    report = file_refs.usage_report(db.session.connection(), DocumentFile.__table__, FILE_REFERENCE_SOURCES,
+                                    upload_store, user_id=current_user.id)
+    tipos = {entry['tipo']: {'documentos': entry['documentos'], 'bytes': entry['bytes']}
+             for entry in report['usuarios']}
+    return jsonify({
+        'tipos': tipos,
+        'documentos': sum(entry['documentos'] for entry in tipos.values()),
+        'bytes': sum(entry['bytes'] for entry in tipos.values())
+    }), 200
@@ -0,0 +1,49 @@
+from flask import Blueprint, request
+
+import table_versions
+from api.auth import token_required
+from extensions import db
+from models import SOLICITUD_LIST_COLUMNS, SOLICITUD_SERIALIZER, Solicitud, TableVersion
+from serializers import jsonify
+
+bp = Blueprint('solicitudes', __name__, url_prefix='/api')
+
+# Rutas para solicitudes
+@bp.route('/solicitudes', methods=['POST'])
+@token_required
+def create_solicitud(current_user):
+    data = request.json
+
+    # Validar que se proporcionen los datos necesarios
+    if not data or not data.get('titulo') or not data.get('descripcion') or not data.get('tipoTramite'):
+        return jsonify({'message': 'Faltan datos requeridos'}), 400
+
+    # Crear nueva solicitud
+    new_solicitud = Solicitud(
+        titulo=data['titulo'],
+        descripcion=data['descripcion'],
+        tipoTramite=data['tipoTramite'],
+        documentoAdjunto=data.get('documentoAdjunto', ''),
+        user_id=current_user.id
+    )
+    db.session.add(new_solicitud)
+    db.session.commit()
+
+    return jsonify({'message': 'Solicitud creada exitosamente', 'id': new_solicitud.id}), 201
+
+@bp.route('/solicitudes', methods=['GET'])
+@token_required
+def get_solicitudes(current_user):
+    # Si la tabla no ha cambiado desde el ETag del cliente, 304 sin consultar las solicitudes
+    etag, last_modified = table_versions.list_validators(
+        db.session.connection(), TableVersion.__table__, 'solicitud', request, current_user.id)
+    if etag and table_versions.not_modified(request, etag):
+        return table_versions.not_modified_response(etag, last_modified)
+
+    # Solo las columnas que se devuelven, sin crear objetos ORM
+    solicitudes = (Solicitud.query.filter_by(user_id=current_user.id)
+                   .with_entities(*SOLICITUD_LIST_COLUMNS))
+    response = jsonify(SOLICITUD_SERIALIZER.many(solicitudes))
+    if etag:
+        table_versions.set_validators(response, etag, last_modified)
+    return response, 200
@@ -0,0 +1,812 @@
+import base64
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+from flask import Blueprint, Response, request, stream_with_context
+from sqlalchemy import and_, or_
+from werkzeug.utils import secure_filename
+
+import change_feed
+import metrics
+import search
+import serializers
+import stats
+import table_versions
+from api.auth import token_required
+from api.consulta import consulta_cache
+from api.documents import allowed_file, save_file
+from background import change_feed_reader, notify_document_processor, notify_outbox, register_documents
+from extensions import db, upload_store
+from models import (ARCHIVED_TRAMITE_LIST_COLUMNS, TRAMITE_LIST_COLUMNS, TRAMITE_SERIALIZER, EmailOutbox, TableVersion,
+                    Tramite, TramiteArchivado, TramiteStat, bump_table_version, record_tramite_event,
+                    reference_files)
+from serializers import jsonify
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('tramites', __name__, url_prefix='/api')
+
+# Campos obligatorios de un trámite (alta individual e importación masiva)
+TRAMITE_REQUIRED_FIELDS = ['tipo', 'nombreCliente', 'dni', 'email', 'telefonoMovil',
+                           'cups', 'direccion', 'refCatastral', 'potenciaNumerica']
+TRAMITE_FILE_FIELDS = ('dniPdf', 'formatoAutorizacion', 'plantillaRelacionPuntos')
+
+def missing_tramite_field(data):
+    for field in TRAMITE_REQUIRED_FIELDS:
+        if field not in data:
+            return field
+    return None
+
+# Valores de las columnas de un trámite nuevo. Siempre incluye las mismas claves
+# para que sirva tanto para el ORM como para inserciones masivas (executemany)
+def tramite_values(data, files_data, user_id):
+    values = {
+        'tipo': data['tipo'],
+        'nombreCliente': data['nombreCliente'],
+        'dni': data['dni'],
+        'email': data['email'],
+        'telefonoMovil': data['telefonoMovil'],
+        'cups': data['cups'],
+        'direccion': data['direccion'],
+        'refCatastral': data['refCatastral'],
+        'potenciaNumerica': data['potenciaNumerica'],
+        'user_id': user_id,
+        # Campos opcionales
+        'numeroExpediente': data.get('numeroExpediente'),
+        'tension': data.get('tension'),
+        # Tipo de formulario general
+        'formulario': data.get('formulario', ''),
+        # Campos específicos según el tipo (motivo)
+        'aumentoPotencia': False,
+        'vivienda': None,
+        'variosSuministros': False,
+        'acometidaCentralizada': False,
+    }
+    
+    if data['tipo'] == 'Modificación':
+        values['aumentoPotencia'] = data.get('aumentoPotencia') == 'true'
+    elif data['tipo'] == 'Individual':
+        values['vivienda'] = data.get('vivienda', '')
+    elif data['tipo'] == 'Alta':
+        values['variosSuministros'] = data.get('variosSuministros') == 'true'
+        values['acometidaCentralizada'] = data.get('acometidaCentralizada') == 'true'
+    
+    # Añadir los archivos
+    for field in TRAMITE_FILE_FIELDS:
+        values[field] = files_data.get(field, '')
+    
+    return values
+
+# Rutas para tramites (formularios)
+@bp.route('/tramites', methods=['POST'])
+@token_required
+def create_tramite(current_user):
+    try:
+        # Comprobar si la solicitud tiene archivos adjuntos
+        if request.files:
+            # Obtener datos del formulario
+            data = {key: request.form.get(key) for key in request.form.keys()}
+            logger.debug("Trámite con archivos, campos del formulario: %s", list(data))
+            
+            # Procesar archivos (DNI, formato de autorización y plantilla de puntos para Alta)
+            files_data = {}
+            for field in TRAMITE_FILE_FIELDS:
+                file = request.files.get(field)
+                if not file or file.filename == '':
+                    continue
+                stored_name = save_file(file)
+                if stored_name:
+                    files_data[field] = stored_name
+                    logger.debug("%s guardado como %s", field, stored_name)
+                else:
+                    logger.warning("No se pudo guardar %s (%s)", field, file.filename)
+        else:
+            # Si no hay archivos, usar el método anterior (solo para compatibilidad)
+            data = request.json
+            files_data = {}
+        
+        # Validar datos básicos
+        missing = missing_tramite_field(data)
+        if missing:
+            return jsonify({'message': f'Falta el campo requerido: {missing}'}), 400
+        
+        new_tramite = Tramite(**tramite_values(data, files_data, current_user.id))
+        
+        db.session.add(new_tramite)
+        register_documents(files_data.values())
+        db.session.commit()
+        if files_data:
+            notify_document_processor()
+        logger.info("Trámite creado", extra={'tramite_id': new_tramite.id, 'tipo': new_tramite.tipo})
+        
+        return jsonify({
+            'message': 'Trámite creado exitosamente',
+            'id': new_tramite.id,
+            'numeroExpediente': new_tramite.numeroExpediente,
+            'documentos': {
+                'dniPdf': new_tramite.dniPdf,
+                'formatoAutorizacion': new_tramite.formatoAutorizacion,
+                'plantillaRelacionPuntos': new_tramite.plantillaRelacionPuntos
+            }
+        }), 201
+    except Exception as e:
+        logger.exception("Excepción en create_tramite")
+        return jsonify({'message': f'Error al crear el trámite: {str(e)}'}), 500
+
+# Importación masiva de trámites
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', 50000))
+IMPORT_MAX_ZIP_MEMBER = 16 * 1024 * 1024
+
+# Lee las filas de un CSV o NDJSON sin cargar el fichero completo en memoria
+def iter_import_rows(stream, formato):
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        for row in csv.DictReader(text_stream):
+            # Las celdas vacías cuentan como campos no enviados
+            yield {key: value for key, value in row.items() if key and value not in (None, '')}
+    else:
+        for line in text_stream:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('cada línea debe ser un objeto JSON')
+            # Mismo formato que el formulario: valores como texto y booleanos como 'true'/'false'
+            yield {key: (str(value).lower() if isinstance(value, bool) else str(value))
+                   for key, value in row.items() if value is not None}
+
+# Guarda (una sola vez) los PDF del ZIP que referencian las filas
+class ImportDocuments:
+    def __init__(self, zip_file):
+        self.zip = zip_file
+        self.stored = {}
+
+    def resolve(self, reference):
+        if reference in self.stored:
+            return self.stored[reference]
+        if self.zip is None:
+            raise ValueError(f'el documento {reference} no está incluido (falta el ZIP)')
+        if not allowed_file(reference):
+            raise ValueError(f'el documento {reference} no es un PDF')
+        try:
+            info = self.zip.getinfo(reference)
+        except KeyError:
+            raise ValueError(f'el documento {reference} no está en el ZIP')
+        if info.file_size > IMPORT_MAX_ZIP_MEMBER:
+            raise ValueError(f'el documento {reference} supera el tamaño máximo')
+        with self.zip.open(info) as member:
+            stored = upload_store.save_stream(member, secure_filename(os.path.basename(reference)))
+        self.stored[reference] = stored.name
+        return stored.name
+
+def insert_tramites_chunk(rows):
+    # Fecha y estado explícitos para poder sumar el bloque a las estadísticas
+    now = datetime.datetime.utcnow()
+    for row in rows:
+        row.setdefault('fecha', now)
+        row.setdefault('estado', Tramite.estado.default.arg)
+    # Una sola sentencia INSERT ejecutada con executemany para todo el bloque
+    db.session.execute(Tramite.__table__.insert(), rows)
+    stats.apply_deltas(db.session.connection(), TramiteStat.__table__, stats.deltas_for_rows(rows))
+    bump_table_version('tramite')
+    # Un único evento por bloque: los paneles recargan el listado
+    record_tramite_event(db.session.connection(), db.session, 'bulk', {'accion': 'import', 'count': len(rows)})
+    names = [row[field] for row in rows for field in TRAMITE_FILE_FIELDS if row.get(field)]
+    reference_files(db.session.connection(), names)
+    register_documents(names)
+
+@bp.route('/tramites/import', methods=['POST'])
+@token_required
+def import_tramites(current_user):
+    upload = request.files.get('file')
+    if not upload or upload.filename == '':
+        return jsonify({'message': 'Falta el fichero de importación (campo file)'}), 400
+
+    formato = (request.form.get('format') or upload.filename.rsplit('.', 1)[-1]).lower()
+    if formato == 'jsonl':
+        formato = 'ndjson'
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'message': 'El formato debe ser csv o ndjson'}), 400
+
+    # atomic=true (por defecto): todas las filas válidas en una sola transacción;
+    # atomic=false: se confirma cada bloque de IMPORT_CHUNK_SIZE filas
+    atomic = request.form.get('atomic', 'true').lower() != 'false'
+
+    zip_file = None
+    documentos = request.files.get('documentos')
+    if documentos and documentos.filename != '':
+        try:
+            zip_file = zipfile.ZipFile(documentos.stream)
+        except zipfile.BadZipFile:
+            return jsonify({'message': 'El fichero de documentos no es un ZIP válido'}), 400
+    documents = ImportDocuments(zip_file)
+
+    results = []
+    # Resultados 'ok' de las filas aún sin confirmar (todas con atomic=true)
+    pending = []
+    chunk = []
+    created = 0
+    try:
+        for row_number, data in enumerate(iter_import_rows(upload.stream, formato), 1):
+            if row_number > IMPORT_MAX_ROWS:
+                # Se descarta lo no confirmado; con atomic=false los bloques ya
+                # confirmados se quedan y la respuesta lo indica fila a fila
+                db.session.rollback()
+                message = f'El fichero supera el máximo de {IMPORT_MAX_ROWS} filas'
+                for result in pending:
+                    result.update(status='error', message=f'No importada: {message.lower()}')
+                committed = created if not atomic else 0
+                if committed:
+                    consulta_cache.clear()
+                    if documents.stored:
+                        notify_document_processor()
+                return jsonify({
+                    'message': message,
+                    'total': len(results),
+                    'created': committed,
+                    'failed': len(results) - committed,
+                    'results': results
+                }), 413
+
+            missing = missing_tramite_field(data)
+            if missing:
+                results.append({'row': row_number, 'status': 'error',
+                                'message': f'Falta el campo requerido: {missing}'})
+                continue
+            try:
+                files_data = {field: documents.resolve(data[field])
+                              for field in TRAMITE_FILE_FIELDS if data.get(field)}
+            except ValueError as e:
+                results.append({'row': row_number, 'status': 'error', 'message': str(e)})
+                continue
+
+            chunk.append(tramite_values(data, files_data, current_user.id))
+            results.append({'row': row_number, 'status': 'ok'})
+            pending.append(results[-1])
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                insert_tramites_chunk(chunk)
+                created += len(chunk)
+                chunk = []
+                if not atomic:
+                    db.session.commit()
+                    pending = []
+
+        if chunk:
+            insert_tramites_chunk(chunk)
+            created += len(chunk)
+        db.session.commit()
+        # Los INSERT masivos no pasan por los eventos del ORM
+        consulta_cache.clear()
+        if documents.stored:
+            notify_document_processor()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'message': f'Fichero de importación no válido: {str(e)}',
+                        'created': created if not atomic else 0}), 400
+    except Exception as e:
+        logger.exception("Excepción en import_tramites")
+        db.session.rollback()
+        return jsonify({'message': f'Error al importar los trámites: {str(e)}',
+                        'created': created if not atomic else 0}), 500
+    finally:
+        if zip_file is not None:
+            zip_file.close()
+
+    logger.info("Importación de trámites completada", extra={'imported': created, 'rows': len(results)})
+    return jsonify({
+        'message': 'Importación completada',
+        'total': len(results),
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), 200
+
+# Parámetros de paginación del listado de trámites
+TRAMITES_PAGE_SIZE = 50
+TRAMITES_MAX_PAGE_SIZE = 500
+TRAMITES_SORTS = ('-fecha', 'fecha', '-id', 'id')
+
+# Interpreta una fecha 'YYYY-MM-DD' o ISO 8601; devuelve (fecha, solo_dia)
+def parse_fecha_param(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d'), True
+    except ValueError:
+        return datetime.datetime.fromisoformat(value), False
+
+# El cursor es opaco para el cliente: base64 de la clave (fecha, id) del último elemento
+def encode_cursor(tramite, sort):
+    key = [tramite.id] if sort.lstrip('-') == 'id' else [tramite.fecha.isoformat(), tramite.id]
+    raw = json.dumps([sort] + key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+        if key[0] != sort:
+            raise ValueError('el cursor no corresponde a la ordenación solicitada')
+        if sort.lstrip('-') == 'id':
+            return None, int(key[1])
+        return datetime.datetime.fromisoformat(key[1]), int(key[2])
+    except ValueError:
+        raise
+    except Exception:
+        raise ValueError('cursor mal formado')
+
+# Aplica los filtros del listado (estado, tipo, formulario, user_id y rango de fechas).
+# model es Tramite o TramiteArchivado (mismas columnas)
+def filter_tramites_query(query, args, model=Tramite):
+    for field in ('estado', 'tipo', 'formulario'):
+        if args.get(field):
+            query = query.filter(getattr(model, field) == args[field])
+    if args.get('user_id'):
+        query = query.filter(model.user_id == int(args['user_id']))
+    if args.get('fecha_desde'):
+        desde, _ = parse_fecha_param(args['fecha_desde'])
+        query = query.filter(model.fecha >= desde)
+    if args.get('fecha_hasta'):
+        hasta, solo_dia = parse_fecha_param(args['fecha_hasta'])
+        if solo_dia:
+            # Una fecha sin hora incluye el día completo
+            query = query.filter(model.fecha < hasta + datetime.timedelta(days=1))
+        else:
+            query = query.filter(model.fecha <= hasta)
+    return query
+
+# Condición de keyset para continuar después de la clave del cursor
+def keyset_condition(sort, fecha, last_id, model=Tramite):
+    descending = sort.startswith('-')
+    if sort.lstrip('-') == 'id':
+        return model.id < last_id if descending else model.id > last_id
+    if descending:
+        return or_(model.fecha < fecha, and_(model.fecha == fecha, model.id < last_id))
+    return or_(model.fecha > fecha, and_(model.fecha == fecha, model.id > last_id))
+
+def order_by_sort(query, sort, model=Tramite):
+    if sort.lstrip('-') == 'id':
+        return query.order_by(model.id.desc() if sort.startswith('-') else model.id.asc())
+    if sort.startswith('-'):
+        return query.order_by(model.fecha.desc(), model.id.desc())
+    return query.order_by(model.fecha.asc(), model.id.asc())
+
+# Listado paginado por keyset: el coste de cada página no depende del tamaño de la tabla.
+# Los metadatos de paginación viajan en cabeceras para mantener el cuerpo como una lista.
+# Con archivo=1 se listan los trámites archivados (ver archive.py) con los mismos filtros
+@bp.route('/tramites', methods=['GET'])
+@token_required
+def get_tramites(current_user):
+    sort = request.args.get('sort', '-fecha')
+    if sort not in TRAMITES_SORTS:
+        return jsonify({'message': f'Ordenación no válida. Opciones: {", ".join(TRAMITES_SORTS)}'}), 400
+
+    try:
+        limit = int(request.args.get('limit', TRAMITES_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'message': 'El parámetro limit debe ser un número entero'}), 400
+    limit = max(1, min(limit, TRAMITES_MAX_PAGE_SIZE))
+
+    archived = request.args.get('archivo', '').lower() in ('1', 'true')
+    model, columns = (TramiteArchivado, ARCHIVED_TRAMITE_LIST_COLUMNS) if archived else (Tramite, TRAMITE_LIST_COLUMNS)
+
+    # Sondeo del panel: si la tabla no ha cambiado, 304 sin ejecutar el listado
+    etag, last_modified = table_versions.list_validators(
+        db.session.connection(), TableVersion.__table__, model.__tablename__, request, current_user.id)
+    if etag and table_versions.not_modified(request, etag):
+        return table_versions.not_modified_response(etag, last_modified)
+
+    try:
+        query = filter_tramites_query(model.query, request.args, model)
+    except ValueError as e:
+        return jsonify({'message': f'Filtro no válido: {str(e)}'}), 400
+
+    # El total es opcional porque COUNT(*) sí recorre todas las filas filtradas
+    total = None
+    if request.args.get('count', '').lower() in ('1', 'true'):
+        total = query.order_by(None).count()
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            fecha, last_id = decode_cursor(cursor, sort)
+        except ValueError as e:
+            return jsonify({'message': f'Cursor no válido: {str(e)}'}), 400
+        query = query.filter(keyset_condition(sort, fecha, last_id, model))
+
+    # Se pide un elemento extra para saber si existe una página siguiente
+    tramites = order_by_sort(query.with_entities(*columns), sort, model).limit(limit + 1).all()
+    has_next = len(tramites) > limit
+    tramites = tramites[:limit]
+
+    response = jsonify(TRAMITE_SERIALIZER.many(tramites))
+    if has_next:
+        next_cursor = encode_cursor(tramites[-1], sort)
+        response.headers['X-Next-Cursor'] = next_cursor
+        next_args = request.args.to_dict()
+        next_args['cursor'] = next_cursor
+        next_args.pop('count', None)
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    if etag:
+        table_versions.set_validators(response, etag, last_modified)
+    return response, 200
+
+# Búsqueda de texto por expediente, DNI, CUPS, referencia catastral, cliente y dirección.
+# Los resultados van por relevancia (o los más recientes primero si la búsqueda es muy
+# genérica, ver search.py) y se paginan con un cursor (posición)
+@bp.route('/tramites/search', methods=['GET'])
+@token_required
+def search_tramites(current_user):
+    terms = search.search_terms(request.args.get('q'))
+    if not terms:
+        return jsonify({'message': 'El parámetro q es obligatorio'}), 400
+
+    try:
+        limit = int(request.args.get('limit', TRAMITES_PAGE_SIZE))
+        offset = int(request.args.get('cursor', 0))
+    except ValueError:
+        return jsonify({'message': 'Los parámetros limit y cursor deben ser números enteros'}), 400
+    limit = max(1, min(limit, TRAMITES_MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    try:
+        query = filter_tramites_query(Tramite.query, request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Filtro no válido: {str(e)}'}), 400
+    dialect_name = db.engine.dialect.name
+    by_rank = dialect_name == 'sqlite' and search.rank_results(db.session, terms)
+    query = search.apply_search(query, Tramite, terms, dialect_name, by_rank)
+
+    total = None
+    if request.args.get('count', '').lower() in ('1', 'true'):
+        total = query.order_by(None).count()
+
+    tramites = query.with_entities(*TRAMITE_LIST_COLUMNS).offset(offset).limit(limit + 1).all()
+    has_next = len(tramites) > limit
+    tramites = tramites[:limit]
+
+    response = jsonify(TRAMITE_SERIALIZER.many(tramites))
+    response.headers['X-Search-Order'] = 'relevancia' if by_rank else 'recientes'
+    if has_next:
+        next_cursor = str(offset + limit)
+        response.headers['X-Next-Cursor'] = next_cursor
+        next_args = request.args.to_dict()
+        next_args['cursor'] = next_cursor
+        next_args.pop('count', None)
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    return response, 200
+
+# Estadísticas del panel: se leen del resumen materializado, sin recorrer tramite.
+# Los trámites archivados se devuelven aparte, con el mismo formato
+@bp.route('/tramites/stats', methods=['GET'])
+@token_required
+def get_tramites_stats(current_user):
+    conn = db.session.connection()
+    summary = stats.read(conn, TramiteStat.__table__)
+    summary['archivados'] = stats.read(conn, TramiteStat.__table__, prefix=stats.ARCHIVE_PREFIX)
+    return jsonify(summary), 200
+
+# Feed de cambios en tiempo real (Server-Sent Events). EventSource no permite cabeceras,
+# así que el token se pasa como ?token=. Cada conexión se cierra tras
+# CHANGE_FEED_MAX_DURATION segundos y el navegador se reconecta solo con Last-Event-ID
+CHANGE_FEED_HEARTBEAT = int(os.environ.get('CHANGE_FEED_HEARTBEAT', 15))
+CHANGE_FEED_MAX_DURATION = int(os.environ.get('CHANGE_FEED_MAX_DURATION', 300))
+CHANGE_FEED_RETRY_MS = 3000
+# Cada conexión ocupa un hilo con workers gthread: el límite evita que el feed deje sin
+# hilos al resto de peticiones (gunicorn.conf.py lo ajusta según el tipo de worker)
+CHANGE_FEED_MAX_CLIENTS = int(os.environ.get('CHANGE_FEED_MAX_CLIENTS', 100))
+
+metrics.registry.callback_gauge('change_feed_clients', 'Conexiones abiertas al feed de cambios',
+                                lambda: change_feed_reader.clients)
+
+def generate_change_events(last_id):
+    change_feed_reader.subscribe()
+    try:
+        yield f'retry: {CHANGE_FEED_RETRY_MS}\n\n'
+        if last_id is None:
+            last_id = change_feed_reader.last_id
+        deadline = time.monotonic() + CHANGE_FEED_MAX_DURATION
+        while time.monotonic() < deadline:
+            events = change_feed_reader.events_since(last_id)
+            if events is None:
+                events = change_feed_reader.replay(last_id)
+            if events is None:
+                # Last-Event-ID anterior a la retención: el cliente debe recargar el listado
+                last_id = change_feed_reader.last_id
+                yield change_feed.format_event(last_id, 'reset', '{}')
+                continue
+            for feed_event in events:
+                yield change_feed.format_event(feed_event.id, feed_event.tipo, feed_event.data)
+                last_id = feed_event.id
+            if not events:
+                timeout = min(CHANGE_FEED_HEARTBEAT, max(0, deadline - time.monotonic()))
+                if not change_feed_reader.wait(last_id, timeout):
+                    # Comentario SSE: mantiene viva la conexión y detecta clientes desconectados
+                    yield ': ping\n\n'
+    finally:
+        change_feed_reader.unsubscribe()
+
+@bp.route('/tramites/events', methods=['GET'])
+@token_required
+def tramite_change_events(current_user):
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'message': 'Last-Event-ID no válido'}), 400
+
+    if change_feed_reader.clients >= CHANGE_FEED_MAX_CLIENTS:
+        metrics.RATE_LIMITED.inc(route=metrics.current_route())
+        response = jsonify({'message': 'Demasiadas conexiones al feed de cambios, inténtelo más tarde'})
+        response.headers['Retry-After'] = str(CHANGE_FEED_RETRY_MS // 1000)
+        return response, 503
+
+    change_feed_reader.start()
+    # El flujo no usa la sesión de la petición: se libera su conexión antes de empezar
+    db.session.remove()
+    response = Response(generate_change_events(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el flujo en su búfer
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Columnas incluidas en la exportación (se seleccionan directamente, sin hidratar objetos ORM)
+EXPORT_COLUMNS = (
+    'id', 'numeroExpediente', 'tipo', 'formulario', 'nombreCliente', 'dni', 'email',
+    'telefonoMovil', 'cups', 'direccion', 'refCatastral', 'tension', 'potenciaNumerica',
+    'fecha', 'estado', 'user_id', 'aumentoPotencia', 'vivienda', 'variosSuministros',
+    'acometidaCentralizada', 'dniPdf', 'formatoAutorizacion', 'plantillaRelacionPuntos'
+)
+EXPORT_BATCH_SIZE = 1000
+
+def export_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+def iter_export_rows(query):
+    # yield_per hace que el cursor del servidor entregue las filas por lotes
+    for row in query.yield_per(EXPORT_BATCH_SIZE):
+        yield [export_value(value) for value in row]
+
+def generate_ndjson(rows):
+    buffer = []
+    for row in rows:
+        buffer.append(serializers.dumps(dict(zip(EXPORT_COLUMNS, row))))
+        if len(buffer) >= EXPORT_BATCH_SIZE:
+            yield b'\n'.join(buffer) + b'\n'
+            buffer = []
+    if buffer:
+        yield b'\n'.join(buffer) + b'\n'
+
+def generate_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    # Se envía la cabecera de inmediato para que el cliente reciba los primeros bytes
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# Exportación en streaming (NDJSON o CSV) con los mismos filtros que el listado
+@bp.route('/tramites/export', methods=['GET'])
+@token_required
+def export_tramites(current_user):
+    formato = request.args.get('format', 'ndjson').lower()
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'message': 'El formato debe ser ndjson o csv'}), 400
+
+    columns = [getattr(Tramite, column) for column in EXPORT_COLUMNS]
+    try:
+        query = filter_tramites_query(db.session.query(*columns), request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Filtro no válido: {str(e)}'}), 400
+    query = query.order_by(Tramite.id.asc())
+
+    rows = iter_export_rows(query)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    if formato == 'csv':
+        body, mimetype = generate_csv(rows), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(rows), 'application/x-ndjson'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=tramites_{timestamp}.{formato}'
+    return response
+
+# Construye el correo de trámite completado para la bandeja de salida
+def completado_email_values(tramite):
+    return dict(
+        tramite_id=tramite.id,
+        to_email=tramite.email,
+        subject=f'Tu trámite #{tramite.numeroExpediente or tramite.id} ha sido completado',
+        html_content=f'''
+        <h2>Estimado/a {tramite.nombreCliente},</h2>
+        <p>Nos complace informarle que su trámite con número de expediente 
+        <strong>{tramite.numeroExpediente or tramite.id}</strong> ha sido completado satisfactoriamente.</p>
+        
+        <h3>Detalles del trámite:</h3>
+        <ul>
+            <li><strong>Tipo de trámite:</strong> {tramite.tipo}</li>
+            <li><strong>CUPS:</strong> {tramite.cups}</li>
+            <li><strong>Dirección:</strong> {tramite.direccion}</li>
+            <li><strong>Fecha de solicitud:</strong> {tramite.fecha.strftime('%d/%m/%Y')}</li>
+        </ul>
+        
+        <p>Si tiene alguna pregunta o necesita más información, no dude en contactarnos.</p>
+        
+        <p>Atentamente,<br>
+        El equipo de gestión de trámites</p>
+        '''
+    )
+
+def build_completado_email(tramite):
+    return EmailOutbox(**completado_email_values(tramite))
+
+@bp.route('/tramites/<int:tramite_id>', methods=['PATCH'])
+@token_required
+def update_tramite_estado(current_user, tramite_id):
+    data = request.json
+    
+    if not data or 'estado' not in data:
+        return jsonify({'message': 'Falta el campo estado'}), 400
+    
+    tramite = Tramite.query.filter_by(id=tramite_id).first()
+    
+    if not tramite:
+        return jsonify({'message': 'Trámite no encontrado o no autorizado'}), 404
+    
+    # Actualizar campos editables si están en el body
+    if 'estado' in data:
+        tramite.estado = data['estado']
+    if 'numeroExpediente' in data:
+        tramite.numeroExpediente = data['numeroExpediente']
+    if 'cups' in data:
+        tramite.cups = data['cups']
+    if 'dni' in data:
+        tramite.dni = data['dni']
+    # Puedes agregar aquí otros campos editables si lo necesitas
+
+    # Si se solicita enviar correo electrónico y el estado es Completado, el correo se
+    # encola en la misma transacción y se envía fuera de la petición
+    email_queued = data.get('enviarCorreo') and tramite.estado == 'Completado'
+    if email_queued:
+        db.session.add(build_completado_email(tramite))
+
+    db.session.commit()
+
+    if email_queued:
+        notify_outbox()
+        return jsonify({
+            'message': 'Estado actualizado correctamente y notificación encolada',
+            'email_queued': True
+        }), 200
+    
+    # Si no se solicitó enviar correo o el estado no es Completado
+    return jsonify({'message': 'Estado actualizado correctamente'}), 200
+
+# Actualización masiva: máximo de IDs por petición y filtros admitidos en lugar de IDs
+BULK_MAX_IDS = 1000
+BULK_FILTER_FIELDS = ('estado', 'tipo', 'formulario', 'user_id', 'fecha_desde', 'fecha_hasta')
+BULK_EMAIL_COLUMNS = (Tramite.id, Tramite.email, Tramite.nombreCliente, Tramite.numeroExpediente,
+                      Tramite.tipo, Tramite.cups, Tramite.direccion, Tramite.fecha)
+
+@bp.route('/tramites/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_tramites(current_user):
+    data = request.json
+
+    if not data or ('estado' not in data and 'numeroExpediente' not in data):
+        return jsonify({'message': 'Falta el campo estado o numeroExpediente'}), 400
+
+    values = {field: data[field] for field in ('estado', 'numeroExpediente') if field in data}
+
+    # Selección por lista de IDs o por filtro (nunca toda la tabla)
+    ids = data.get('ids')
+    filtro = data.get('filtro')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({'message': 'ids debe ser una lista de enteros'}), 400
+        if not ids:
+            return jsonify({'message': 'La lista de ids está vacía'}), 400
+        if len(ids) > BULK_MAX_IDS:
+            return jsonify({'message': f'Se admiten como máximo {BULK_MAX_IDS} ids por petición'}), 400
+        ids = list(dict.fromkeys(ids))
+        query = Tramite.query.filter(Tramite.id.in_(ids))
+    elif isinstance(filtro, dict) and any(filtro.get(field) for field in BULK_FILTER_FIELDS):
+        try:
+            query = filter_tramites_query(Tramite.query, filtro)
+        except ValueError as e:
+            return jsonify({'message': f'Filtro no válido: {str(e)}'}), 400
+    else:
+        return jsonify({'message': f'Indique ids o un filtro con alguno de: {", ".join(BULK_FILTER_FIELDS)}'}), 400
+
+    send_email = bool(data.get('enviarCorreo')) and values.get('estado') == 'Completado'
+
+    try:
+        # Los datos de los correos se leen antes del UPDATE: después el filtro por estado
+        # ya no encontraría las filas. Se les aplican los valores nuevos en memoria.
+        emails = []
+        if send_email:
+            emails = [completado_email_values(SimpleNamespace(**{**row._asdict(), **values}))
+                      for row in query.with_entities(*BULK_EMAIL_COLUMNS)]
+
+        not_found = []
+        found_ids = None
+        if ids is not None:
+            found = {row.id for row in query.with_entities(Tramite.id)}
+            not_found = [i for i in ids if i not in found]
+            found_ids = [i for i in ids if i in found]
+
+        # Estadísticas: un GROUP BY de los estados actuales antes del UPDATE
+        if 'estado' in values:
+            stats.apply_deltas(db.session.connection(), TramiteStat.__table__, stats.group_deltas(
+                db.session.connection(), Tramite.__table__, 'estado', query.whereclause, values['estado']))
+
+        # Un único UPDATE para todas las filas seleccionadas
+        updated = query.update(values, synchronize_session=False)
+        if updated:
+            bump_table_version('tramite')
+            record_tramite_event(db.session.connection(), db.session, 'bulk', {
+                'accion': 'update', 'count': updated, 'ids': found_ids, 'valores': values
+            })
+        # y un único INSERT (executemany) para todas las notificaciones
+        if emails:
+            db.session.execute(EmailOutbox.__table__.insert(), emails)
+        db.session.commit()
+        # El UPDATE masivo no pasa por los eventos del ORM
+        consulta_cache.clear()
+    except Exception as e:
+        logger.exception("Excepción en bulk_update_tramites")
+        db.session.rollback()
+        return jsonify({'message': f'Error al actualizar los trámites: {str(e)}'}), 500
+
+    if emails:
+        notify_outbox()
+
+    logger.info("Actualización masiva de trámites", extra={'updated': updated, 'emails_queued': len(emails)})
+    return jsonify({
+        'message': 'Trámites actualizados correctamente',
+        'updated': updated,
+        'not_found': not_found,
+        'emails_queued': len(emails)
+    }), 200
+
+@bp.route('/tramites/<int:tramite_id>', methods=['DELETE'])
+@token_required
+def delete_tramite(current_user, tramite_id):
+    # Buscar el trámite por ID y asegurarse de que pertenece al usuario actual
+    tramite = Tramite.query.filter_by(id=tramite_id, user_id=current_user.id).first()
+    
+    if not tramite:
+        return jsonify({'message': 'Trámite no encontrado o no autorizado'}), 404
+    
+    try:
+        # Eliminar el trámite
+        db.session.delete(tramite)
+        db.session.commit()
+        return jsonify({'message': 'Trámite eliminado correctamente'}), 200
+    except Exception as e:
+        logger.exception("Excepción al eliminar el trámite %s", tramite_id)
+        db.session.rollback()
+        return jsonify({'message': f'Error al eliminar el trámite: {str(e)}'}), 500
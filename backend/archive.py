@@ -0,0 +1,57 @@
+import os
+
+from sqlalchemy import func, literal, select
+
+import stats
+
+# Archivado de trámites cerrados: los que están en un estado final y son más
+# antiguos que una fecha dada pasan de tramite a tramite_archive por bloques.
+# Cada bloque se mueve en una transacción (INSERT ... SELECT y DELETE por id) y
+# pasa sus filas del resumen de estadísticas de los activos al de los archivados
+# (stats.ARCHIVE_PREFIX); el índice de búsqueda se
+# actualiza solo con los triggers de borrado de tramite (ver search.py).
+
+DEFAULT_ESTADOS = ('Finalizado', 'Completado', 'Anulado')
+
+def estados_from_env():
+    value = os.environ.get('ARCHIVE_ESTADOS')
+    if not value:
+        return DEFAULT_ESTADOS
+    return tuple(estado.strip() for estado in value.split(',') if estado.strip())
+
+def archivable(source, estados, before):
+    return source.c.estado.in_(estados) & (source.c.fecha < before)
+
+def count_candidates(conn, source, estados, before):
+    return conn.execute(select(func.count()).select_from(source)
+                        .where(archivable(source, estados, before))).scalar()
+
+def select_batch(conn, source, estados, before, limit):
+    """Ids de hasta limit trámites archivables (bloqueados hasta el commit en PostgreSQL)."""
+    # Sin ORDER BY: cada bloque borra las filas que devuelve, así que el siguiente
+    # encuentra las restantes sin ordenar todas las candidatas
+    query = select(source.c.id).where(archivable(source, estados, before)).limit(limit).with_for_update()
+    return [row[0] for row in conn.execute(query)]
+
+def move_batch(conn, source, archive, stats_table, ids, estados, before, archived_at):
+    """Copia los trámites ids al archivo y los borra de tramite; devuelve cuántos movió.
+
+    La condición de archivado se repite en cada sentencia por si alguno cambió de
+    estado después de seleccionarlo.
+    """
+    where = source.c.id.in_(ids) & archivable(source, estados, before)
+    rows = [dict(row) for row in conn.execute(
+        select(*(source.c[name] for name in stats.SOURCE_COLUMNS)).where(where)).mappings()]
+    if not rows:
+        return 0
+    columns = [column.name for column in source.columns]
+    conn.execute(archive.insert().from_select(
+        columns + ['archivado_en'],
+        select(*(source.c[name] for name in columns), literal(archived_at, archive.c.archivado_en.type))
+        .where(where)))
+    conn.execute(source.delete().where(where))
+    # Pasan del resumen de los activos al de los archivados
+    deltas = stats.deltas_for_rows(rows, -1)
+    deltas.update(stats.archived(stats.deltas_for_rows(rows)))
+    stats.apply_deltas(conn, stats_table, deltas)
+    return len(rows)
@@ -0,0 +1,65 @@
+# Archiva los trámites cerrados antiguos (ver archive.py). Pensado para ejecutarse
+# periódicamente (cron) junto a la aplicación:
+#   python archive_tramites.py --days 365
+#   python archive_tramites.py --dry-run
+import argparse
+import datetime
+import os
+import time
+
+import archive
+
+def archive_tramites(before, estados, batch_size=500, pause=0.0, log=print):
+    """Mueve por bloques los trámites archivables; devuelve cuántos archivó."""
+    from extensions import db
+    from models import Tramite, TramiteArchivado, TramiteStat, bump_table_version, record_tramite_event
+
+    total = 0
+    while True:
+        conn = db.session.connection()
+        ids = archive.select_batch(conn, Tramite.__table__, estados, before, batch_size)
+        moved = archive.move_batch(conn, Tramite.__table__, TramiteArchivado.__table__, TramiteStat.__table__,
+                                   ids, estados, before, datetime.datetime.utcnow()) if ids else 0
+        if not moved:
+            db.session.rollback()
+            return total
+        bump_table_version('tramite')
+        bump_table_version('tramite_archive')
+        # Un único evento por bloque, como las operaciones masivas: los paneles recargan el listado
+        record_tramite_event(conn, db.session, 'bulk', {'accion': 'archive', 'count': moved, 'ids': ids})
+        db.session.commit()
+        total += moved
+        log(f"{total} trámites archivados")
+        # Pausa entre bloques para no acaparar el escritor de SQLite
+        if pause:
+            time.sleep(pause)
+
+def main():
+    parser = argparse.ArgumentParser(description='Archiva los trámites cerrados antiguos')
+    parser.add_argument('--days', type=int, default=int(os.environ.get('ARCHIVE_AFTER_DAYS', 365)),
+                        help='Antigüedad mínima (por la fecha del trámite)')
+    parser.add_argument('--estados', help='Estados finales separados por comas (por defecto ARCHIVE_ESTADOS)')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('ARCHIVE_BATCH_SIZE', 500)))
+    parser.add_argument('--pause', type=float, default=float(os.environ.get('ARCHIVE_BATCH_PAUSE', 0.1)),
+                        help='Segundos de espera entre bloques')
+    parser.add_argument('--dry-run', action='store_true', help='Solo cuenta los trámites archivables')
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import db
+    from models import Tramite
+
+    estados = tuple(e.strip() for e in args.estados.split(',') if e.strip()) if args.estados \
+        else archive.estados_from_env()
+    before = datetime.datetime.utcnow() - datetime.timedelta(days=args.days)
+    with create_app().app_context():
+        if args.dry_run:
+            count = archive.count_candidates(db.session.connection(), Tramite.__table__, estados, before)
+            print(f"{count} trámites archivables ({', '.join(estados)}, anteriores a {before:%Y-%m-%d})")
+            return
+        started = time.perf_counter()
+        total = archive_tramites(before, estados, args.batch_size, args.pause)
+        print(f"Archivados {total} trámites en {time.perf_counter() - started:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+
+from sqlalchemy import event
+
+import change_feed
+import config
+import document_processing
+import notifications
+from extensions import db, upload_store
+from models import Document, EmailOutbox, TramiteEvent
+from storage import digest_from_name
+
+# Trabajo en segundo plano de cada proceso: feed de cambios, envío de correos y
+# análisis de documentos. Los objetos se crean al importar el módulo pero sus hilos
+# (y el pool de procesos del análisis) solo arrancan con el primer uso, así que un
+# worker que no los necesita no los paga. create_app les asigna la aplicación.
+
+change_feed_reader = change_feed.ChangeFeed(
+    None, db, TramiteEvent.__table__,
+    poll_interval=float(os.environ.get('CHANGE_FEED_POLL_INTERVAL', 1.0)),
+    retention_days=int(os.environ.get('CHANGE_FEED_RETENTION_DAYS', 7))
+)
+
+@event.listens_for(db.session, 'after_commit')
+def wake_change_feed(session):
+    if session.info.pop('change_feed', False):
+        change_feed_reader.wake()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_change_feed_wake(session):
+    session.info.pop('change_feed', None)
+
+# Worker de notificaciones. Con EMAIL_WORKER_MODE=process no se arranca el hilo
+# en los workers web y la cola la vacía un proceso aparte (send_outbox.py)
+outbox_worker = notifications.OutboxWorker(
+    None, db, EmailOutbox,
+    batch_size=int(os.environ.get('EMAIL_BATCH_SIZE', 50)),
+    max_attempts=int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+)
+
+def notify_outbox():
+    if config.EMAIL_WORKER_MODE == 'thread':
+        outbox_worker.start()
+        outbox_worker.wake()
+
+# Procesado de documentos: con DOCUMENT_WORKER_MODE=process lo hace un proceso aparte
+# (process_documents.py). El análisis corre en un pool de DOCUMENT_WORKERS procesos
+document_processor = document_processing.DocumentProcessor(
+    None, db, Document, upload_store, config.THUMBNAIL_FOLDER,
+    workers=int(os.environ.get('DOCUMENT_WORKERS', 2)),
+    task_timeout=int(os.environ.get('DOCUMENT_TIMEOUT', 60)),
+    memory_mb=int(os.environ.get('DOCUMENT_MEMORY_MB', 512))
+)
+
+def register_documents(names):
+    # En la misma transacción que el trámite; el análisis empieza tras el commit
+    document_processing.register(db.session.connection(), Document.__table__, names,
+                                 digest_for=digest_from_name)
+
+def notify_document_processor():
+    if config.DOCUMENT_WORKER_MODE == 'thread':
+        document_processor.start()
+        document_processor.wake()
+
+def init_app(app):
+    change_feed_reader.init_app(app)
+    outbox_worker.init_app(app)
+    document_processor.init_app(app)
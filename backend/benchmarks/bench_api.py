@@ -0,0 +1,261 @@
+"""Benchmark de la API con el cliente de pruebas de Flask y resultados en JSON.
+
+Mide latencia (media, p50, p95, p99) y rendimiento de las rutas principales
+sobre una base de datos con datos sintéticos, sin servidor HTTP de por medio:
+
+- login:             POST /api/login
+- create_tramite:    POST /api/tramites (multipart con un PDF)
+- get_tramites:      GET /api/tramites (primera página y filtrada por estado)
+- update_estado:     PATCH /api/tramites/<id>
+- consulta:          GET /api/expedientes/consulta (por expediente y por email)
+- download:          GET /api/documents/download/<nombre>
+
+Sin --database-uri se genera una base temporal con generate_data.py (--tramites
+filas). Con --database-uri se usa una base ya poblada con generate_data.py y
+la misma --password. Las escrituras modifican la base indicada.
+
+Los resultados se guardan en --output (por defecto benchmarks/results/<fecha>.json).
+Con --compare se comparan con una ejecución anterior y el proceso termina con
+código 1 si alguna ruta empeora su p50 o su rendimiento más de --threshold %.
+
+Uso: python benchmarks/bench_api.py --tramites 10000 --requests 200 --compare benchmarks/results/anterior.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_data import ESTADOS, fake_pdf, generate  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+def measure(send, requests, warmup):
+    """Ejecuta send(i) warmup + requests veces; send devuelve la respuesta."""
+    for i in range(warmup):
+        send(i)
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        start = time.perf_counter()
+        response = send(warmup + i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests, 'errors': errors,
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'rps': round(requests / elapsed, 1),
+    }
+
+def scenarios(app, client, dataset, rnd):
+    """Devuelve [(nombre, send)]; cada send recibe el número de petición."""
+    from extensions import db
+    from models import Tramite
+
+    email = f"usuario{dataset['user_ids'][0]}@example.com"
+    password = dataset['password']
+    response = client.post('/api/login', json={'email': email, 'password': password})
+    if response.status_code != 200:
+        raise SystemExit(f"No se puede iniciar sesión con {email}: {response.get_json()}")
+    headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+    first, last = dataset['tramite_ids']
+    with app.app_context():
+        expedientes = [row[0] for row in db.session.query(Tramite.numeroExpediente)
+                       .filter(Tramite.numeroExpediente.isnot(None)).limit(1000)]
+    documents = dataset['document_names']
+    pdf = fake_pdf('Documento subido en el benchmark')
+    estados = [estado for estado, _ in ESTADOS if estado != 'Completado']
+
+    def create_tramite(i):
+        data = {
+            'tipo': 'Individual', 'formulario': 'Individual', 'nombreCliente': 'Cliente Benchmark',
+            'dni': f'{i:08d}B', 'email': f'benchmark{i}@example.com', 'telefonoMovil': '600000000',
+            'cups': f'ES{i:016d}BN', 'direccion': 'Calle Mayor 1, Madrid', 'refCatastral': f'RC{i}',
+            'tension': '1x230', 'potenciaNumerica': '5.75', 'vivienda': 'Vivienda definitiva',
+            # El mismo contenido con nombres distintos: se deduplica como en producción
+            'dniPdf': (io.BytesIO(pdf), f'dni_{i}.pdf'),
+        }
+        return client.post('/api/tramites', data=data, headers=headers, content_type='multipart/form-data')
+
+    def get_tramites(i):
+        # Sin If-None-Match: se mide el listado completo, no el 304
+        return client.get('/api/tramites', headers=headers)
+
+    def get_tramites_estado(i):
+        return client.get('/api/tramites', query_string={'estado': estados[i % len(estados)]}, headers=headers)
+
+    def update_estado(i):
+        # Nunca 'Completado' para no encolar correos
+        return client.patch(f'/api/tramites/{rnd.randint(first, last)}', json={'estado': estados[i % len(estados)]},
+                            headers=headers)
+
+    def consulta_expediente(i):
+        return client.get('/api/expedientes/consulta',
+                          query_string={'tipo': 'expediente', 'valor': expedientes[i % len(expedientes)]})
+
+    def consulta_email(i):
+        return client.get('/api/expedientes/consulta',
+                          query_string={'tipo': 'email', 'valor': f'cliente{rnd.randint(first, last)}@example.com'})
+
+    def download(i):
+        response = client.get(f'/api/documents/download/{documents[i % len(documents)]}', headers=headers)
+        response.close()
+        return response
+
+    result = [
+        ('login', lambda i: client.post('/api/login', json={'email': email, 'password': password})),
+        ('create_tramite', create_tramite),
+        ('get_tramites', get_tramites),
+        ('get_tramites_estado', get_tramites_estado),
+        ('update_estado', update_estado),
+    ]
+    if expedientes:
+        result.append(('consulta_expediente', consulta_expediente))
+    result.append(('consulta_email', consulta_email))
+    if documents:
+        result.append(('download', download))
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, previous, threshold):
+    """Imprime las diferencias con una ejecución anterior; devuelve las rutas que empeoran."""
+    regressions = []
+    print(f"\nComparación con {previous.get('date')} ({previous.get('commit')}), umbral {threshold} %")
+    print(f"{'ruta':<22} {'p50 antes':>10} {'p50 ahora':>10} {'Δ p50':>8} {'req/s antes':>12} {'req/s ahora':>12} {'Δ req/s':>8}")
+    for name, current in results.items():
+        before = previous.get('results', {}).get(name)
+        if not before:
+            continue
+        p50_delta = (current['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        rps_delta = (current['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0.0
+        worse = p50_delta > threshold or rps_delta < -threshold
+        if worse:
+            regressions.append(name)
+        print(f"{name:<22} {before['p50_ms']:>10.2f} {current['p50_ms']:>10.2f} {p50_delta:>+7.1f}% "
+              f"{before['rps']:>12.1f} {current['rps']:>12.1f} {rps_delta:>+7.1f}%{'  <-- peor' if worse else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri', help='Base ya poblada con generate_data.py (por defecto una temporal)')
+    parser.add_argument('--upload-folder', help='Almacén de documentos de esa base')
+    parser.add_argument('--tramites', type=int, default=10000, help='Trámites de la base temporal')
+    parser.add_argument('--users', type=int, default=100, help='Usuarios de la base temporal')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--requests', type=int, default=200, help='Peticiones medidas por ruta')
+    parser.add_argument('--warmup', type=int, default=20, help='Peticiones previas sin medir por ruta')
+    parser.add_argument('--only', action='append', help='Medir solo esta ruta (se puede repetir)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Fichero JSON de resultados')
+    parser.add_argument('--compare', help='Resultados JSON de una ejecución anterior')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Empeoramiento admitido en %% (p50 y req/s)')
+    args = parser.parse_args()
+
+    if args.database_uri:
+        os.environ['DATABASE_URI'] = args.database_uri
+        if args.upload_folder:
+            os.environ['UPLOAD_FOLDER'] = args.upload_folder
+    else:
+        tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    os.environ['LOG_FILE'] = ''
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Sin trabajo en segundo plano durante la medición (correos, análisis de PDF)
+    os.environ.setdefault('EMAIL_WORKER_MODE', 'process')
+    os.environ.setdefault('DOCUMENT_WORKER_MODE', 'process')
+    # Los límites por IP de la consulta pública y del login cortarían el benchmark
+    for name in ('CONSULTA_RATE_LIMIT', 'LOGIN_IP_RATE_LIMIT', 'LOGIN_EMAIL_RATE_LIMIT'):
+        os.environ.setdefault(name, str(10 ** 9))
+    # Se importa después de fijar el entorno: la configuración se lee al importar
+    from app import create_app
+    from extensions import db
+    from models import Document, Solicitud, Tramite, User, init_schema
+
+    app = create_app()
+    with app.app_context():
+        init_schema()
+
+    if args.database_uri:
+        with app.app_context():
+            users = db.session.query(User.id).filter(User.email.like('usuario%@example.com'))
+            tramites = db.session.query(db.func.min(Tramite.id), db.func.max(Tramite.id)).one()
+            dataset = {
+                'users': users.count(), 'solicitudes': Solicitud.query.count(), 'tramites': Tramite.query.count(),
+                'user_ids': [users.order_by(User.id).first()[0], None], 'tramite_ids': list(tramites),
+                'document_names': [row[0] for row in db.session.query(Document.nombre).limit(200)],
+                'password': args.password,
+            }
+    else:
+        print(f"Generando {args.tramites} trámites en una base temporal...")
+        dataset = generate(app, users=args.users, tramites=args.tramites, password=args.password, seed=args.seed,
+                           log=lambda message: None)
+
+    client = app.test_client()
+    rnd = random.Random(args.seed)
+    results = {}
+    print(f"{'ruta':<22} {'errores':>8} {'media':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}   (ms)")
+    for name, send in scenarios(app, client, dataset, rnd):
+        if args.only and name not in args.only:
+            continue
+        result = measure(send, args.requests, args.warmup)
+        results[name] = result
+        print(f"{name:<22} {result['errors']:>8} {result['mean_ms']:>8.2f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['rps']:>8.1f}")
+
+    report = {
+        'date': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': db.get_engine(app).dialect.name,
+        'dataset': {key: dataset[key] for key in ('users', 'solicitudes', 'tramites')},
+        'config': {'requests': args.requests, 'warmup': args.warmup, 'seed': args.seed},
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.datetime.utcnow().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, args.threshold)
+        if regressions:
+            print(f"\nEmpeoran: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Latencia de las consultas de búsqueda antes y después de los índices.
+
+Crea bases SQLite temporales con el esquema original (sin índices), mide las
+consultas de consultar_expediente, delete_tramite, get_solicitudes y el
+listado paginado, aplica las migraciones de migrate_db.py y repite la medición.
+
+Uso: python benchmarks/bench_lookup_indexes.py --rows 1000 10000 100000
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate_db  # noqa: E402
+
+# Esquema de las tablas tal y como lo creaba db.create_all() antes de los índices
+BASE_SCHEMA = '''
+CREATE TABLE user (
+    id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL UNIQUE, password VARCHAR(100) NOT NULL
+);
+CREATE TABLE solicitud (
+    id INTEGER PRIMARY KEY, titulo VARCHAR(100) NOT NULL, descripcion TEXT NOT NULL,
+    "tipoTramite" VARCHAR(50) NOT NULL, "documentoAdjunto" VARCHAR(200),
+    fecha_creacion DATETIME, user_id INTEGER NOT NULL REFERENCES user (id)
+);
+CREATE TABLE tramite (
+    id INTEGER PRIMARY KEY, "numeroExpediente" VARCHAR(50), tipo VARCHAR(50) NOT NULL,
+    formulario VARCHAR(100), "nombreCliente" VARCHAR(100) NOT NULL, dni VARCHAR(20) NOT NULL,
+    email VARCHAR(100) NOT NULL, "telefonoMovil" VARCHAR(20) NOT NULL, cups VARCHAR(100) NOT NULL,
+    direccion VARCHAR(200) NOT NULL, "refCatastral" VARCHAR(100) NOT NULL, tension VARCHAR(50),
+    "potenciaNumerica" VARCHAR(50) NOT NULL, fecha DATETIME, estado VARCHAR(20),
+    user_id INTEGER NOT NULL REFERENCES user (id), "aumentoPotencia" BOOLEAN, vivienda VARCHAR(50),
+    "variosSuministros" BOOLEAN, "acometidaCentralizada" BOOLEAN, "dniPdf" VARCHAR(200),
+    "formatoAutorizacion" VARCHAR(200), "plantillaRelacionPuntos" VARCHAR(200)
+);
+'''
+
+USERS = 50
+ESTADOS = ['Pendiente de Enviar', 'En trámite Solicitud', 'Gestión de Pago', 'Finalizado', 'Anulado']
+
+QUERIES = {
+    'consulta por expediente': ('SELECT * FROM tramite WHERE "numeroExpediente" = ? LIMIT 1',
+                                lambda n: (f'EXP-{random.randrange(n):07d}',)),
+    'consulta por email': ('SELECT * FROM tramite WHERE email = ? LIMIT 1',
+                           lambda n: (f'cliente{random.randrange(n)}@example.com',)),
+    'borrado (id + user_id)': ('SELECT * FROM tramite WHERE id = ? AND user_id = ?',
+                               lambda n: (random.randrange(1, n + 1), random.randrange(1, USERS + 1))),
+    'solicitudes por usuario': ('SELECT * FROM solicitud WHERE user_id = ?',
+                                lambda n: (random.randrange(1, USERS + 1),)),
+    'página por estado': ('SELECT * FROM tramite WHERE estado = ? ORDER BY fecha DESC, id DESC LIMIT 50',
+                          lambda n: (random.choice(ESTADOS),)),
+}
+
+def populate(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASE_SCHEMA)
+    conn.executemany('INSERT INTO user (id, name, email, password) VALUES (?, ?, ?, ?)',
+                     [(i, f'Usuario {i}', f'usuario{i}@example.com', 'x') for i in range(1, USERS + 1)])
+    inicio = datetime.datetime(2024, 1, 1)
+    conn.executemany(
+        'INSERT INTO tramite ("numeroExpediente", tipo, "nombreCliente", dni, email, "telefonoMovil", '
+        'cups, direccion, "refCatastral", "potenciaNumerica", fecha, estado, user_id) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((f'EXP-{i:07d}', 'Alta', f'Cliente {i}', f'{i:08d}X', f'cliente{i}@example.com', '600000000',
+          f'ES{i:018d}', f'Calle {i}', f'RC{i}', '5.5', inicio + datetime.timedelta(minutes=i),
+          ESTADOS[i % len(ESTADOS)], 1 + i % USERS) for i in range(rows))
+    )
+    conn.executemany(
+        'INSERT INTO solicitud (titulo, descripcion, "tipoTramite", fecha_creacion, user_id) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ((f'Solicitud {i}', 'Descripción', 'Alta', inicio, 1 + i % USERS) for i in range(rows // 10))
+    )
+    conn.commit()
+    conn.close()
+
+def measure(path, rows, repeat):
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        samples = []
+        for _ in range(repeat):
+            args = params(rows)
+            start = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    conn.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'filas':>8}  {'consulta':<26}  {'sin índices (ms)':>16}  {'con índices (ms)':>16}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            populate(path, rows)
+            before = measure(path, rows, args.repeat)
+            migrate_db.migrate_db(f'sqlite:///{path}')
+            after = measure(path, rows, args.repeat)
+        for name in QUERIES:
+            print(f"{rows:>8}  {name:<26}  {before[name]:>16.3f}  {after[name]:>16.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Búsqueda de trámites: LIKE sobre las columnas frente al índice FTS5.
+
+Crea una base SQLite temporal con el esquema de tramite y datos sintéticos,
+mide la primera página (50 resultados) de varias búsquedas con LIKE '%término%'
+sobre todas las columnas y, tras aplicar las migraciones (índice FTS5 de
+search.py), la misma búsqueda con MATCH ordenada como en la API: por bm25 si
+hay pocas coincidencias y por id descendente si la búsqueda es muy genérica.
+
+Uso: python benchmarks/bench_search.py --rows 100000 300000
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate_db  # noqa: E402
+import search  # noqa: E402
+from bench_lookup_indexes import BASE_SCHEMA, USERS  # noqa: E402
+
+NOMBRES = ['José', 'María', 'Antonio', 'Carmen', 'Manuel', 'Lucía', 'Francisco', 'Ana', 'David', 'Laura']
+APELLIDOS = ['García', 'Fernández', 'González', 'Rodríguez', 'López', 'Martínez', 'Sánchez', 'Pérez',
+             'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Álvarez', 'Romero']
+CALLES = ['Calle Mayor', 'Avenida de la Constitución', 'Plaza de España', 'Calle Real', 'Camino Viejo',
+          'Calle del Sol', 'Avenida Andalucía', 'Calle Nueva']
+CIUDADES = ['Madrid', 'Sevilla', 'Valencia', 'Córdoba', 'Granada', 'Málaga', 'Zaragoza', 'Toledo']
+
+# (descripción, texto buscado): desde muy selectivas hasta muy frecuentes
+BUSQUEDAS = [
+    ('expediente exacto', lambda n: f'EXP-{random.randrange(n):07d}'),
+    ('prefijo de CUPS', lambda n: cups(random.randrange(n))[:12]),
+    ('DNI', lambda n: f'{random.randrange(n):08d}'),
+    ('nombre y apellido', lambda n: f'{random.choice(NOMBRES)} {random.choice(APELLIDOS)}'),
+    ('prefijo de apellido', lambda n: random.choice(APELLIDOS)[:4]),
+    ('calle y ciudad', lambda n: f'{random.choice(CALLES).split()[-1]} {random.choice(CIUDADES)}'),
+]
+
+def cups(i):
+    # ES + distribuidora (4 dígitos) + 12 dígitos + 2 letras de control
+    return f'ES{(1, 21, 22, 31)[i % 4]:04d}{(i * 7919) % 10 ** 12:012d}{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}'
+
+def populate(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASE_SCHEMA)
+    conn.executemany('INSERT INTO user (id, name, email, password) VALUES (?, ?, ?, ?)',
+                     [(i, f'Usuario {i}', f'usuario{i}@example.com', 'x') for i in range(1, USERS + 1)])
+    inicio = datetime.datetime(2024, 1, 1)
+    rnd = random.Random(42)
+    conn.executemany(
+        'INSERT INTO tramite ("numeroExpediente", tipo, "nombreCliente", dni, email, "telefonoMovil", '
+        'cups, direccion, "refCatastral", "potenciaNumerica", fecha, estado, user_id) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((f'EXP-{i:07d}', 'Alta',
+          f'{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}',
+          f'{i:08d}X', f'cliente{i}@example.com', '600000000', cups(i),
+          f'{rnd.choice(CALLES)} {rnd.randrange(1, 200)}, {rnd.choice(CIUDADES)}',
+          f'{rnd.randrange(10 ** 13):014d}RC', '5.5', inicio + datetime.timedelta(minutes=i),
+          'Pendiente', 1 + i % USERS) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+def like_query(terms, conn):
+    condition = '(' + ' OR '.join(f'"{name}" LIKE ?' for name in search.FTS_COLUMNS) + ')'
+    sql = (f'SELECT * FROM tramite WHERE {" AND ".join([condition] * len(terms))} '
+           'ORDER BY fecha DESC, id DESC LIMIT 50')
+    return sql, [f'%{term}%' for term in terms for _ in search.FTS_COLUMNS]
+
+def fts_query(terms, conn):
+    fts = search.FTS_TABLE
+    matches = conn.execute(f'SELECT count(*) FROM (SELECT 1 FROM {fts} WHERE {fts} MATCH ? LIMIT ?)',
+                           (search.match_expression(terms), search.RANK_MAX_MATCHES + 1)).fetchone()[0]
+    if matches <= search.RANK_MAX_MATCHES:
+        order = f"bm25({fts}, {', '.join(str(weight) for weight in search.FTS_WEIGHTS)}), tramite.id DESC"
+    else:
+        order = f'{fts}.rowid DESC'
+    sql = (f'SELECT tramite.* FROM tramite JOIN {fts} ON {fts}.rowid = tramite.id '
+           f'WHERE {fts} MATCH ? ORDER BY {order} LIMIT 50')
+    return sql, [search.match_expression(terms)]
+
+def measure(path, rows, repeat, build):
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, make_text in BUSQUEDAS:
+        random.seed(name)
+        samples = []
+        for _ in range(repeat):
+            terms = search.search_terms(make_text(rows))
+            start = time.perf_counter()
+            sql, params = build(terms, conn)
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    conn.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 300000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'filas':>8}  {'búsqueda':<20}  {'LIKE (ms)':>10}  {'FTS5 (ms)':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            populate(path, rows)
+            before = measure(path, rows, args.repeat, like_query)
+            migrate_db.migrate_db(f'sqlite:///{path}')
+            after = measure(path, rows, args.repeat, fts_query)
+        for name, _ in BUSQUEDAS:
+            print(f"{rows:>8}  {name:<20}  {before[name]:>10.3f}  {after[name]:>10.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Coste de serializar el listado de trámites: ORM + dict por fila frente a serializers.py.
+
+Crea una base SQLite temporal con N trámites (de los tres tipos) y mide, por
+cada 10.000 filas, la consulta + construcción de los dicts y la generación del
+JSON en tres variantes:
+
+- orm+json:     objetos ORM, dict construido a mano con strftime y json de Flask
+                (la implementación anterior de get_tramites)
+- columnas+json:   consulta por columnas y RowSerializer, con json estándar
+- columnas+orjson: consulta por columnas y RowSerializer, con orjson
+
+Uso: python benchmarks/bench_serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TIPOS = ('Alta', 'Individual', 'Modificación')
+
+def legacy_tramite_dict(tramite):
+    # Copia de tramite_to_dict tal y como era antes de serializers.py
+    tramite_data = {
+        'id': tramite.id, 'numeroExpediente': tramite.numeroExpediente, 'tipo': tramite.tipo,
+        'formulario': tramite.formulario, 'nombreCliente': tramite.nombreCliente, 'dni': tramite.dni,
+        'email': tramite.email, 'telefonoMovil': tramite.telefonoMovil, 'cups': tramite.cups,
+        'direccion': tramite.direccion, 'refCatastral': tramite.refCatastral, 'tension': tramite.tension,
+        'potenciaNumerica': tramite.potenciaNumerica, 'fecha': tramite.fecha.strftime('%d/%m/%Y'),
+        'estado': tramite.estado, 'dniPdf': tramite.dniPdf, 'formatoAutorizacion': tramite.formatoAutorizacion,
+        'plantillaRelacionPuntos': tramite.plantillaRelacionPuntos
+    }
+    if tramite.tipo == 'Modificación':
+        tramite_data['aumentoPotencia'] = tramite.aumentoPotencia
+    elif tramite.tipo == 'Individual':
+        tramite_data['vivienda'] = tramite.vivienda
+    elif tramite.tipo == 'Alta':
+        tramite_data['variosSuministros'] = tramite.variosSuministros
+        tramite_data['acometidaCentralizada'] = tramite.acometidaCentralizada
+    return tramite_data
+
+def populate(rows):
+    from extensions import db
+    from models import Tramite
+
+    inicio = datetime.datetime(2024, 1, 1)
+    db.session.execute(Tramite.__table__.insert(), [{
+        'numeroExpediente': f'EXP-{i:07d}', 'tipo': TIPOS[i % 3], 'formulario': 'Formulario',
+        'nombreCliente': f'Cliente Ñúñez {i}', 'dni': f'{i:08d}X', 'email': f'cliente{i}@example.com',
+        'telefonoMovil': '600000000', 'cups': f'ES{i:018d}', 'direccion': f'Calle Mayor {i}, Madrid',
+        'refCatastral': f'RC{i}', 'tension': '230V', 'potenciaNumerica': '5.5',
+        'fecha': inicio + datetime.timedelta(minutes=i), 'estado': 'Pendiente', 'user_id': 1,
+        'aumentoPotencia': i % 2 == 0, 'vivienda': 'Habitual', 'variosSuministros': False,
+        'acometidaCentralizada': True, 'dniPdf': f'{i:064x}_dni.pdf'} for i in range(rows)])
+    db.session.commit()
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update({'DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                       'UPLOAD_FOLDER': os.path.join(tmp, 'uploads'), 'LOG_FILE': ''})
+    import serializers
+    from app import create_app
+    from extensions import db
+    from models import TRAMITE_LIST_COLUMNS, TRAMITE_SERIALIZER, Tramite, User, init_schema
+
+    app = create_app()
+    with app.app_context():
+        init_schema()
+        db.session.add(User(id=1, name='Bench', email='bench@example.com', password='x'))
+        db.session.commit()
+        populate(args.rows)
+
+        def flask_json(data):
+            # Equivalente a flask.jsonify en Flask 2.0 (claves ordenadas, separadores compactos)
+            return json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+        # Con JSON_SORT_KEYS=True (por defecto), como serializers.jsonify en la aplicación
+        def orjson_dumps(data):
+            serializers.BACKEND = 'orjson'
+            return serializers.dumps(data, sort_keys=True)
+
+        def std_dumps(data):
+            serializers.BACKEND = 'json'
+            return serializers.dumps(data, sort_keys=True)
+
+        def orm_rows():
+            db.session.expunge_all()
+            return [legacy_tramite_dict(tramite) for tramite in Tramite.query.order_by(Tramite.id).all()]
+
+        def column_rows():
+            query = Tramite.query.with_entities(*TRAMITE_LIST_COLUMNS).order_by(Tramite.id)
+            return TRAMITE_SERIALIZER.many(query)
+
+        variants = [
+            ('orm+json', orm_rows, flask_json),
+            ('columnas+json', column_rows, std_dumps),
+        ]
+        if serializers.orjson is not None:
+            variants.append(('columnas+orjson', column_rows, orjson_dumps))
+
+        scale = 10000 / args.rows
+        print(f"{'variante':<16} {'consulta+dicts':>15} {'JSON':>8} {'total':>8} {'filas/s':>10}   (ms por 10.000 filas)")
+        for name, build, dump in variants:
+            build_ms, data = timed(build, args.repeat)
+            dump_ms, body = timed(lambda: dump(data), args.repeat)
+            total = build_ms + dump_ms
+            print(f"{name:<16} {build_ms * scale:>15.1f} {dump_ms * scale:>8.1f} {total * scale:>8.1f} "
+                  f"{args.rows / (total / 1000):>10.0f}")
+
+if __name__ == '__main__':
+    main()
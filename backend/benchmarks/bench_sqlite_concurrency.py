@@ -0,0 +1,129 @@
+"""Contención de bloqueos en SQLite: configuración por defecto frente a database.py.
+
+Varios procesos (como los workers de gunicorn), cada uno con varios hilos,
+mezclan lecturas paginadas y actualizaciones de estado sobre la misma base.
+Se compara el modo por defecto de SQLite (journal DELETE, synchronous FULL,
+una conexión nueva por operación) con el motor configurado por database.py
+(WAL, synchronous NORMAL, mmap, caché y pool de conexiones).
+
+Uso: python benchmarks/bench_sqlite_concurrency.py --processes 4 --threads 4 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import database  # noqa: E402
+
+# Valores por defecto de SQLite para la comparación
+DEFAULT_PRAGMAS = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_MMAP_SIZE': '0',
+    'SQLITE_CACHE_SIZE': '-2000',
+}
+ESTADOS = ['Pendiente de Enviar', 'En trámite Solicitud', 'Gestión de Pago', 'Finalizado']
+
+def make_engine(uri, tuned):
+    if tuned:
+        return create_engine(uri, **database.engine_options(uri))
+    return create_engine(uri)
+
+def populate(uri, rows):
+    engine = create_engine(uri)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE tramite (id INTEGER PRIMARY KEY, estado VARCHAR(20), '
+                          '"nombreCliente" VARCHAR(100), fecha DATETIME)'))
+        conn.execute(text('INSERT INTO tramite (estado, "nombreCliente", fecha) VALUES (:e, :n, CURRENT_TIMESTAMP)'),
+                     [{'e': ESTADOS[i % len(ESTADOS)], 'n': f'Cliente {i}'} for i in range(rows)])
+    engine.dispose()
+
+def thread_loop(engine, rows, write_ratio, deadline, out):
+    reads, writes, errors = [], [], 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if random.random() < write_ratio:
+                with engine.begin() as conn:
+                    conn.execute(text('UPDATE tramite SET estado = :e WHERE id = :id'),
+                                 {'e': random.choice(ESTADOS), 'id': random.randrange(1, rows + 1)})
+                writes.append((time.perf_counter() - start) * 1000)
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT * FROM tramite WHERE id > :id ORDER BY id LIMIT 50'),
+                                 {'id': random.randrange(rows)}).fetchall()
+                reads.append((time.perf_counter() - start) * 1000)
+        except OperationalError:
+            errors += 1
+    out.append((reads, writes, errors))
+
+def process_main(uri, tuned, threads, rows, write_ratio, duration, queue):
+    if not tuned:
+        os.environ.update(DEFAULT_PRAGMAS)
+    engine = make_engine(uri, tuned)
+    out = []
+    deadline = time.perf_counter() + duration
+    workers = [threading.Thread(target=thread_loop, args=(engine, rows, write_ratio, deadline, out))
+               for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    engine.dispose()
+    queue.put(out)
+
+def run(tuned, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        if not tuned:
+            os.environ.update(DEFAULT_PRAGMAS)
+        populate(uri, args.rows)
+        for name in DEFAULT_PRAGMAS:
+            os.environ.pop(name, None)
+
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=process_main,
+                                             args=(uri, tuned, args.threads, args.rows,
+                                                   args.write_ratio, args.duration, queue))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = [lat for proc in results for r, _, _ in proc for lat in r]
+    writes = [lat for proc in results for _, w, _ in proc for lat in w]
+    errors = sum(e for proc in results for _, _, e in proc)
+    return reads, writes, errors
+
+def p95(samples):
+    return sorted(samples)[int(0.95 * (len(samples) - 1))] if samples else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'modo':<10} {'lecturas/s':>10} {'escrituras/s':>12} {'p95 lect ms':>11} "
+          f"{'p95 escr ms':>11} {'bloqueos':>8}")
+    for tuned in (False, True):
+        reads, writes, errors = run(tuned, args)
+        print(f"{'tuned' if tuned else 'defecto':<10} {len(reads) / args.duration:>10.0f} "
+              f"{len(writes) / args.duration:>12.0f} {p95(reads):>11.2f} {p95(writes):>11.2f} {errors:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Generador de datos sintéticos: usuarios, solicitudes, trámites y PDF de prueba.
+
+Rellena la base de datos configurada (DATABASE_URI o --database-uri) con
+volúmenes configurables y distribuciones de tipo y estado parecidas a las
+reales. Los PDF se guardan en el almacén de documentos (UPLOAD_FOLDER o
+--upload-folder) y se reparten entre los trámites. Los trámites se insertan
+por bloques con insert_tramites_chunk, igual que la importación masiva, así que
+las estadísticas, el índice de búsqueda y las versiones de tabla quedan al día.
+
+Todos los usuarios tienen la contraseña indicada con --password.
+
+Uso: python benchmarks/generate_data.py --tramites 100000 --database-uri sqlite:////tmp/bench.db
+"""
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_search import APELLIDOS, CALLES, CIUDADES, NOMBRES, cups  # noqa: E402
+
+# (valor, peso): proporciones aproximadas de una cartera real
+TIPOS = [('Alta', 40), ('Modificación', 35), ('Individual', 25)]
+FORMULARIOS = {
+    'Alta': 'Varios suministros',
+    'Modificación': 'Modificación suministro existente',
+    'Individual': 'Individual',
+}
+# Solo estados que caben en tramite.estado (String(20)), como en bench_lookup_indexes
+ESTADOS = [
+    ('Finalizado', 45), ('En trámite Solicitud', 18), ('Pendiente de Enviar', 14), ('Gestión de Pago', 12),
+    ('Completado', 6), ('Anulado', 5),
+]
+VIVIENDAS = ['Vivienda definitiva', 'Suministro de obras', 'Suministro eventual', 'Local comercial',
+             'Escalera-Ascensor', 'Punto de recarga', 'Otros']
+TENSIONES = ['1x230', '3x400']
+POTENCIAS = ['3.45', '4.6', '5.75', '6.9', '9.2', '10.35', '14.49']
+
+def weighted(rnd, choices):
+    values, weights = zip(*choices)
+    return rnd.choices(values, weights)[0]
+
+def fake_pdf(text):
+    """PDF mínimo y válido de una página con el texto dado."""
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    content = f'BT /F1 14 Tf 72 760 Td ({text}) Tj ET'.encode('latin-1', 'replace')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def tramite_row(rnd, i, user_id, fecha, documents):
+    tipo = weighted(rnd, TIPOS)
+    estado = weighted(rnd, ESTADOS)
+    row = {
+        # Los trámites sin enviar todavía no tienen número de expediente
+        'numeroExpediente': None if estado == 'Pendiente de Enviar' else f'EXP-{fecha.year}-{i:07d}',
+        'tipo': tipo,
+        'formulario': FORMULARIOS[tipo],
+        'nombreCliente': f'{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}',
+        'dni': f'{rnd.randrange(10 ** 8):08d}{"TRWAGMYFPDXBNJZSQVHLCKE"[i % 23]}',
+        'email': f'cliente{i}@example.com',
+        'telefonoMovil': f'6{rnd.randrange(10 ** 8):08d}',
+        'cups': cups(i),
+        'direccion': f'{rnd.choice(CALLES)} {rnd.randrange(1, 200)}, {rnd.choice(CIUDADES)}',
+        'refCatastral': f'{rnd.randrange(10 ** 13):014d}RC',
+        'tension': rnd.choice(TENSIONES),
+        'potenciaNumerica': rnd.choice(POTENCIAS),
+        'fecha': fecha,
+        'estado': estado,
+        'user_id': user_id,
+        'aumentoPotencia': tipo == 'Modificación' and rnd.random() < 0.6,
+        'vivienda': rnd.choice(VIVIENDAS) if tipo == 'Individual' else None,
+        'variosSuministros': tipo == 'Alta' and rnd.random() < 0.5,
+        'acometidaCentralizada': tipo == 'Alta' and rnd.random() < 0.3,
+        'dniPdf': rnd.choice(documents) if documents else '',
+        'formatoAutorizacion': rnd.choice(documents) if documents and rnd.random() < 0.8 else '',
+        'plantillaRelacionPuntos': rnd.choice(documents) if documents and tipo == 'Alta' and rnd.random() < 0.5 else '',
+    }
+    return row
+
+def generate(app, users=100, solicitudes=None, tramites=10000, documents=200, days=730, password='password',
+             seed=42, batch=5000, log=print):
+    """Inserta los datos con la aplicación app (ver create_app) y devuelve un resumen."""
+    import table_versions
+    from api.auth import password_hasher
+    from api.tramites import insert_tramites_chunk
+    from extensions import db, upload_store
+    from models import Solicitud, TableVersion, Tramite, User, reference_files
+
+    rnd = random.Random(seed)
+    solicitudes = tramites // 10 if solicitudes is None else solicitudes
+    started = time.perf_counter()
+    with app.app_context():
+        first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        first_tramite = (db.session.query(db.func.max(Tramite.id)).scalar() or 0) + 1
+
+        # Un único hash para todos: generarlo cuesta lo mismo que un login
+        hashed = password_hasher.hash(password)
+        db.session.execute(User.__table__.insert(), [
+            {'id': first_user + i, 'name': f'{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}',
+             'email': f'usuario{first_user + i}@example.com', 'password': hashed} for i in range(users)])
+        user_ids = list(range(first_user, first_user + users))
+
+        names = []
+        for i in range(documents):
+            stored = upload_store.save_stream(io.BytesIO(fake_pdf(f'Documento de prueba {seed}-{i}')),
+                                                f'documento_{i}.pdf')
+            names.append(stored.name)
+        db.session.commit()
+        log(f"{users} usuarios y {documents} documentos")
+
+        inicio = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+        step = days * 86400 / max(tramites, 1)
+        for start in range(0, tramites, batch):
+            rows = []
+            for n in range(start, min(start + batch, tramites)):
+                # Fechas crecientes con algo de desorden, como las altas reales
+                fecha = inicio + datetime.timedelta(seconds=n * step + rnd.uniform(0, step))
+                rows.append(tramite_row(rnd, first_tramite + n, rnd.choice(user_ids), fecha, names))
+            insert_tramites_chunk(rows)
+            db.session.commit()
+            done = start + len(rows)
+            log(f"{done}/{tramites} trámites ({done / (time.perf_counter() - started):.0f} filas/s)")
+
+        ahora = datetime.datetime.utcnow()
+        for start in range(0, solicitudes, batch):
+            rows = [{'titulo': f'Solicitud {n}', 'descripcion': 'Solicitud generada para pruebas de rendimiento',
+                     'tipoTramite': weighted(rnd, TIPOS), 'documentoAdjunto': rnd.choice(names) if names else '',
+                     'fecha_creacion': ahora - datetime.timedelta(minutes=rnd.randrange(days * 1440)),
+                     'user_id': rnd.choice(user_ids)}
+                    for n in range(start, min(start + batch, solicitudes))]
+            db.session.execute(Solicitud.__table__.insert(), rows)
+            reference_files(db.session.connection(), [row['documentoAdjunto'] for row in rows])
+            table_versions.bump(db.session.connection(), TableVersion.__table__, 'solicitud')
+            db.session.commit()
+        log(f"{solicitudes} solicitudes")
+
+    return {
+        'users': users, 'solicitudes': solicitudes, 'tramites': tramites, 'documents': documents,
+        'user_ids': [first_user, first_user + users - 1],
+        'tramite_ids': [first_tramite, first_tramite + tramites - 1],
+        'document_names': names, 'password': password, 'seconds': round(time.perf_counter() - started, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri', help='Por defecto DATABASE_URI')
+    parser.add_argument('--upload-folder', help='Por defecto UPLOAD_FOLDER')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--tramites', type=int, default=10000)
+    parser.add_argument('--solicitudes', type=int, help='Por defecto una por cada 10 trámites')
+    parser.add_argument('--documents', type=int, default=200, help='PDF distintos repartidos entre los trámites')
+    parser.add_argument('--days', type=int, default=730, help='Antigüedad del trámite más antiguo')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.database_uri:
+        os.environ['DATABASE_URI'] = args.database_uri
+    if args.upload_folder:
+        os.environ['UPLOAD_FOLDER'] = args.upload_folder
+    os.environ.setdefault('LOG_FILE', '')
+    # Se importa después de fijar el entorno: la configuración se lee al importar
+    from app import create_app
+    from models import init_schema
+
+    app = create_app()
+    with app.app_context():
+        init_schema()
+    summary = generate(app, users=args.users, solicitudes=args.solicitudes, tramites=args.tramites,
+                       documents=args.documents, days=args.days, password=args.password, seed=args.seed,
+                       batch=args.batch)
+    print(f"Generados en {summary['seconds']} s: usuarios {summary['user_ids'][0]}-{summary['user_ids'][1]}, "
+          f"trámites {summary['tramite_ids'][0]}-{summary['tramite_ids'][1]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Prueba de carga HTTP sencilla (sin dependencias) contra un servidor en marcha.
+
+Lanza N hilos, cada uno con su propia conexión persistente, que piden las rutas
+indicadas en bucle durante el tiempo configurado, y muestra peticiones por
+segundo y percentiles de latencia por ruta.
+
+Uso:
+  python benchmarks/load_test.py --url http://127.0.0.1:5000 --token <jwt> \\
+      --path /api/tramites --path "/api/expedientes/consulta?tipo=email&valor=cliente1@example.com"
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+def worker(base, path, headers, deadline, latencies, errors, lock):
+    conn = None
+    local_latencies = []
+    local_errors = 0
+    while time.perf_counter() < deadline:
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+            conn = conn_class(base.hostname, base.port, timeout=30)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                local_errors += 1
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            if conn is not None:
+                conn.close()
+            conn = None
+            continue
+        local_latencies.append((time.perf_counter() - start) * 1000)
+    if conn is not None:
+        conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+def run(url, path, token, concurrency, duration):
+    base = urlsplit(url)
+    headers = {'Connection': 'keep-alive'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(base, path, headers, deadline, latencies, errors, lock))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'path': path,
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--path', action='append', required=True)
+    parser.add_argument('--token', help='JWT para las rutas protegidas')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15.0)
+    args = parser.parse_args()
+
+    print(f"{'ruta':<60} {'peticiones':>10} {'errores':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for path in args.path:
+        r = run(args.url, path, args.token, args.concurrency, args.duration)
+        print(f"{r['path'][:60]:<60} {r['requests']:>10} {r['errors']:>8} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+if __name__ == '__main__':
+    main()
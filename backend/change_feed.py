@@ -0,0 +1,197 @@
+import collections
+import datetime
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import func, select
+
+logger = logging.getLogger(__name__)
+
+# Feed de cambios de trámites para Server-Sent Events.
+#
+# Cada alta, cambio o borrado escribe una fila en tramite_events en la misma
+# transacción (ver app.py). En cada proceso, un único hilo lee las filas nuevas y
+# las guarda en un búfer en memoria del que leen todas las conexiones abiertas:
+# con cientos de paneles conectados la base de datos recibe una consulta por
+# proceso y por intervalo, no una por cliente. El identificador de cada evento es
+# el id de la fila, así que un cliente que se reconecta con Last-Event-ID recibe
+# lo que se perdió (del búfer o, si es más antiguo, de la tabla).
+
+FeedEvent = collections.namedtuple('FeedEvent', ['id', 'tipo', 'data'])
+
+class ChangeFeed:
+    """Lee tramite_events en segundo plano y reparte los eventos a los suscriptores.
+
+    Los eventos se publican en orden de id. Si aparece un hueco (una transacción
+    que obtuvo un id menor aún no ha confirmado, algo posible en PostgreSQL) se
+    espera hasta gap_timeout segundos antes de darlo por perdido (rollback).
+    """
+
+    def __init__(self, app, db, table, poll_interval=1.0, buffer_size=1000, batch_size=500,
+                 gap_timeout=5.0, retention_days=7, prune_interval=3600):
+        self.app = app
+        self.db = db
+        self.table = table
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.retention = datetime.timedelta(days=retention_days)
+        self.prune_interval = prune_interval
+        self._buffer = collections.deque(maxlen=buffer_size)
+        # Último id publicado y último id que ya no está en el búfer: un cliente con
+        # Last-Event-ID >= _base se atiende desde memoria
+        self._cursor = None
+        self._base = None
+        self._gap_since = None
+        self._last_prune = 0.0
+        self._clients = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        # Se crea al importar el módulo; la aplicación se asigna en create_app
+        self.app = app
+
+    @property
+    def clients(self):
+        return self._clients
+
+    @property
+    def last_id(self):
+        return self._cursor
+
+    def start(self):
+        # Como OutboxWorker: un hilo por proceso, que se vuelve a crear tras un fork
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            with self._condition:
+                self._buffer.clear()
+                self._cursor = self._base = self.max_id()
+            self._thread = threading.Thread(target=self.run_forever, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def reset(self):
+        """Vuelve a empezar desde el id máximo actual (tras recrear la tabla)."""
+        with self._condition:
+            self._buffer.clear()
+            self._cursor = self._base = self.max_id()
+            self._gap_since = None
+            self._condition.notify_all()
+
+    def run_forever(self):
+        logger.info("Feed de cambios iniciado")
+        while not self._stopping.is_set():
+            try:
+                published = self.poll()
+                if time.monotonic() - self._last_prune >= self.prune_interval:
+                    self._last_prune = time.monotonic()
+                    self.prune()
+            except Exception:
+                logger.exception("Error en el feed de cambios")
+                published = 0
+            if published < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _connect(self):
+        # Sin app_context: al cerrarlo se eliminaría la sesión de la petición que llama
+        return self.db.get_engine(self.app).connect()
+
+    def max_id(self):
+        with self._connect() as conn:
+            return conn.execute(select(func.max(self.table.c.id))).scalar() or 0
+
+    def _rows(self, conn, after, until=None):
+        table = self.table
+        query = (select(table.c.id, table.c.tipo, table.c.data).where(table.c.id > after)
+                 .order_by(table.c.id).limit(self.batch_size))
+        if until is not None:
+            query = query.where(table.c.id <= until)
+        return [FeedEvent(*row) for row in conn.execute(query)]
+
+    def poll(self):
+        """Publica los eventos nuevos; devuelve cuántos se han publicado."""
+        with self._connect() as conn:
+            rows = self._rows(conn, self._cursor)
+        accepted = []
+        expected = self._cursor + 1
+        for row in rows:
+            if row.id > expected:
+                if self._gap_since is None:
+                    self._gap_since = time.monotonic()
+                if time.monotonic() - self._gap_since < self.gap_timeout:
+                    break
+                logger.warning("Feed de cambios: se omiten los eventos %s-%s", expected, row.id - 1)
+            self._gap_since = None
+            accepted.append(row)
+            expected = row.id + 1
+        if accepted:
+            with self._condition:
+                for row in accepted:
+                    if len(self._buffer) == self._buffer.maxlen:
+                        self._base = self._buffer[0].id
+                    self._buffer.append(row)
+                self._cursor = accepted[-1].id
+                self._condition.notify_all()
+        return len(accepted)
+
+    def prune(self):
+        cutoff = datetime.datetime.utcnow() - self.retention
+        with self._connect() as conn:
+            with conn.begin():
+                deleted = conn.execute(self.table.delete().where(self.table.c.created_at < cutoff)).rowcount
+        if deleted:
+            logger.info("Feed de cambios: %s eventos antiguos eliminados", deleted)
+
+    def events_since(self, last_id):
+        """Eventos publicados con id > last_id, o None si ya no están en el búfer."""
+        with self._condition:
+            if last_id < self._base:
+                return None
+            return [event for event in self._buffer if event.id > last_id]
+
+    def replay(self, last_id):
+        """Eventos posteriores a last_id leídos de la tabla (hasta el último publicado).
+
+        Devuelve None si last_id es anterior a la retención y faltan eventos.
+        """
+        with self._connect() as conn:
+            oldest = conn.execute(select(func.min(self.table.c.id))).scalar()
+            if oldest is None or oldest > last_id + 1:
+                return None if last_id < self._cursor else []
+            return self._rows(conn, last_id, until=self._cursor)
+
+    def wait(self, last_id, timeout):
+        """Espera a que haya eventos posteriores a last_id; False si vence el timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._cursor > last_id, timeout)
+
+    def subscribe(self):
+        with self._lock:
+            self._clients += 1
+
+    def unsubscribe(self):
+        with self._lock:
+            self._clients -= 1
+
+def format_event(event_id, name, data):
+    # data ya es JSON en una sola línea
+    return f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'
@@ -0,0 +1,58 @@
+# Recolector de los ficheros subidos que ya no referencia ningún trámite ni
+# solicitud (ver file_refs.py). Sin opciones se queda en marcha como proceso aparte,
+# igual que send_outbox.py; con --once hace una pasada (cron):
+#   python clean_uploads.py --once --scan
+#   python clean_uploads.py --report
+#   python clean_uploads.py --once --upload-folder /ruta/local/uploads
+import argparse
+import json
+import os
+
+def main():
+    parser = argparse.ArgumentParser(description='Borra los ficheros subidos sin referencias')
+    parser.add_argument('--once', action='store_true', help='Una sola pasada en lugar de quedarse en marcha')
+    parser.add_argument('--scan', action='store_true',
+                        help='Recorre también el disco en busca de ficheros que no figuran en la tabla')
+    parser.add_argument('--report', action='store_true', help='Solo muestra el uso del almacén por usuario y tipo')
+    parser.add_argument('--rebuild', action='store_true', help='Recalcula los contadores de referencias')
+    parser.add_argument('--upload-folder', help='Por defecto UPLOAD_FOLDER')
+    parser.add_argument('--grace', type=float, default=float(os.environ.get('UPLOADS_GC_GRACE_HOURS', 24)),
+                        help='Horas sin referencias (o desde la subida) antes de borrar un fichero')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('UPLOADS_GC_BATCH', 200)))
+    parser.add_argument('--pause', type=float, default=float(os.environ.get('UPLOADS_GC_PAUSE', 0.1)),
+                        help='Segundos de espera entre bloques')
+    parser.add_argument('--interval', type=float, default=float(os.environ.get('UPLOADS_GC_INTERVAL', 3600)),
+                        help='Segundos entre pasadas sin --once')
+    args = parser.parse_args()
+
+    if args.upload_folder:
+        os.environ['UPLOAD_FOLDER'] = args.upload_folder
+    # Se importa después de fijar el entorno: la configuración se lee al importar
+    import config
+    import file_refs
+    from app import create_app
+    from extensions import db, upload_store
+    from models import FILE_REFERENCE_SOURCES, Document, DocumentFile
+
+    with create_app().app_context():
+        if args.rebuild:
+            with db.engine.begin() as conn:
+                file_refs.rebuild(conn, DocumentFile.__table__,
+                                  [(source, fields) for source, fields, _ in FILE_REFERENCE_SOURCES], upload_store)
+        if args.report:
+            with db.engine.connect() as conn:
+                report = file_refs.usage_report(conn, DocumentFile.__table__, FILE_REFERENCE_SOURCES, upload_store)
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+        collector = file_refs.UploadCollector(
+            db.engine, DocumentFile.__table__, Document.__table__, upload_store, config.THUMBNAIL_FOLDER,
+            grace=args.grace * 3600, batch_size=args.batch_size, pause=args.pause)
+        if args.once:
+            result = collector.run_once(scan=args.scan)
+            print(f"Borrados {result['ficheros']} ficheros y {result['temporales']} temporales "
+                  f"({result['bytes'] / 1024 / 1024:.1f} MB)")
+            return
+        collector.run_forever(args.interval, scan=args.scan)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se comprime con gzip
+    brotli = None
+
+# Compresión de las respuestas (JSON, texto) según Accept-Encoding. Las respuestas
+# pequeñas no se comprimen (el ahorro no compensa la CPU), ni las que ya llevan
+# Content-Encoding, las parciales (206), los 304 o las que se envían por trozos
+# (exportaciones, documentos).
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/csv', 'text/html'}
+
+def available_encodings(names):
+    return tuple(name for name in names if name == 'gzip' or (name == 'br' and brotli is not None))
+
+def init_app(app, encodings=('br', 'gzip'), min_size=1024, gzip_level=6, brotli_quality=4):
+    """Registra el after_request que comprime las respuestas.
+
+    encodings indica los algoritmos admitidos por orden de preferencia ('br'
+    solo si brotli está instalado); si queda vacío no se comprime nada.
+    """
+    encodings = available_encodings(encodings)
+    if not encodings:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if encoding == 'br':
+            data = brotli.compress(data, quality=brotli_quality)
+        else:
+            data = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # Un ETag fuerte identifica los bytes exactos: tras comprimir pasa a ser débil
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,40 @@
+import os
+
+from dotenv import load_dotenv
+
+from database import engine_options, normalize_database_uri
+
+# Variables de entorno desde .env si existe. Se cargan al importar este módulo, que
+# importan (directa o indirectamente) todos los que leen su configuración del entorno
+load_dotenv()
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+
+# Documentos subidos y miniaturas generadas al analizarlos (ver document_processing.py).
+# Los directorios se crean al escribir el primer fichero, no al arrancar
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(BASEDIR, 'uploads'))
+THUMBNAIL_FOLDER = os.environ.get('THUMBNAIL_FOLDER', os.path.join(UPLOAD_FOLDER, '.thumbnails'))
+
+# Con EMAIL_WORKER_MODE=process / DOCUMENT_WORKER_MODE=process no se arrancan los hilos
+# en los workers web y las colas las vacía un proceso aparte (send_outbox.py, process_documents.py)
+EMAIL_WORKER_MODE = os.environ.get('EMAIL_WORKER_MODE', 'thread')
+DOCUMENT_WORKER_MODE = os.environ.get('DOCUMENT_WORKER_MODE', 'thread')
+
+# Detrás de nginx u otro proxy, número de proxies de confianza para obtener la IP real
+# del cliente desde X-Forwarded-For (la usa el límite de consultas por IP)
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'https://ingenieracochele.com, http://localhost:3000')
+
+class Config:
+    """Configuración de Flask (app.config) leída del entorno."""
+
+    SQLALCHEMY_DATABASE_URI = normalize_database_uri(
+        os.environ.get('DATABASE_URI', 'sqlite:///' + os.path.join(BASEDIR, 'tramites.db')))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool de conexiones y PRAGMAs de SQLite (WAL, busy_timeout...) definidos en database.py
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'una_clave_secreta_muy_segura')
+    # Las respuestas JSON se generan con serializers.jsonify (orjson si está instalado),
+    # que respeta JSON_SORT_KEYS (True por defecto en Flask: claves ordenadas como antes)
+    UPLOAD_FOLDER = UPLOAD_FOLDER
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
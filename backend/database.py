@@ -0,0 +1,76 @@
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+# PRAGMAs que se aplican a cada conexión SQLite nueva:
+# - WAL: los lectores no bloquean al escritor ni el escritor a los lectores
+# - synchronous=NORMAL: en WAL sigue siendo seguro ante caídas de la aplicación
+#   y evita un fsync por cada commit
+# - busy_timeout: esperar al bloqueo en vez de fallar con "database is locked"
+# Se leen del entorno al usarse para respetar los valores cargados desde .env
+def sqlite_pragmas():
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # negativo = KiB
+        'temp_store': 'MEMORY',
+    }
+
+def normalize_database_uri(uri):
+    # SQLAlchemy 1.4 ya no acepta el alias postgres:// que usan muchos proveedores
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def is_sqlite_memory(url):
+    return url.database in (None, '', ':memory:')
+
+def engine_options(uri):
+    """Opciones de create_engine (SQLALCHEMY_ENGINE_OPTIONS) según el backend."""
+    url = make_url(uri)
+    pool_size = int(os.environ.get('DB_POOL_SIZE', 5))
+    max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    pool_timeout = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+    if url.get_backend_name() == 'sqlite':
+        if is_sqlite_memory(url):
+            return {}
+        # Pool fijo de conexiones reutilizables en lugar de abrir una por petición
+        # (Flask-SQLAlchemy usa NullPool con SQLite si no se indica pool_size)
+        return {
+            'poolclass': QueuePool,
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'connect_args': {
+                'check_same_thread': False,
+                'timeout': sqlite_pragmas()['busy_timeout'] / 1000,
+            },
+        }
+
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or sqlite_pragmas()).items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+@event.listens_for(Engine, 'connect')
+def on_connect(dbapi_connection, connection_record):
+    # Se registra para todos los motores, pero solo actúa sobre conexiones SQLite
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection)
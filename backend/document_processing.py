@@ -0,0 +1,336 @@
+import concurrent.futures
+import datetime
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+
+from sqlalchemy import select
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Procesado en segundo plano de los PDF subidos: validación de la estructura,
+# número de páginas, texto y miniatura de la primera página. La tabla documents
+# hace de cola (como email_outbox): la petición solo inserta la fila pendiente y
+# el análisis, que es CPU, se ejecuta en un pool de procesos fuera de la petición.
+
+# Estados de un documento
+PENDIENTE = 'pendiente'
+PROCESANDO = 'procesando'
+PROCESADO = 'procesado'
+INVALIDO = 'invalido'
+ERROR = 'error'
+
+
+class InvalidPdf(Exception):
+    pass
+
+
+# --- Análisis (se ejecuta en los procesos del pool) ---
+
+def limit_resources(memory_mb):
+    # Inicializador del pool: un PDF malicioso no puede agotar la memoria del servidor
+    try:
+        import resource
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+    # Las señales de parada las gestiona el proceso padre
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # pypdf avisa de cada defecto que tolera; los errores ya se guardan en documents.error
+    logging.getLogger('pypdf').setLevel(logging.ERROR)
+
+def _timeout(signum, frame):
+    raise TimeoutError('tiempo de análisis agotado')
+
+def render_thumbnail(path, thumbnail_path, width):
+    """Renderiza la primera página en PNG; devuelve False si no hay renderizador."""
+    directory = os.path.dirname(thumbnail_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.thumb-', suffix='.png')
+    os.close(fd)
+    try:
+        if shutil.which('pdftoppm'):
+            # poppler-utils: -singlefile escribe <prefijo>.png
+            prefix = temp_path[:-len('.png')]
+            subprocess.run(['pdftoppm', '-png', '-f', '1', '-l', '1', '-singlefile', '-scale-to-x', str(width),
+                            '-scale-to-y', '-1', path, prefix], check=True, capture_output=True, timeout=30)
+        else:
+            try:
+                import fitz  # PyMuPDF
+            except ImportError:
+                return False
+            with fitz.open(path) as pdf:
+                page = pdf[0]
+                zoom = width / page.rect.width
+                page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).save(temp_path)
+        os.replace(temp_path, thumbnail_path)
+        return True
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def analyze_pdf(path, thumbnail_path, thumbnail_width=200, max_text_pages=20, max_text_chars=100000, timeout=60):
+    """Valida el PDF y devuelve {'paginas', 'texto', 'miniatura'}; InvalidPdf si no es válido."""
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
+
+    # En los procesos del pool la tarea corre en el hilo principal y se puede usar SIGALRM
+    use_alarm = hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _timeout)
+        signal.alarm(timeout)
+    try:
+        with open(path, 'rb') as f:
+            if f.read(5) != b'%PDF-':
+                raise InvalidPdf('no tiene la cabecera %PDF-')
+        try:
+            reader = PdfReader(path, strict=False)
+            if reader.is_encrypted and not reader.decrypt(''):
+                raise InvalidPdf('el PDF está protegido con contraseña')
+            paginas = len(reader.pages)
+            if not paginas:
+                raise InvalidPdf('el PDF no tiene páginas')
+            texto = []
+            length = 0
+            for page in reader.pages[:max_text_pages]:
+                chunk = page.extract_text() or ''
+                texto.append(chunk)
+                length += len(chunk)
+                if length >= max_text_chars:
+                    break
+        except (PdfReadError, ValueError, KeyError, TypeError, AttributeError) as e:
+            raise InvalidPdf(f'estructura no válida: {e}')
+        try:
+            miniatura = render_thumbnail(path, thumbnail_path, thumbnail_width)
+        except (OSError, subprocess.SubprocessError, RuntimeError, ValueError):
+            # Sin miniatura el documento sigue siendo válido
+            miniatura = False
+        return {'paginas': paginas, 'texto': '\n'.join(texto)[:max_text_chars], 'miniatura': miniatura}
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+
+# --- Registro y cola (proceso web) ---
+
+def _insert_ignore(conn, table):
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing(index_elements=['nombre'])
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing(index_elements=['nombre'])
+    if dialect == 'mysql':
+        return table.insert().prefix_with('IGNORE')
+    return None
+
+def register(conn, table, names, digest_for=None):
+    """Añade como pendientes los documentos que aún no estén en la tabla."""
+    names = sorted({name for name in names if name})
+    if not names:
+        return
+    now = datetime.datetime.utcnow()
+    rows = [{'nombre': name, 'digest': digest_for(name) if digest_for else None, 'estado': PENDIENTE,
+             'attempts': 0, 'next_attempt_at': now, 'created_at': now} for name in names]
+    stmt = _insert_ignore(conn, table)
+    if stmt is not None:
+        conn.execute(stmt, rows)
+        return
+    existing = {row[0] for row in conn.execute(select(table.c.nombre).where(table.c.nombre.in_(names)))}
+    rows = [row for row in rows if row['nombre'] not in existing]
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+class DocumentProcessor:
+    """Reclama documentos pendientes y los analiza en un pool de procesos.
+
+    Igual que OutboxWorker, los reclama con un UPDATE condicional y un plazo
+    (lease), de modo que varios procesos pueden compartir la tabla y un
+    documento cuyo proceso murió se vuelve a intentar.
+    """
+
+    def __init__(self, app, db, model, store, thumbnail_root, workers=2, batch_size=8, poll_interval=10.0,
+                 max_attempts=3, lease=300, task_timeout=60, memory_mb=512, thumbnail_width=200):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.store = store
+        self.thumbnail_root = thumbnail_root
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.task_timeout = task_timeout
+        self.memory_mb = memory_mb
+        self.thumbnail_width = thumbnail_width
+        self._pool = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        # Se crea al importar el módulo; la aplicación se asigna en create_app
+        self.app = app
+
+    def thumbnail_relative_path(self, digest):
+        return os.path.join(digest[:2], digest + '.png')
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.thumbnail_root, self.thumbnail_relative_path(digest))
+
+    @property
+    def pool(self):
+        # spawn: los procesos del pool no heredan los hilos ni las conexiones del worker web
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=limit_resources, initargs=(self.memory_mb,))
+        return self._pool
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._pool = None
+            self._thread = threading.Thread(target=self.run_forever, name='document-processor', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.reset_pool()
+
+    def run_forever(self):
+        logger.info("Procesador de documentos iniciado")
+        while not self._stopping.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception:
+                logger.exception("Error en el procesador de documentos")
+                processed = 0
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def claim(self, now):
+        model = self.model
+        due = (model.estado.in_((PENDIENTE, PROCESANDO)), model.next_attempt_at <= now)
+        candidates = [row.nombre for row in self.db.session.query(model.nombre).filter(*due)
+                      .order_by(model.next_attempt_at).limit(self.batch_size)]
+        lease_until = now + datetime.timedelta(seconds=self.lease)
+        claimed = []
+        for nombre in candidates:
+            updated = model.query.filter(model.nombre == nombre, *due).update(
+                {'estado': PROCESANDO, 'next_attempt_at': lease_until}, synchronize_session=False)
+            if updated:
+                claimed.append(nombre)
+        self.db.session.commit()
+        if not claimed:
+            return []
+        return model.query.filter(model.nombre.in_(claimed)).all()
+
+    def submit(self, row):
+        relative = self.store.relative_path(row.nombre)
+        path = os.path.join(self.store.root, relative)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f'no existe el fichero {relative}')
+        row.digest = row.digest or self.store.digest(relative)
+        row.tamano = os.path.getsize(path)
+        return self.pool.submit(analyze_pdf, path, self.thumbnail_path(row.digest),
+                                thumbnail_width=self.thumbnail_width, timeout=self.task_timeout)
+
+    def process_batch(self):
+        with self.app.app_context():
+            try:
+                rows = self.claim(datetime.datetime.utcnow())
+                if not rows:
+                    return 0
+                futures = {}
+                for row in rows:
+                    try:
+                        futures[self.submit(row)] = row
+                    except Exception as e:
+                        self.finish(row, error=str(e))
+                pending = set(futures)
+                try:
+                    for future in concurrent.futures.as_completed(futures, timeout=self.task_timeout + 30):
+                        pending.discard(future)
+                        self.collect(future, futures[future])
+                except concurrent.futures.TimeoutError:
+                    # Análisis bloqueado en código nativo (SIGALRM no llega a interrumpirlo)
+                    self.reset_pool()
+                    for future in pending:
+                        self.finish(futures[future], error='tiempo de análisis agotado')
+                self.db.session.commit()
+                return len(rows)
+            finally:
+                self.db.session.remove()
+
+    def collect(self, future, row):
+        try:
+            self.finish(row, result=future.result())
+        except InvalidPdf as e:
+            self.finish(row, invalid=str(e))
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # Un proceso del pool murió (p. ej. por el límite de memoria): se recrea
+            self.reset_pool()
+            self.finish(row, error=f'el proceso de análisis terminó inesperadamente: {e}')
+        except Exception as e:
+            self.finish(row, error=str(e))
+
+    def reset_pool(self):
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        # shutdown no detiene las tareas en curso: se terminan los procesos
+        for process in list(getattr(pool, '_processes', {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self, row, result=None, invalid=None, error=None):
+        now = datetime.datetime.utcnow()
+        row.attempts += 1
+        if result is not None:
+            row.estado = PROCESADO
+            row.paginas = result['paginas']
+            row.texto = result['texto']
+            row.miniatura = self.thumbnail_relative_path(row.digest) if result['miniatura'] else None
+            row.error = None
+            row.processed_at = now
+        elif invalid is not None:
+            # Un PDF mal formado no mejora al reintentarlo
+            row.estado = INVALIDO
+            row.error = invalid
+            row.processed_at = now
+            logger.warning("Documento %s no válido: %s", row.nombre, invalid)
+        elif row.attempts >= self.max_attempts:
+            row.estado = ERROR
+            row.error = error
+            row.processed_at = now
+            logger.error("Documento %s descartado tras %s intentos: %s", row.nombre, row.attempts, error)
+        else:
+            row.estado = PENDIENTE
+            row.error = error
+            row.next_attempt_at = now + datetime.timedelta(seconds=self.poll_interval * 2 ** row.attempts)
+        metrics.DOCUMENTS_PROCESSED.inc(result=row.estado)
@@ -0,0 +1,13 @@
+from flask_sqlalchemy import SQLAlchemy
+
+import config
+from storage import ContentStore
+
+# Objetos compartidos por los modelos y los blueprints. No abren conexiones ni
+# ficheros al importarse: create_app los enlaza a la aplicación
+
+db = SQLAlchemy()
+
+# Almacén direccionado por contenido: los ficheros subidos se escriben por trozos
+# mientras se parsea el multipart y se deduplican por su SHA-256
+upload_store = ContentStore(config.UPLOAD_FOLDER)
@@ -0,0 +1,351 @@
+import datetime
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+
+from sqlalchemy import case, func, null, select
+
+from storage import digest_from_name
+
+logger = logging.getLogger(__name__)
+
+# Recuento de referencias a los ficheros subidos y recolección de los huérfanos.
+#
+# document_files tiene una fila por fichero del almacén (ruta relativa a
+# UPLOAD_FOLDER) con cuántos trámites y solicitudes lo referencian. Igual que el
+# resumen de stats.py, los contadores se actualizan con deltas en la misma
+# transacción que cada alta, cambio o borrado; al llegar a 0 se anota
+# unreferenced_at. UploadCollector borra por bloques los ficheros que llevan sin
+# referencias más que el plazo de gracia y, con scan, los que no figuran en la
+# tabla (subidas de un alta que falló, temporales abandonados en .tmp).
+#
+# Una subida que deduplica un fichero existente actualiza su mtime (ContentStore),
+# y el recolector aparta cada fichero a .tmp antes de borrar su fila: si el
+# fichero apartado es reciente o la fila ha vuelto a tener referencias, se restaura.
+
+TRAMITE_FIELDS = ('dniPdf', 'formatoAutorizacion', 'plantillaRelacionPuntos')
+SOLICITUD_FIELDS = ('documentoAdjunto',)
+
+MOVED, MISSING, RECENT = 'moved', 'missing', 'recent'
+
+def safe_relative(ruta):
+    # Solo rutas dentro del almacén y fuera de sus directorios internos (.tmp, .thumbnails)
+    ruta = os.path.normpath(ruta)
+    if os.path.isabs(ruta) or any(part.startswith('.') for part in ruta.split(os.sep)):
+        return None
+    return ruta
+
+def deltas_for_names(store, names, sign=1):
+    """Deltas {ruta: n} de los nombres guardados en la base de datos (vacíos ignorados)."""
+    deltas = Counter()
+    for name in names:
+        ruta = safe_relative(store.relative_path(name)) if name else None
+        if ruta:
+            deltas[ruta] += sign
+    return deltas
+
+def deltas_for_change(store, old_names, new_names):
+    deltas = deltas_for_names(store, old_names, -1)
+    deltas.update(deltas_for_names(store, new_names))
+    return deltas
+
+def file_size(root, ruta):
+    try:
+        return os.path.getsize(os.path.join(root, ruta))
+    except OSError:
+        return None
+
+def _unreferenced_at(table, refs, value):
+    # Se anota al quedarse sin referencias y se conserva mientras siga sin ellas
+    return case((refs > 0, null()), else_=func.coalesce(table.c.unreferenced_at, value))
+
+def _upsert_statement(conn, table):
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    stmt = insert(table)
+    refs = table.c.refs + stmt.excluded.refs
+    return stmt.on_conflict_do_update(index_elements=['ruta'], set_={
+        'refs': refs,
+        'tamano': func.coalesce(stmt.excluded.tamano, table.c.tamano),
+        'unreferenced_at': _unreferenced_at(table, refs, stmt.excluded.unreferenced_at)
+    })
+
+def apply_deltas(conn, table, deltas, root=None, now=None):
+    """Suma los deltas {ruta: n} a los contadores con un único upsert.
+
+    Con root se anota el tamaño de los ficheros que ganan referencias.
+    """
+    now = now or datetime.datetime.utcnow()
+    # Orden fijo de las filas para que dos transacciones no se bloqueen en orden inverso
+    rows = [{'ruta': ruta, 'refs': delta, 'tamano': file_size(root, ruta) if root and delta > 0 else None,
+             'created_at': now, 'unreferenced_at': None if delta > 0 else now}
+            for ruta, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    stmt = _upsert_statement(conn, table)
+    if stmt is not None:
+        conn.execute(stmt, rows)
+        return
+    # Backends sin upsert: UPDATE y, si la fila no existía, INSERT
+    for row in rows:
+        refs = table.c.refs + row['refs']
+        updated = conn.execute(
+            table.update().where(table.c.ruta == row['ruta']).values(
+                refs=refs, tamano=func.coalesce(row['tamano'], table.c.tamano),
+                unreferenced_at=_unreferenced_at(table, refs, row['unreferenced_at']))).rowcount
+        if not updated:
+            conn.execute(table.insert(), row)
+
+def count_references(conn, sources, store):
+    """Referencias actuales de las tablas sources [(tabla, campos), ...] con GROUP BY."""
+    deltas = Counter()
+    for source, fields in sources:
+        for field in fields:
+            column = source.c[field]
+            for name, count in conn.execute(select(column, func.count()).where(column != '').group_by(column)):
+                for ruta, delta in deltas_for_names(store, [name]).items():
+                    deltas[ruta] += delta * count
+    return deltas
+
+def rebuild(conn, table, sources, store):
+    """Recalcula los contadores desde cero.
+
+    Los ficheros que se quedan fuera de la tabla los recoge el recorrido del disco
+    (UploadCollector.scan) una vez pasado el plazo de gracia.
+    """
+    conn.execute(table.delete())
+    apply_deltas(conn, table, count_references(conn, sources, store), store.root)
+
+def usage_report(conn, table, sources, store, user_id=None, chunk_size=500):
+    """Uso del almacén por usuario y tipo de trámite, y totales del disco.
+
+    sources es [(tabla, campos, columna del tipo), ...]. Los bytes por usuario son
+    lógicos (un PDF referenciado dos veces cuenta dos); los totales son los del
+    almacén, donde cada fichero se guarda una sola vez.
+    """
+    references = Counter()
+    for source, fields, tipo in sources:
+        query = select(source.c.user_id, source.c[tipo], *(source.c[field] for field in fields))
+        if user_id is not None:
+            query = query.where(source.c.user_id == user_id)
+        for row in conn.execute(query):
+            for ruta, count in deltas_for_names(store, row[2:]).items():
+                references[(row[0], row[1] or '', ruta)] += count
+
+    rutas = sorted({ruta for _, _, ruta in references})
+    sizes = {}
+    for start in range(0, len(rutas), chunk_size):
+        sizes.update(conn.execute(select(table.c.ruta, table.c.tamano)
+                                  .where(table.c.ruta.in_(rutas[start:start + chunk_size]))).all())
+
+    usage = {}
+    for (owner, tipo, ruta), count in references.items():
+        entry = usage.setdefault((owner, tipo), {'user_id': owner, 'tipo': tipo, 'documentos': 0, 'bytes': 0})
+        entry['documentos'] += count
+        entry['bytes'] += (sizes.get(ruta) or 0) * count
+
+    report = {'usuarios': sorted(usage.values(), key=lambda entry: (entry['user_id'], entry['tipo']))}
+    if user_id is None:
+        for key, condition in (('almacen', table.c.refs > 0), ('sin_referencias', table.c.refs <= 0)):
+            files, size = conn.execute(select(func.count(), func.coalesce(func.sum(table.c.tamano), 0))
+                                       .where(condition)).one()
+            report[key] = {'ficheros': files, 'bytes': int(size)}
+    return report
+
+
+class UploadCollector:
+    """Borra por bloques los ficheros subidos que ya no referencia nada.
+
+    grace (segundos) protege tanto las filas recién quedadas sin referencias como
+    los ficheros recién escritos o deduplicados, cuyo trámite puede no haberse
+    confirmado todavía.
+    """
+
+    def __init__(self, engine, table, documents, store, thumbnail_root, grace=86400, batch_size=200, pause=0.0):
+        self.engine = engine
+        self.table = table
+        self.documents = documents
+        self.store = store
+        self.thumbnail_root = thumbnail_root
+        self.grace = grace
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def quarantine(self, ruta, cutoff):
+        """Aparta el fichero a .tmp; devuelve (estado, ruta temporal, tamaño)."""
+        os.makedirs(self.store.tmp_dir, exist_ok=True)
+        trash = os.path.join(self.store.tmp_dir, f'gc-{uuid.uuid4().hex}')
+        try:
+            os.replace(os.path.join(self.store.root, ruta), trash)
+        except FileNotFoundError:
+            return MISSING, None, 0
+        stat = os.stat(trash)
+        # Deduplicado por una subida después de elegirlo: se deja donde estaba
+        if stat.st_mtime >= cutoff:
+            self.restore(trash, ruta)
+            return RECENT, None, 0
+        return MOVED, trash, stat.st_size
+
+    def restore(self, trash, ruta):
+        # Si entretanto se ha vuelto a subir, el contenido es el mismo (mismo hash)
+        target = os.path.join(self.store.root, ruta)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(trash, target)
+
+    def forget_documents(self, conn, rutas):
+        """Borra los metadatos (documents) de los ficheros rutas; devuelve sus miniaturas."""
+        thumbnails = []
+        for ruta in rutas:
+            digest = digest_from_name(os.path.basename(ruta))
+            condition = self.documents.c.digest == digest if digest else self.documents.c.nombre == ruta
+            thumbnails.extend(row[0] for row in conn.execute(
+                select(self.documents.c.miniatura).where(condition)) if row[0])
+            conn.execute(self.documents.delete().where(condition))
+        return thumbnails
+
+    def remove_thumbnails(self, thumbnails):
+        for thumbnail in thumbnails:
+            try:
+                os.unlink(os.path.join(self.thumbnail_root, thumbnail))
+            except FileNotFoundError:
+                pass
+
+    def _limits(self):
+        return datetime.datetime.utcnow() - datetime.timedelta(seconds=self.grace), time.time() - self.grace
+
+    def _delete_batch(self, rutas, cutoff, delete_row):
+        """Aparta los ficheros, borra sus filas con delete_row(conn, ruta) y luego los ficheros."""
+        moved = {}
+        for ruta in rutas:
+            estado, trash, size = self.quarantine(ruta, cutoff)
+            if estado != RECENT:
+                moved[ruta] = (trash, size)
+        if not moved:
+            return 0, 0
+        try:
+            with self.engine.begin() as conn:
+                deleted = [ruta for ruta in moved if delete_row(conn, ruta)]
+                thumbnails = self.forget_documents(conn, deleted)
+        except Exception:
+            for ruta, (trash, _) in moved.items():
+                if trash:
+                    self.restore(trash, ruta)
+            raise
+        files = size_total = 0
+        for ruta, (trash, size) in moved.items():
+            if trash is None:
+                continue
+            if ruta in deleted:
+                os.unlink(trash)
+                files += 1
+                size_total += size
+            else:
+                # La fila ha vuelto a tener referencias mientras tanto
+                self.restore(trash, ruta)
+        self.remove_thumbnails(thumbnails)
+        return files, size_total
+
+    def collect_unreferenced(self):
+        """Ficheros de document_files sin referencias desde antes del plazo de gracia."""
+        before, cutoff = self._limits()
+        table = self.table
+        due = (table.c.refs <= 0, table.c.unreferenced_at < before)
+
+        def delete_row(conn, ruta):
+            # Condicional: un alta confirmada entretanto vuelve a sumar referencias
+            return conn.execute(table.delete().where(table.c.ruta == ruta, *due)).rowcount
+
+        result = Counter()
+        last = ''
+        while True:
+            # Paginado por ruta: los ficheros recientes que se saltan no vuelven a salir
+            with self.engine.connect() as conn:
+                rutas = [row[0] for row in conn.execute(
+                    select(table.c.ruta).where(*due, table.c.ruta > last).order_by(table.c.ruta)
+                    .limit(self.batch_size))]
+            if not rutas:
+                return result
+            last = rutas[-1]
+            files, size = self._delete_batch(rutas, cutoff, delete_row)
+            result.update(ficheros=files, bytes=size)
+            if self.pause:
+                time.sleep(self.pause)
+
+    def _iter_old_files(self, cutoff):
+        for directory, dirnames, filenames in os.walk(self.store.root):
+            # .tmp, .thumbnails y demás directorios internos no contienen documentos
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        yield os.path.relpath(path, self.store.root)
+                except FileNotFoundError:
+                    continue
+
+    def collect_untracked(self):
+        """Ficheros antiguos del disco que no figuran en document_files, y temporales abandonados."""
+        _, cutoff = self._limits()
+        table = self.table
+
+        def delete_row(conn, ruta):
+            # No hay fila que borrar: solo se comprueba que nadie la haya creado entretanto
+            return conn.execute(select(table.c.ruta).where(table.c.ruta == ruta)).first() is None
+
+        result = Counter()
+        batch = []
+        candidates = self._iter_old_files(cutoff)
+        while True:
+            ruta = next(candidates, None)
+            if ruta is not None:
+                batch.append(ruta)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                with self.engine.connect() as conn:
+                    tracked = {row[0] for row in conn.execute(select(table.c.ruta).where(table.c.ruta.in_(batch)))}
+                files, size = self._delete_batch([item for item in batch if item not in tracked], cutoff, delete_row)
+                result.update(ficheros=files, bytes=size)
+                batch = []
+                if self.pause:
+                    time.sleep(self.pause)
+            if ruta is None:
+                break
+
+        # Subidas interrumpidas (HashingTempFile no llegó a cerrarse) y restos de una recolección anterior
+        if os.path.isdir(self.store.tmp_dir):
+            for entry in os.scandir(self.store.tmp_dir):
+                try:
+                    stat = entry.stat()
+                    if entry.is_file() and max(stat.st_mtime, stat.st_ctime) < cutoff:
+                        os.unlink(entry.path)
+                        result.update(temporales=1, bytes=stat.st_size)
+                except FileNotFoundError:
+                    continue
+        return result
+
+    def run_once(self, scan=False):
+        result = self.collect_unreferenced()
+        if scan:
+            result.update(self.collect_untracked())
+        return {key: result.get(key, 0) for key in ('ficheros', 'temporales', 'bytes')}
+
+    def run_forever(self, interval=3600.0, scan=True):
+        logger.info("Recolector de ficheros subidos iniciado")
+        while True:
+            try:
+                result = self.run_once(scan)
+                if any(result.values()):
+                    logger.info("Ficheros subidos recolectados", extra=result)
+            except Exception:
+                logger.exception("Error en el recolector de ficheros subidos")
+            time.sleep(interval)
@@ -0,0 +1,65 @@
+# Configuración de gunicorn para producción:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# Todos los valores pueden ajustarse con variables de entorno GUNICORN_*.
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+# GUNICORN_PROFILE=web (por defecto) sirve la API con workers gthread;
+# GUNICORN_PROFILE=feed arranca otra instancia con workers gevent para el feed de
+# cambios (/api/tramites/events), cuyas conexiones quedan abiertas minutos
+profile = os.environ.get('GUNICORN_PROFILE', 'web')
+default_port = os.environ.get('FEED_PORT', '5001') if profile == 'feed' else os.environ.get('PORT', '5000')
+
+bind = os.environ.get('GUNICORN_BIND', f"{os.environ.get('HOST', '0.0.0.0')}:{default_port}")
+
+# Workers con hilos: la mayor parte del tiempo de cada petición es E/S (SQLite,
+# disco, red), así que varios hilos por proceso aprovechan mejor cada núcleo
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent' if profile == 'feed' else 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 if profile == 'feed' else cpu_count * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Cargar la aplicación en el maestro antes del fork: los workers arrancan al
+# instante y comparten en memoria el código ya importado (copy-on-write)
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Conexiones persistentes detrás del proxy
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Cada conexión al feed de cambios (/api/tramites/events) queda abierta minutos.
+# Con gevent cada una es una greenlet y un worker atiende cientos; la biblioteca
+# estándar se parchea antes de que preload_app importe la aplicación. Con gthread
+# cada conexión ocupa un hilo, así que el feed se limita a la mitad de los hilos
+# de cada worker (el perfil web solo lo sirve si el proxy no lo envía al perfil feed)
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    os.environ.setdefault('CHANGE_FEED_MAX_CLIENTS', str(worker_connections // 2))
+else:
+    os.environ.setdefault('CHANGE_FEED_MAX_CLIENTS', str(max(1, threads // 2)))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+# Tiempo que se deja a los workers para terminar sus peticiones en un reinicio (HUP/TERM)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Reciclar workers periódicamente acota el crecimiento de memoria; el jitter
+# evita que todos se reinicien a la vez
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = os.environ.get('GUNICORN_ERRORLOG', '-')
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+# Con preload_app el maestro ya abrió conexiones a la base de datos; cada worker
+# descarta las heredadas para no compartir sockets ni ficheros SQLite tras el fork.
+# Sin preload_app cada worker crea su aplicación y no hay nada que descartar
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    from extensions import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,109 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+from flask import g, has_request_context
+
+# Atributos estándar de LogRecord; el resto se consideran campos estructurados (extra=...)
+RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class RequestIdFilter(logging.Filter):
+    # Añade a cada registro el identificador de la petición en curso, si la hay
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'ts': datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s [%(levelname)s] [%(request_id)s] - %(message)s')
+
+    def formatMessage(self, record):
+        text = super().formatMessage(record)
+        extra = {key: value for key, value in vars(record).items()
+                 if key not in RESERVED_ATTRS and key != 'request_id' and not key.startswith('_')}
+        if extra:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in extra.items())
+        return text
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    # Resuelve el mensaje y la traza antes de encolar (los argumentos podrían cambiar
+    # después), pero sin aplicar el formato final, que se hace en el hilo del listener
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener = None
+
+def _start_listener(handlers):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return log_queue
+
+def configure_logging(level=None, log_file=None, log_format=None):
+    """Configura el logging de la aplicación.
+
+    Los hilos de las peticiones solo encolan los registros; un hilo aparte
+    (QueueListener) los formatea y escribe en consola y fichero, de modo que
+    la E/S de logs nunca bloquea una petición.
+    """
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    log_file = log_file if log_file is not None else os.environ.get('LOG_FILE', 'app.log')
+    log_format = (log_format or os.environ.get('LOG_FORMAT', 'text')).lower()
+
+    formatter = JsonFormatter() if log_format == 'json' else TextFormatter()
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = StructuredQueueHandler(_start_listener(handlers))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # El hilo del listener no sobrevive al fork de gunicorn: cada hijo arranca el suyo
+    def restart_listener_in_child():
+        queue_handler.queue = _start_listener(handlers)
+    os.register_at_fork(after_in_child=restart_listener_in_child)
+    # Vaciar la cola al salir para no perder los últimos registros
+    atexit.register(stop_logging)
+
+def stop_logging():
+    # Puede estar registrada varias veces si se crea más de una aplicación (pruebas)
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,236 @@
+import bisect
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Métricas en formato de texto de Prometheus, sin dependencias externas.
+# Los valores son por proceso: con varios workers de gunicorn cada uno expone los suyos.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                                for key, value in items]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class CallbackGauge(_Metric):
+    # Gauge cuyo valor se obtiene al exportar las métricas
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def collect(self):
+        return self.header() + [f'{self.name} {_format_value(self.callback())}']
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def callback_gauge(self, *args, **kwargs):
+        return self.register(CallbackGauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP', ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = registry.gauge('http_requests_in_flight', 'Peticiones HTTP en curso')
+DB_QUERY_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'Duración de cada consulta SQL',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    'db_queries_per_request', 'Consultas SQL por petición', ('route',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+DB_TIME_PER_REQUEST = registry.histogram(
+    'db_time_per_request_seconds', 'Tiempo total en la base de datos por petición', ('route',))
+JWT_DECODE_DURATION = registry.histogram(
+    'auth_jwt_decode_duration_seconds', 'Duración de la verificación del JWT',
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01))
+UPLOAD_BYTES = registry.counter('upload_bytes_total', 'Bytes de documentos subidos', ('deduplicated',))
+UPLOAD_FILES = registry.counter('upload_files_total', 'Documentos subidos', ('deduplicated',))
+UPLOAD_SAVE_DURATION = registry.histogram('upload_save_duration_seconds', 'Duración del guardado de un documento')
+EMAIL_SEND_DURATION = registry.histogram(
+    'email_send_batch_duration_seconds', 'Duración del envío de un lote de correos', ('transport',))
+EMAIL_MESSAGES = registry.counter('email_messages_total', 'Correos procesados por resultado', ('result',))
+CONSULTA_CACHE = registry.counter('consulta_cache_requests_total', 'Consultas públicas por resultado de la caché', ('result',))
+DOCUMENTS_PROCESSED = registry.counter('documents_processed_total', 'Documentos analizados por resultado', ('result',))
+RATE_LIMITED = registry.counter('rate_limited_requests_total', 'Peticiones rechazadas por un límite de frecuencia', ('route',))
+PASSWORD_HASH_DURATION = registry.histogram(
+    'password_hash_duration_seconds', 'Duración del hash o la verificación de una contraseña', ('operation',),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+PASSWORD_HASH_REJECTED = registry.counter(
+    'password_hash_rejected_total', 'Operaciones de hash rechazadas por falta de hueco en el pool', ('operation',))
+SLOW_REQUESTS = registry.counter('http_slow_requests_total', 'Peticiones por encima del umbral de perfilado', ('route',))
+
+# Consultas SQL: se miden todas y, dentro de una petición, se acumulan en g
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+def current_route():
+    return request.url_rule.rule if request.url_rule is not None else 'desconocida'
+
+def init_app(app, token=None, slow_request_ms=None, profile_dir=None):
+    """Instrumenta la aplicación y registra la ruta /api/metrics.
+
+    Si slow_request_ms está definido, cada petición se ejecuta bajo cProfile y
+    las que superan el umbral vuelcan sus estadísticas en profile_dir.
+    """
+    if slow_request_ms:
+        # Solo se importa si el perfilado está activado
+        import cProfile
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @app.before_request
+    def start_metrics():
+        REQUESTS_IN_FLIGHT.inc()
+        g.metrics_start = time.perf_counter()
+        g.metrics_in_flight = True
+        if slow_request_ms:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_metrics(response):
+        if 'metrics_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        route = current_route()
+        REQUEST_DURATION.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        DB_QUERIES_PER_REQUEST.observe(g.get('db_queries', 0), route=route)
+        DB_TIME_PER_REQUEST.observe(g.get('db_time', 0.0), route=route)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed * 1000 >= slow_request_ms:
+                SLOW_REQUESTS.inc(route=route)
+                filename = f"{time.strftime('%Y%m%d%H%M%S')}_{g.get('request_id', 'peticion')}.prof"
+                profiler.dump_stats(os.path.join(profile_dir, filename))
+        return response
+
+    @app.teardown_request
+    def finish_metrics(exc):
+        if g.pop('metrics_in_flight', False):
+            REQUESTS_IN_FLIGHT.dec()
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics_endpoint():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('No autorizado\n', status=401, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
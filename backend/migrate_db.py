@@ -1,62 +1,333 @@
-import sqlite3
+import argparse
+import datetime
 import os
+import sys
 
-# Ruta a la base de datos
-db_path = 'tramites.db'
+from dotenv import load_dotenv
+from sqlalchemy import (BigInteger, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+                        create_engine, inspect, select, text)
 
-def migrate_db():
+import document_processing
+import file_refs
+import search
+import stats
+import table_versions
+from database import normalize_database_uri
+from storage import ContentStore, digest_from_name
+
+# Cargar variables de entorno desde .env si existe
+load_dotenv()
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'tramites.db')
+
+# Registro de migraciones versionadas: (versión, descripción, función)
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return register
+
+def column_names(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+def add_column_if_missing(conn, table, column, ddl_type):
+    if column not in column_names(conn, table):
+        print(f"Añadiendo campo '{column}' a la tabla {table}...")
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {ddl_type}'))
+
+def create_table(conn, name, *columns, **kwargs):
+    # Definición con SQLAlchemy Core para que el DDL sea válido en SQLite y PostgreSQL
+    Table(name, MetaData(), *columns, **kwargs).create(conn, checkfirst=True)
+
+def create_index(conn, name, table, *columns):
+    # IF NOT EXISTS permite aplicar la migración sobre bases creadas con db.create_all()
+    cols = ', '.join(f'"{column}"' for column in columns)
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({cols})'))
+
+# Migraciones
+@migration(1, 'Campos numeroExpediente y tension en tramite')
+def add_numero_expediente_y_tension(conn):
+    add_column_if_missing(conn, 'tramite', 'numeroExpediente', 'VARCHAR(50)')
+    add_column_if_missing(conn, 'tramite', 'tension', 'VARCHAR(50)')
+
+@migration(2, 'Índices de búsqueda y claves foráneas')
+def add_lookup_indexes(conn):
+    create_index(conn, 'ix_tramite_numeroExpediente', 'tramite', 'numeroExpediente')
+    create_index(conn, 'ix_tramite_email', 'tramite', 'email')
+    create_index(conn, 'ix_tramite_fecha_id', 'tramite', 'fecha', 'id')
+    create_index(conn, 'ix_tramite_estado_fecha', 'tramite', 'estado', 'fecha')
+    create_index(conn, 'ix_tramite_user_id_fecha', 'tramite', 'user_id', 'fecha')
+    create_index(conn, 'ix_solicitud_user_id', 'solicitud', 'user_id')
+
+@migration(3, 'Tabla email_outbox para las notificaciones en segundo plano')
+def add_email_outbox(conn):
+    create_table(
+        conn, 'email_outbox',
+        Column('id', Integer, primary_key=True),
+        Column('tramite_id', Integer),
+        Column('to_email', String(100), nullable=False),
+        Column('subject', String(200), nullable=False),
+        Column('html_content', Text, nullable=False),
+        Column('estado', String(20), nullable=False),
+        Column('attempts', Integer, nullable=False),
+        Column('next_attempt_at', DateTime, nullable=False),
+        Column('last_error', Text),
+        Column('created_at', DateTime),
+        Column('sent_at', DateTime),
+        Index('ix_email_outbox_estado_next_attempt_at', 'estado', 'next_attempt_at')
+    )
+
+@migration(4, 'Índice de texto completo (FTS5) de trámites')
+def add_tramite_search_index(conn):
+    # Solo SQLite; en otros backends la búsqueda usa LIKE sobre las columnas
+    if search.create_index(conn):
+        print("Indexadas las filas existentes de tramite")
+
+@migration(5, 'Resumen materializado tramite_stats para las estadísticas del panel')
+def add_tramite_stats(conn):
+    create_table(
+        conn, 'tramite_stats',
+        Column('dimension', String(20), primary_key=True),
+        Column('valor', String(100), primary_key=True),
+        Column('total', Integer, nullable=False)
+    )
+    stats.rebuild(conn, Table('tramite_stats', MetaData(), autoload_with=conn),
+                  Table('tramite', MetaData(), autoload_with=conn))
+
+@migration(6, 'Tabla table_versions para los ETag de los listados')
+def add_table_versions(conn):
+    create_table(
+        conn, 'table_versions',
+        Column('tabla', String(50), primary_key=True),
+        Column('version', Integer, nullable=False),
+        Column('updated_at', DateTime, nullable=False)
+    )
+    table_versions.seed(conn, Table('table_versions', MetaData(), autoload_with=conn))
+
+@migration(7, 'Tabla tramite_events para el feed de cambios en tiempo real')
+def add_tramite_events(conn):
+    create_table(
+        conn, 'tramite_events',
+        Column('id', Integer, primary_key=True),
+        Column('tramite_id', Integer),
+        Column('tipo', String(20), nullable=False),
+        Column('data', Text, nullable=False),
+        Column('created_at', DateTime, nullable=False),
+        Index('ix_tramite_events_created_at', 'created_at'),
+        sqlite_autoincrement=True
+    )
+
+@migration(8, 'Tabla documents con los metadatos de los PDF subidos')
+def add_documents(conn):
+    create_table(
+        conn, 'documents',
+        Column('nombre', String(200), primary_key=True),
+        Column('digest', String(64), index=True),
+        Column('estado', String(20), nullable=False),
+        Column('tamano', Integer),
+        Column('paginas', Integer),
+        Column('texto', Text),
+        Column('miniatura', String(200)),
+        Column('attempts', Integer, nullable=False),
+        Column('next_attempt_at', DateTime, nullable=False),
+        Column('error', Text),
+        Column('created_at', DateTime),
+        Column('processed_at', DateTime),
+        Index('ix_documents_estado_next_attempt_at', 'estado', 'next_attempt_at')
+    )
+    # Los documentos ya subidos quedan pendientes y se analizan en segundo plano
+    names = set()
+    for field in ('dniPdf', 'formatoAutorizacion', 'plantillaRelacionPuntos'):
+        names.update(row[0] for row in conn.execute(text(f'SELECT DISTINCT "{field}" FROM tramite')))
+    document_processing.register(conn, Table('documents', MetaData(), autoload_with=conn), names,
+                                 digest_for=digest_from_name)
+    print(f"{len(names - {None, ''})} documentos pendientes de análisis")
+
+@migration(9, 'Tabla tramite_archive para los trámites archivados')
+def add_tramite_archive(conn):
+    # Mismas columnas que tramite (el archivado copia las filas con INSERT ... SELECT)
+    tramite = Table('tramite', MetaData(), autoload_with=conn)
+    create_table(
+        conn, 'tramite_archive',
+        *(Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+          for column in tramite.columns),
+        Column('archivado_en', DateTime, nullable=False),
+        Index('ix_tramite_archive_numeroExpediente', 'numeroExpediente'),
+        Index('ix_tramite_archive_email', 'email'),
+        Index('ix_tramite_archive_fecha_id', 'fecha', 'id')
+    )
+    table_versions.seed(conn, Table('table_versions', MetaData(), autoload_with=conn))
+
+@migration(10, 'Tabla document_files con las referencias a los ficheros subidos')
+def add_document_files(conn):
+    create_table(
+        conn, 'document_files',
+        Column('ruta', String(200), primary_key=True),
+        Column('tamano', BigInteger),
+        Column('refs', Integer, nullable=False),
+        Column('created_at', DateTime, nullable=False),
+        Column('unreferenced_at', DateTime),
+        Index('ix_document_files_refs_unreferenced_at', 'refs', 'unreferenced_at')
+    )
+    # Referencias de los trámites (también los archivados) y solicitudes existentes;
+    # los ficheros que no usa ninguno los borra clean_uploads.py --scan
+    store = ContentStore(os.environ.get('UPLOAD_FOLDER', os.path.join(basedir, 'uploads')))
+    sources = [(Table(name, MetaData(), autoload_with=conn), fields) for name, fields in (
+        ('tramite', file_refs.TRAMITE_FIELDS), ('tramite_archive', file_refs.TRAMITE_FIELDS),
+        ('solicitud', file_refs.SOLICITUD_FIELDS))]
+    table = Table('document_files', MetaData(), autoload_with=conn)
+    file_refs.rebuild(conn, table, sources, store)
+    print(f"{conn.execute(text('SELECT COUNT(*) FROM document_files')).scalar()} ficheros referenciados")
+
+@migration(11, 'AUTOINCREMENT en tramite para no reutilizar los ids archivados')
+def add_tramite_autoincrement(conn):
+    # Sin AUTOINCREMENT, SQLite vuelve a dar el id más alto si esa fila se ha borrado
+    # (p. ej. al archivarla) y el siguiente archivado choca con la clave de tramite_archive.
+    # PostgreSQL usa secuencias, que nunca reutilizan valores
+    if conn.dialect.name != 'sqlite':
+        return
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tramite'")).scalar()
+    if 'AUTOINCREMENT' not in sql.upper():
+        metadata = MetaData()
+        Table('user', metadata, autoload_with=conn)
+        tramite = Table('tramite', metadata, autoload_with=conn)
+        indexes = inspect(conn).get_indexes('tramite')
+        columns = [column.name for column in tramite.columns]
+        # SQLite no permite cambiar la clave primaria: se copia a una tabla nueva
+        Table(
+            'tramite_new', metadata,
+            *(Column(column.name, column.type, *[ForeignKey(fk.target_fullname) for fk in column.foreign_keys],
+                     primary_key=column.primary_key, nullable=column.nullable)
+              for column in tramite.columns),
+            sqlite_autoincrement=True
+        ).create(conn)
+        cols = ', '.join(f'"{column}"' for column in columns)
+        conn.execute(text(f'INSERT INTO tramite_new ({cols}) SELECT {cols} FROM tramite'))
+        # Los triggers de FTS se eliminan con la tabla; el índice conserva los mismos rowid
+        conn.execute(text('DROP TABLE tramite'))
+        conn.execute(text('ALTER TABLE tramite_new RENAME TO tramite'))
+        for index in indexes:
+            create_index(conn, index['name'], 'tramite', *index['column_names'])
+        if search.has_index(conn):
+            for statement in search.create_statements():
+                conn.execute(text(statement))
+    # El contador parte del id más alto de tramite y de tramite_archive
+    top = conn.execute(text('SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM tramite '
+                            'UNION ALL SELECT MAX(id) FROM tramite_archive)')).scalar() or 0
+    if conn.execute(text("UPDATE sqlite_sequence SET seq = MAX(seq, :top) WHERE name = 'tramite'"),
+                    {'top': top}).rowcount == 0:
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('tramite', :top)"), {'top': top})
+    duplicated = conn.execute(text(
+        'SELECT COUNT(*) FROM tramite JOIN tramite_archive ON tramite_archive.id = tramite.id')).scalar()
+    if duplicated:
+        print(f"Aviso: {duplicated} trámites activos comparten id con uno archivado y no se podrán archivar")
+
+@migration(12, 'Trámites archivados en el resumen de estadísticas')
+def add_archived_stats(conn):
+    # Hasta ahora el archivado solo los descontaba del resumen de los activos
+    table = Table('tramite_stats', MetaData(), autoload_with=conn)
+    if conn.execute(select(table.c.dimension).where(table.c.dimension.startswith(stats.ARCHIVE_PREFIX))
+                    .limit(1)).first() is None:
+        archive = Table('tramite_archive', MetaData(), autoload_with=conn)
+        stats.apply_deltas(conn, table, stats.archived(stats.count_rows(conn, archive)))
+
+@migration(13, 'Campo password de user ampliado a 255 caracteres')
+def widen_password(conn):
+    # Los hashes de pbkdf2:sha256:260000 ocupan 102 caracteres y los de scrypt o
+    # pbkdf2:sha512 más de 160. SQLite no aplica la longitud de VARCHAR
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('ALTER TABLE "user" ALTER COLUMN password TYPE VARCHAR(255)'))
+    elif conn.dialect.name == 'mysql':
+        conn.execute(text('ALTER TABLE `user` MODIFY password VARCHAR(255) NOT NULL'))
+
+def get_engine(database_uri=None):
+    uri = normalize_database_uri(database_uri or os.environ.get('DATABASE_URI', DEFAULT_DATABASE_URI))
+    return create_engine(uri)
+
+def ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_version ('
+            'version INTEGER PRIMARY KEY, '
+            'description VARCHAR(200) NOT NULL, '
+            'applied_at TIMESTAMP NOT NULL)'
+        ))
+
+def applied_versions(engine):
+    ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_version'))}
+
+def pending_migrations(engine):
+    done = applied_versions(engine)
+    return [item for item in MIGRATIONS if item[0] not in done]
+
+def record_version(conn, version, description):
+    conn.execute(
+        text('INSERT INTO schema_version (version, description, applied_at) '
+             'VALUES (:version, :description, :applied_at)'),
+        {'version': version, 'description': description,
+         'applied_at': datetime.datetime.utcnow()}
+    )
+
+def stamp(engine):
+    """Registra todas las migraciones como aplicadas.
+
+    Para bases recién creadas por init_schema con el esquema actual, de modo que
+    migrate_db.py no intente aplicarles migraciones que ya no hacen falta.
+    """
+    pending = pending_migrations(engine)
+    with engine.begin() as conn:
+        for version, description, _ in pending:
+            record_version(conn, version, description)
+
+def migrate_db(database_uri=None, target=None):
+    engine = get_engine(database_uri)
     print("Iniciando migración de la base de datos...")
-    
-    # Verificar si la base de datos existe
-    if not os.path.exists(db_path):
-        print(f"Error: No se encontró la base de datos en {db_path}")
-        return False
-    
-    conn = None
+
+    if not inspect(engine).has_table('tramite'):
+        # Base nueva: la crea flask init-db con el esquema actual y registra las versiones
+        print("La tabla 'tramite' no existe: no hay nada que migrar (se creará con flask init-db)")
+        engine.dispose()
+        return True
+
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Verificar si la tabla tramite existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tramite'")
-        if not cursor.fetchone():
-            print("Error: La tabla 'tramite' no existe")
-            return False
-        
-        # Verificar si los campos ya existen
-        cursor.execute("PRAGMA table_info(tramite)")
-        columns = cursor.fetchall()
-        column_names = [column[1] for column in columns]
-        
-        # Añadir campo numeroExpediente si no existe
-        if 'numeroExpediente' not in column_names:
-            print("Añadiendo campo 'numeroExpediente' a la tabla tramite...")
-            cursor.execute("ALTER TABLE tramite ADD COLUMN numeroExpediente TEXT")
-            print("Campo 'numeroExpediente' añadido con éxito")
-        else:
-            print("El campo 'numeroExpediente' ya existe")
-        
-        # Añadir campo tension si no existe
-        if 'tension' not in column_names:
-            print("Añadiendo campo 'tension' a la tabla tramite...")
-            cursor.execute("ALTER TABLE tramite ADD COLUMN tension TEXT")
-            print("Campo 'tension' añadido con éxito")
-        else:
-            print("El campo 'tension' ya existe")
-        
-        # Guardar cambios
-        conn.commit()
+        for version, description, func in pending_migrations(engine):
+            if target is not None and version > target:
+                break
+            print(f"Aplicando migración {version}: {description}")
+            # Cada migración se aplica en su propia transacción junto con su registro
+            with engine.begin() as conn:
+                func(conn)
+                record_version(conn, version, description)
         print("Migración completada con éxito")
         return True
-        
     except Exception as e:
         print(f"Error durante la migración: {str(e)}")
-        if conn:
-            conn.rollback()
         return False
     finally:
-        if conn:
-            conn.close()
+        engine.dispose()
+
+def print_status(database_uri=None):
+    engine = get_engine(database_uri)
+    done = applied_versions(engine)
+    for version, description, _ in MIGRATIONS:
+        marca = 'aplicada' if version in done else 'pendiente'
+        print(f"{version:>4}  {marca:<9}  {description}")
+    engine.dispose()
 
 if __name__ == "__main__":
-    migrate_db() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Migraciones versionadas de la base de datos')
+    parser.add_argument('--database-uri', help='URI de la base de datos (por defecto DATABASE_URI)')
+    parser.add_argument('--status', action='store_true', help='Mostrar el estado de las migraciones')
+    parser.add_argument('--target', type=int, help='Aplicar migraciones hasta esta versión')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status(args.database_uri)
+    else:
+        sys.exit(0 if migrate_db(args.database_uri, args.target) else 1)
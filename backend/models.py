@@ -0,0 +1,326 @@
+import datetime
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import declared_attr, object_session
+
+import document_processing
+import file_refs
+import migrate_db
+import notifications
+import search
+import serializers
+import stats
+import table_versions
+from extensions import db, upload_store
+from serializers import RowSerializer
+
+# Modelos y eventos del ORM que actualizan en la misma transacción los datos derivados
+# (estadísticas, versiones de tabla y registro de cambios para el feed)
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password = db.Column(db.String(255), nullable=False)
+    solicitudes = db.relationship('Solicitud', backref='user', lazy=True)
+    tramites = db.relationship('Tramite', backref='user', lazy=True)
+
+class Solicitud(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    titulo = db.Column(db.String(100), nullable=False)
+    descripcion = db.Column(db.Text, nullable=False)
+    tipoTramite = db.Column(db.String(50), nullable=False)
+    documentoAdjunto = db.Column(db.String(200))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+# Columnas de un trámite, compartidas por tramite y por su archivo (tramite_archive)
+class TramiteColumns:
+    id = db.Column(db.Integer, primary_key=True)
+    numeroExpediente = db.Column(db.String(50), nullable=True, index=True)  # Nuevo campo para número de expediente
+    tipo = db.Column(db.String(50), nullable=False)  # 'Modificación', 'Individual', 'Alta' -> Este es el MOTIVO
+    formulario = db.Column(db.String(100), nullable=True) # Nuevo campo para el TIPO DE FORMULARIO GENERAL
+    nombreCliente = db.Column(db.String(100), nullable=False)
+    dni = db.Column(db.String(20), nullable=False)  # Nuevo campo para DNI
+    email = db.Column(db.String(100), nullable=False, index=True)
+    telefonoMovil = db.Column(db.String(20), nullable=False)
+    cups = db.Column(db.String(100), nullable=False)
+    direccion = db.Column(db.String(200), nullable=False)
+    refCatastral = db.Column(db.String(100), nullable=False)
+    tension = db.Column(db.String(50), nullable=True)  # Campo renombrado (antes potenciaNumerica)
+    potenciaNumerica = db.Column(db.String(50), nullable=False)
+    fecha = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    estado = db.Column(db.String(20), default='Pendiente')
+
+    @declared_attr
+    def user_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    # Campos específicos para cada tipo de trámite
+    aumentoPotencia = db.Column(db.Boolean, default=False)  # Para Modificación
+    vivienda = db.Column(db.String(50))  # Para Individual
+    variosSuministros = db.Column(db.Boolean, default=False)  # Para Alta
+    acometidaCentralizada = db.Column(db.Boolean, default=False)  # Para Alta
+    
+    # Guarda las rutas a los archivos (en una implementación real se usaría un servicio de almacenamiento)
+    dniPdf = db.Column(db.String(200))
+    formatoAutorizacion = db.Column(db.String(200))
+    plantillaRelacionPuntos = db.Column(db.String(200))
+
+class Tramite(TramiteColumns, db.Model):
+    # Índices compuestos para el listado paginado (keyset por fecha/id) y los filtros por estado.
+    # Cualquier índice nuevo debe añadirse también como migración en migrate_db.py
+    __table_args__ = (
+        db.Index('ix_tramite_fecha_id', 'fecha', 'id'),
+        db.Index('ix_tramite_estado_fecha', 'estado', 'fecha'),
+        db.Index('ix_tramite_user_id_fecha', 'user_id', 'fecha'),
+        # Los ids de los trámites archivados no se reutilizan (tramite_archive los conserva)
+        {'sqlite_autoincrement': True},
+    )
+
+# Índice de texto completo (FTS5) sobre tramite, creado y eliminado junto con la tabla
+search.install(Tramite.__table__)
+
+# Trámites cerrados y antiguos que el archivado (archive.py) saca de tramite para que
+# los listados, recuentos y búsquedas no los recorran. Conservan su id original
+class TramiteArchivado(TramiteColumns, db.Model):
+    __tablename__ = 'tramite_archive'
+    __table_args__ = (
+        db.Index('ix_tramite_archive_fecha_id', 'fecha', 'id'),
+    )
+
+    archivado_en = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+# Resumen materializado para las estadísticas del panel (ver stats.py)
+class TramiteStat(db.Model):
+    __tablename__ = 'tramite_stats'
+
+    dimension = db.Column(db.String(20), primary_key=True)  # estado, tipo, formulario o mes
+    valor = db.Column(db.String(100), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+def tramite_stat_values(tramite, previous=False):
+    values = {}
+    state = inspect(tramite)
+    for column in stats.SOURCE_COLUMNS:
+        deleted = state.attrs[column].history.deleted
+        values[column] = deleted[0] if previous and deleted else getattr(tramite, column)
+    return values
+
+# Los contadores se actualizan en la misma conexión y transacción que el cambio
+@event.listens_for(Tramite, 'after_insert')
+def count_inserted_tramite(mapper, connection, target):
+    stats.apply_deltas(connection, TramiteStat.__table__, stats.deltas_for_rows([tramite_stat_values(target)]))
+
+@event.listens_for(Tramite, 'after_update')
+def count_updated_tramite(mapper, connection, target):
+    deltas = stats.deltas_for_change(tramite_stat_values(target, previous=True), tramite_stat_values(target))
+    stats.apply_deltas(connection, TramiteStat.__table__, deltas)
+
+@event.listens_for(Tramite, 'after_delete')
+def count_deleted_tramite(mapper, connection, target):
+    stats.apply_deltas(connection, TramiteStat.__table__, stats.deltas_for_rows([tramite_stat_values(target)], -1))
+
+# Versión de cambios de cada tabla para los ETag de los listados (ver table_versions.py)
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+def bump_table_version(name):
+    table_versions.bump(db.session.connection(), TableVersion.__table__, name)
+
+@event.listens_for(Tramite, 'after_insert')
+@event.listens_for(Tramite, 'after_update')
+@event.listens_for(Tramite, 'after_delete')
+@event.listens_for(Solicitud, 'after_insert')
+@event.listens_for(Solicitud, 'after_update')
+@event.listens_for(Solicitud, 'after_delete')
+def bump_mapped_table_version(mapper, connection, target):
+    table_versions.bump(connection, TableVersion.__table__, mapper.local_table.name)
+
+# Registro de cambios de trámites para el feed en tiempo real (ver change_feed.py).
+# sqlite_autoincrement evita que se reutilicen ids tras purgar los eventos antiguos
+class TramiteEvent(db.Model):
+    __tablename__ = 'tramite_events'
+    __table_args__ = (
+        db.Index('ix_tramite_events_created_at', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tramite_id = db.Column(db.Integer, nullable=True)  # Vacío en los eventos masivos
+    tipo = db.Column(db.String(20), nullable=False)  # created, updated, deleted o bulk
+    data = db.Column(db.Text, nullable=False)  # JSON enviado a los clientes
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+def record_tramite_event(connection, session, tipo, data, tramite_id=None):
+    connection.execute(TramiteEvent.__table__.insert(), {
+        'tramite_id': tramite_id, 'tipo': tipo, 'data': serializers.dumps(data).decode('utf-8'),
+        'created_at': datetime.datetime.utcnow()
+    })
+    # Tras el commit se despierta el feed de este proceso (los demás lo leen al sondear)
+    session.info['change_feed'] = True
+
+def tramite_event_row(tramite):
+    return TRAMITE_SERIALIZER(tuple(getattr(tramite, name) for name in TRAMITE_SERIALIZER.columns))
+
+@event.listens_for(Tramite, 'after_insert')
+def record_created_tramite(mapper, connection, target):
+    record_tramite_event(connection, object_session(target), 'created',
+                         {'id': target.id, 'tramite': tramite_event_row(target)}, target.id)
+
+@event.listens_for(Tramite, 'after_update')
+def record_updated_tramite(mapper, connection, target):
+    changed = [attr.key for attr in inspect(target).attrs if attr.history.has_changes()]
+    record_tramite_event(connection, object_session(target), 'updated',
+                         {'id': target.id, 'campos': changed, 'tramite': tramite_event_row(target)}, target.id)
+
+@event.listens_for(Tramite, 'after_delete')
+def record_deleted_tramite(mapper, connection, target):
+    record_tramite_event(connection, object_session(target), 'deleted', {'id': target.id}, target.id)
+
+# Bandeja de salida de correos: se escribe en la misma transacción que el cambio
+# de estado y la procesa en segundo plano OutboxWorker (notifications.py)
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_estado_next_attempt_at', 'estado', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tramite_id = db.Column(db.Integer, nullable=True)
+    to_email = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default=notifications.PENDIENTE)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+# Referencias a cada fichero del almacén de documentos (ver file_refs.py): permiten
+# borrar los que ya no usa ningún trámite ni solicitud
+class DocumentFile(db.Model):
+    __tablename__ = 'document_files'
+    __table_args__ = (
+        db.Index('ix_document_files_refs_unreferenced_at', 'refs', 'unreferenced_at'),
+    )
+
+    ruta = db.Column(db.String(200), primary_key=True)  # Relativa a UPLOAD_FOLDER
+    tamano = db.Column(db.BigInteger)
+    refs = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    unreferenced_at = db.Column(db.DateTime)  # Desde cuándo no tiene referencias
+
+# Campos con nombres de ficheros subidos en cada tabla y columna por la que se agrupa el uso
+FILE_REFERENCE_SOURCES = [
+    (Tramite.__table__, file_refs.TRAMITE_FIELDS, 'tipo'),
+    (TramiteArchivado.__table__, file_refs.TRAMITE_FIELDS, 'tipo'),
+    (Solicitud.__table__, file_refs.SOLICITUD_FIELDS, 'tipoTramite'),
+]
+FILE_REFERENCE_FIELDS = {source.name: fields for source, fields, _ in FILE_REFERENCE_SOURCES}
+
+def reference_files(connection, names, sign=1):
+    file_refs.apply_deltas(connection, DocumentFile.__table__, file_refs.deltas_for_names(upload_store, names, sign),
+                           upload_store.root)
+
+def file_names(target, fields, previous=False):
+    state = inspect(target)
+    names = []
+    for field in fields:
+        deleted = state.attrs[field].history.deleted
+        names.append(deleted[0] if previous and deleted else getattr(target, field))
+    return names
+
+# Igual que las estadísticas: en la misma conexión y transacción que el cambio.
+# El archivado mueve las filas con SQL y no cambia las referencias
+@event.listens_for(Tramite, 'after_insert')
+@event.listens_for(Solicitud, 'after_insert')
+def reference_inserted_files(mapper, connection, target):
+    reference_files(connection, file_names(target, FILE_REFERENCE_FIELDS[mapper.local_table.name]))
+
+@event.listens_for(Tramite, 'after_update')
+@event.listens_for(Solicitud, 'after_update')
+def reference_updated_files(mapper, connection, target):
+    fields = FILE_REFERENCE_FIELDS[mapper.local_table.name]
+    deltas = file_refs.deltas_for_change(upload_store, file_names(target, fields, previous=True),
+                                         file_names(target, fields))
+    file_refs.apply_deltas(connection, DocumentFile.__table__, deltas, upload_store.root)
+
+@event.listens_for(Tramite, 'after_delete')
+@event.listens_for(Solicitud, 'after_delete')
+def reference_deleted_files(mapper, connection, target):
+    reference_files(connection, file_names(target, FILE_REFERENCE_FIELDS[mapper.local_table.name]), -1)
+
+# Metadatos de los PDF subidos (páginas, texto, miniatura). La tabla es también la cola
+# del procesado en segundo plano (ver document_processing.py)
+class Document(db.Model):
+    __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_estado_next_attempt_at', 'estado', 'next_attempt_at'),
+    )
+
+    nombre = db.Column(db.String(200), primary_key=True)  # Nombre guardado en tramite
+    digest = db.Column(db.String(64), index=True)
+    estado = db.Column(db.String(20), nullable=False, default=document_processing.PENDIENTE)
+    tamano = db.Column(db.Integer)
+    paginas = db.Column(db.Integer)
+    texto = db.Column(db.Text)
+    miniatura = db.Column(db.String(200))  # Ruta relativa en THUMBNAIL_FOLDER
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+# Campos de una solicitud en la API
+SOLICITUD_SERIALIZER = RowSerializer(
+    fields=('id', 'titulo', 'descripcion', 'tipoTramite', 'documentoAdjunto', 'fecha_creacion'),
+    formatters={'fecha_creacion': serializers.format_fecha_hora}
+)
+SOLICITUD_LIST_COLUMNS = [getattr(Solicitud, name) for name in SOLICITUD_SERIALIZER.columns]
+
+# Campos de un trámite en la API. Los específicos de cada tipo (motivo) solo se
+# incluyen en los trámites de ese tipo
+TRAMITE_SERIALIZER = RowSerializer(
+    fields=('id', 'numeroExpediente', 'tipo', 'formulario', 'nombreCliente', 'dni', 'email',
+            'telefonoMovil', 'cups', 'direccion', 'refCatastral', 'tension', 'potenciaNumerica',
+            'fecha', 'estado', 'dniPdf', 'formatoAutorizacion', 'plantillaRelacionPuntos'),
+    formatters={'fecha': serializers.format_fecha},
+    variant_field='tipo',
+    variants={
+        'Modificación': ('aumentoPotencia',),
+        'Individual': ('vivienda',),
+        'Alta': ('variosSuministros', 'acometidaCentralizada'),
+    }
+)
+# Los listados seleccionan solo estas columnas (query.with_entities), sin hidratar objetos ORM
+TRAMITE_LIST_COLUMNS = [getattr(Tramite, name) for name in TRAMITE_SERIALIZER.columns]
+ARCHIVED_TRAMITE_LIST_COLUMNS = [getattr(TramiteArchivado, name) for name in TRAMITE_SERIALIZER.columns]
+
+def init_schema():
+    """Crea las tablas que falten y completa las estructuras derivadas.
+
+    Se ejecuta una sola vez por despliegue (flask init-db o create_tables.py), no al
+    arrancar cada worker. Las bases creadas antes del índice de búsqueda, del
+    resumen de estadísticas o del recuento de referencias a ficheros los reciben
+    aquí a partir de las filas existentes. Una base nueva ya tiene el esquema
+    actual, así que se registran todas las migraciones en schema_version; las
+    existentes se actualizan antes con migrate_db.py.
+    """
+    fresh = not inspect(db.engine).has_table(Tramite.__tablename__)
+    db.create_all()
+    if fresh:
+        migrate_db.stamp(db.engine)
+    with db.engine.begin() as conn:
+        created_index = search.create_index(conn)
+        if conn.execute(select(TramiteStat.total).limit(1)).first() is None:
+            stats.rebuild(conn, TramiteStat.__table__, Tramite.__table__, TramiteArchivado.__table__)
+        table_versions.seed(conn, TableVersion.__table__)
+        if conn.execute(select(DocumentFile.ruta).limit(1)).first() is None:
+            file_refs.rebuild(conn, DocumentFile.__table__,
+                              [(source, fields) for source, fields, _ in FILE_REFERENCE_SOURCES], upload_store)
+    return created_index
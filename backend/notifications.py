@@ -0,0 +1,251 @@
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Estados de un mensaje en la bandeja de salida
+PENDIENTE = 'pendiente'
+ENVIANDO = 'enviando'
+ENVIADO = 'enviado'
+FALLIDO = 'fallido'
+
+OutgoingEmail = namedtuple('OutgoingEmail', ['id', 'to_email', 'subject', 'html_content'])
+
+# Transportes: reciben un lote de mensajes y devuelven, para cada uno, None si se
+# envió o el texto del error. Una excepción hace fallar el lote completo.
+class SendGridTransport:
+    def __init__(self, api_key, sender, host=None):
+        if not api_key:
+            raise ValueError("API key de SendGrid no configurada en variables de entorno")
+        self.api_key = api_key
+        self.sender = sender
+        self.host = host
+        self._client = None
+
+    def _get_client(self):
+        # El SDK se importa al enviar el primer correo y el cliente se reutiliza entre lotes
+        if self._client is None:
+            from sendgrid import SendGridAPIClient
+            if self.host:
+                self._client = SendGridAPIClient(self.api_key, host=self.host)
+            else:
+                self._client = SendGridAPIClient(self.api_key)
+        return self._client
+
+    def send_batch(self, messages):
+        from sendgrid.helpers.mail import Mail
+        client = self._get_client()
+        results = []
+        for message in messages:
+            try:
+                response = client.send(Mail(
+                    from_email=self.sender,
+                    to_emails=message.to_email,
+                    subject=message.subject,
+                    html_content=message.html_content
+                ))
+                results.append(None if response.status_code < 300 else f'HTTP {response.status_code}')
+            except Exception as e:
+                results.append(str(e))
+        return results
+
+class SMTPTransport:
+    def __init__(self, host, port, sender, username=None, password=None, use_tls=False, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send_batch(self, messages):
+        # Una sola conexión SMTP para todo el lote (smtplib solo se importa si se usa este transporte)
+        import smtplib
+        from email.message import EmailMessage
+
+        results = []
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for message in messages:
+                email = EmailMessage()
+                email['From'] = self.sender
+                email['To'] = message.to_email
+                email['Subject'] = message.subject
+                email.set_content(message.html_content, subtype='html')
+                try:
+                    smtp.send_message(email)
+                    results.append(None)
+                except smtplib.SMTPException as e:
+                    results.append(str(e))
+        return results
+
+class MemoryTransport:
+    # Guarda los mensajes en memoria; útil en desarrollo y pruebas
+    def __init__(self):
+        self.sent = []
+
+    def send_batch(self, messages):
+        self.sent.extend(messages)
+        return [None] * len(messages)
+
+def transport_from_env():
+    sender = os.environ.get('EMAIL_SENDER', 'notificaciones@tuempresa.com')
+    kind = os.environ.get('EMAIL_TRANSPORT', 'sendgrid').lower()
+    if kind == 'smtp':
+        return SMTPTransport(
+            host=os.environ.get('SMTP_HOST', 'localhost'),
+            port=int(os.environ.get('SMTP_PORT', 25)),
+            sender=sender,
+            username=os.environ.get('SMTP_USERNAME'),
+            password=os.environ.get('SMTP_PASSWORD'),
+            use_tls=os.environ.get('SMTP_USE_TLS', 'false').lower() == 'true'
+        )
+    if kind == 'memory':
+        return MemoryTransport()
+    return SendGridTransport(
+        api_key=os.environ.get('SENDGRID_API_KEY'),
+        sender=sender,
+        host=os.environ.get('SENDGRID_HOST')
+    )
+
+class OutboxWorker:
+    """Envía en segundo plano los correos pendientes de la tabla de salida.
+
+    Reclama los mensajes con un UPDATE condicional (varios procesos pueden
+    compartir la tabla), los envía por lotes y reintenta los fallos con
+    espera exponencial hasta max_attempts.
+    """
+
+    def __init__(self, app, db, model, transport_factory=transport_from_env, batch_size=50,
+                 poll_interval=5.0, max_attempts=5, backoff_base=30, backoff_max=3600, lease=300):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.transport_factory = transport_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self._transport = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        # Se crea al importar el módulo; la aplicación se asigna en create_app
+        self.app = app
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = self.transport_factory()
+        return self._transport
+
+    def start(self):
+        # Tras un fork el hilo del proceso padre no existe en el hijo: se arranca uno nuevo
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.run_forever, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self):
+        logger.info("Worker de notificaciones iniciado")
+        while not self._stopping.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception:
+                logger.exception("Error en el worker de notificaciones")
+                processed = 0
+            # Si el lote venía lleno puede haber más mensajes esperando
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def backoff(self, attempts):
+        return min(self.backoff_max, self.backoff_base * 2 ** max(attempts - 1, 0))
+
+    def claim(self, now):
+        model = self.model
+        due = (model.estado.in_((PENDIENTE, ENVIANDO)), model.next_attempt_at <= now)
+        candidates = [row.id for row in self.db.session.query(model.id).filter(*due)
+                      .order_by(model.next_attempt_at).limit(self.batch_size)]
+        lease_until = now + datetime.timedelta(seconds=self.lease)
+        claimed = []
+        for message_id in candidates:
+            updated = model.query.filter(model.id == message_id, *due).update(
+                {'estado': ENVIANDO, 'next_attempt_at': lease_until}, synchronize_session=False)
+            if updated:
+                claimed.append(message_id)
+        self.db.session.commit()
+        if not claimed:
+            return []
+        return model.query.filter(model.id.in_(claimed)).all()
+
+    def process_batch(self):
+        with self.app.app_context():
+            try:
+                rows = self.claim(datetime.datetime.utcnow())
+                if not rows:
+                    return 0
+
+                messages = [OutgoingEmail(row.id, row.to_email, row.subject, row.html_content) for row in rows]
+                started = time.perf_counter()
+                # El transporte se resuelve una sola vez y dentro del try: si la fábrica
+                # falla (p. ej. falta SENDGRID_API_KEY) los mensajes cuentan un intento
+                transport_name = 'unavailable'
+                try:
+                    transport = self.transport
+                    transport_name = type(transport).__name__
+                    results = transport.send_batch(messages)
+                except Exception as e:
+                    logger.warning("Fallo del transporte de correo: %s", e)
+                    results = [str(e)] * len(messages)
+                metrics.EMAIL_SEND_DURATION.observe(time.perf_counter() - started, transport=transport_name)
+
+                now = datetime.datetime.utcnow()
+                for row, error in zip(rows, results):
+                    row.attempts += 1
+                    metrics.EMAIL_MESSAGES.inc(result='enviado' if error is None else 'error')
+                    if error is None:
+                        row.estado = ENVIADO
+                        row.sent_at = now
+                        row.last_error = None
+                        logger.info("Correo %s enviado a %s", row.id, row.to_email)
+                    elif row.attempts >= self.max_attempts:
+                        row.estado = FALLIDO
+                        row.last_error = error
+                        logger.error("Correo %s descartado tras %s intentos: %s", row.id, row.attempts, error)
+                    else:
+                        row.estado = PENDIENTE
+                        row.last_error = error
+                        row.next_attempt_at = now + datetime.timedelta(seconds=self.backoff(row.attempts))
+                self.db.session.commit()
+                return len(rows)
+            finally:
+                self.db.session.remove()
@@ -0,0 +1,111 @@
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Hash de contraseñas fuera del hilo de la petición.
+#
+# PBKDF2 y scrypt son caros a propósito: una ráfaga de logins que los calculara
+# en los hilos de las peticiones los ocuparía todos. Aquí se calculan en un pool
+# de PASSWORD_HASH_WORKERS hilos por proceso (hashlib libera el GIL, así que se
+# ejecutan en paralelo); una petición espera como mucho PASSWORD_HASH_QUEUE_TIMEOUT
+# segundos a que quede un hueco y, si no lo hay, se rechaza sin calcular nada.
+#
+# El cálculo y la verificación los hace werkzeug (generate_password_hash y
+# check_password_hash); este módulo solo añade el pool, la espera y las métricas.
+
+DEFAULT_METHOD = 'pbkdf2:sha256:260000'
+
+class HasherBusy(Exception):
+    """No hay hueco en el pool de hash antes de que venza la espera."""
+
+def normalize_method(method):
+    # Los parámetros de coste se escriben siempre en el método (werkzeug los guarda
+    # tal cual en el hash): así needs_rehash detecta cuándo cambian
+    kind, _, params = method.partition(':')
+    if kind == 'pbkdf2':
+        algorithm, _, iterations = params.partition(':')
+        return f"pbkdf2:{algorithm or 'sha256'}:{int(iterations or 260000)}"
+    if kind == 'scrypt':
+        n, r, p = (params.split(':') + ['', '', ''])[:3]
+        return f'scrypt:{int(n or 32768)}:{int(r or 8)}:{int(p or 1)}'
+    raise ValueError(f'Método de hash no soportado: {method}')
+
+def verify_password(stored, password):
+    try:
+        return check_password_hash(stored, password)
+    except Exception as e:
+        # Hash guardado corrupto o con un método que esta versión no conoce: nunca coincide
+        logger.warning("Hash de contraseña no verificable: %s", e)
+        return False
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, salt_length=16, workers=2, queue_timeout=5.0):
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(workers)
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # El pool se crea con el primer uso en cada proceso (los hilos no sobreviven al fork)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, operation, func, *args):
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            metrics.PASSWORD_HASH_REJECTED.inc(operation=operation)
+            raise HasherBusy()
+        try:
+            started = time.perf_counter()
+            result = self._get_executor().submit(func, *args).result()
+            metrics.PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation=operation)
+            return result
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored, password):
+        return self._run('verify', verify_password, stored, password)
+
+    def needs_rehash(self, stored):
+        # Hashes con otro método o con otros parámetros de coste que los configurados
+        return not stored or stored.split('$', 1)[0] != self.method
+
+    def stats(self):
+        with self._lock:
+            waiting = self._waiting
+        return {'method': self.method, 'workers': self.workers, 'waiting': waiting,
+                'queue_timeout': self.queue_timeout}
+
+def hasher_from_env():
+    return PasswordHasher(
+        method=os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        salt_length=int(os.environ.get('PASSWORD_SALT_LENGTH', 16)),
+        workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        queue_timeout=float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+    )
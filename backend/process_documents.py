@@ -0,0 +1,9 @@
+# Analiza los documentos subidos en un proceso independiente
+# (usar junto con DOCUMENT_WORKER_MODE=process en los workers web).
+# La importación va dentro del if: los procesos del pool (spawn) vuelven a
+# importar este módulo y no deben cargar la aplicación
+if __name__ == "__main__":
+    from app import create_app
+    from background import document_processor
+    create_app()
+    document_processor.run_forever()
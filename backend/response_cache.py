@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Caché de respuestas y limitador de peticiones para rutas públicas.
+# Por defecto todo vive en memoria del proceso; con RESPONSE_CACHE_URL=redis://...
+# la caché y los contadores se comparten entre workers y máquinas.
+
+
+class LocalResponseCache:
+    """Caché LRU con caducidad, segura entre hilos, local a cada proceso."""
+
+    def __init__(self, max_size=2048, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'local',
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class SharedResponseCache:
+    """Caché compartida sobre un cliente con la interfaz de redis-py.
+
+    Las claves llevan un número de generación: clear() solo lo incrementa y
+    las entradas antiguas caducan solas por su TTL.
+    """
+
+    def __init__(self, client, ttl=30, prefix='respcache'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        generation = self.client.get(f'{self.prefix}:gen') or b'0'
+        if isinstance(generation, bytes):
+            generation = generation.decode()
+        return f'{self.prefix}:{generation}:' + ':'.join(str(part) for part in key)
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        self.client.set(self._key(key), json.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self._key(key) for key in keys))
+
+    def clear(self):
+        self.client.incr(f'{self.prefix}:gen')
+
+    def stats(self):
+        return {'backend': 'shared', 'ttl': self.ttl}
+
+
+class LocalRateLimiter:
+    """Ventana fija por clave (normalmente la IP del cliente), local a cada proceso."""
+
+    def __init__(self, limit=30, window=60, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Registra una petición; devuelve (permitida, segundos hasta la próxima ventana)."""
+        if self.limit <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(key, (now, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            count += 1
+            self._windows[key] = (started, count)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        return count <= self.limit, max(1, int(self.window - (now - started) + 0.999))
+
+
+class SharedRateLimiter:
+    """Ventana fija con INCR/EXPIRE: el límite se aplica sumando todos los workers."""
+
+    def __init__(self, client, limit=30, window=60, prefix='ratelimit'):
+        self.client = client
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+
+    def hit(self, key):
+        if self.limit <= 0:
+            return True, 0
+        bucket = int(time.time() // self.window)
+        name = f'{self.prefix}:{key}:{bucket}'
+        pipe = self.client.pipeline()
+        pipe.incr(name)
+        pipe.expire(name, self.window)
+        count = pipe.execute()[0]
+        return count <= self.limit, max(1, (bucket + 1) * self.window - int(time.time()))
+
+
+def _shared_client(url):
+    # redis solo es necesario si se configura el backend compartido
+    import redis
+    return redis.Redis.from_url(url, socket_timeout=0.5)
+
+# Sin backend compartido cada worker tiene su propia LRU y la invalidación tras el
+# commit solo llega a la del worker que hizo el cambio; los demás pueden servir la
+# respuesta antigua hasta que caduque, así que por defecto el TTL local es corto.
+LOCAL_CACHE_TTL = 5
+SHARED_CACHE_TTL = 30
+
+def cache_from_env(prefix):
+    # <PREFIJO>_CACHE_TTL segundos de vida y <PREFIJO>_CACHE_SIZE entradas por worker
+    ttl = os.environ.get(f'{prefix.upper()}_CACHE_TTL')
+    url = os.environ.get('RESPONSE_CACHE_URL')
+    if url:
+        ttl = int(ttl) if ttl is not None else SHARED_CACHE_TTL
+        return SharedResponseCache(_shared_client(url), ttl=ttl, prefix=f'{prefix}:cache')
+    ttl = int(ttl) if ttl is not None else LOCAL_CACHE_TTL
+    return LocalResponseCache(int(os.environ.get(f'{prefix.upper()}_CACHE_SIZE', 2048)), ttl)
+
+def rate_limiter_from_env(prefix, limit=30, window=60):
+    # <PREFIJO>_RATE_LIMIT peticiones por ventana de <PREFIJO>_RATE_WINDOW segundos
+    limit = int(os.environ.get(f'{prefix.upper()}_RATE_LIMIT', limit))
+    window = int(os.environ.get(f'{prefix.upper()}_RATE_WINDOW', window))
+    url = os.environ.get('RESPONSE_CACHE_URL')
+    if url:
+        return SharedRateLimiter(_shared_client(url), limit, window, prefix=f'{prefix}:ratelimit')
+    return LocalRateLimiter(limit, window)
@@ -0,0 +1,109 @@
+import re
+
+from sqlalchemy import DDL, and_, column, event, func, literal_column, or_, table, text
+
+# Búsqueda de texto sobre trámites con una tabla virtual FTS5 de SQLite.
+# La tabla es de "contenido externo": solo guarda el índice y lee el texto de
+# tramite. Los triggers la mantienen sincronizada con cualquier escritura,
+# incluidas las sentencias masivas que no pasan por el ORM.
+
+FTS_TABLE = 'tramite_fts'
+# Columnas indexadas y su peso en el ranking bm25 (mismo orden)
+FTS_COLUMNS = ('numeroExpediente', 'dni', 'cups', 'refCatastral', 'nombreCliente', 'direccion')
+FTS_WEIGHTS = (10.0, 10.0, 8.0, 6.0, 4.0, 2.0)
+MAX_TERMS = 8
+
+fts_table = table(FTS_TABLE, column('rowid'))
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+def _columns(prefix=''):
+    return ', '.join(f'{prefix}"{name}"' for name in FTS_COLUMNS)
+
+def create_statements():
+    # remove_diacritics: "gestion" encuentra "Gestión"; prefix: índices para búsquedas
+    # por prefijo de 2 y 3 caracteres
+    return [
+        f'''CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            {_columns()}, content='tramite', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tramite BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {_columns()}) VALUES (new.id, {_columns('new.')});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tramite BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns()}) VALUES ('delete', old.id, {_columns('old.')});
+        END''',
+        # Solo cuando cambia una columna indexada: los cambios de estado no tocan el índice
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns()} ON tramite BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns()}) VALUES ('delete', old.id, {_columns('old.')});
+            INSERT INTO {FTS_TABLE}(rowid, {_columns()}) VALUES (new.id, {_columns('new.')});
+        END''',
+    ]
+
+REBUILD_STATEMENT = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+DROP_STATEMENT = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+
+def install(table):
+    """Crea y elimina el índice junto con la tabla tramite (db.create_all / drop_all)."""
+    for statement in create_statements():
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(table, 'before_drop', DDL(DROP_STATEMENT).execute_if(dialect='sqlite'))
+
+def is_supported(conn):
+    return conn.dialect.name == 'sqlite'
+
+def has_index(conn):
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': FTS_TABLE}).first() is not None
+
+def create_index(conn):
+    """Crea la tabla FTS y sus triggers si faltan e indexa las filas existentes."""
+    if not is_supported(conn) or has_index(conn):
+        return False
+    for statement in create_statements():
+        conn.execute(text(statement))
+    conn.execute(text(REBUILD_STATEMENT))
+    return True
+
+def search_terms(q):
+    return TERM_RE.findall(q or '')[:MAX_TERMS]
+
+def match_expression(terms):
+    # Cada término entre comillas (sin operadores FTS del usuario) y con prefijo;
+    # varios términos se combinan con AND
+    return ' '.join('"{}"*'.format(term.replace('"', '')) for term in terms)
+
+# Ordenar por relevancia obliga a puntuar todas las coincidencias; por encima de este
+# número (búsquedas muy genéricas como "ma") se ordena por id descendente, que FTS5
+# recorre en orden sin ordenar nada y corta en cuanto llena la página
+RANK_MAX_MATCHES = 2000
+
+def rank_results(conn, terms):
+    """True si la búsqueda tiene pocas coincidencias y merece ordenarse por relevancia."""
+    matches = conn.execute(
+        text(f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q LIMIT :limit)'),
+        {'q': match_expression(terms), 'limit': RANK_MAX_MATCHES + 1}).scalar()
+    return matches <= RANK_MAX_MATCHES
+
+def contains_pattern(term):
+    # Patrón LIKE que contiene el término tal cual, escapando sus comodines
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def apply_search(query, model, terms, dialect_name, by_rank=True):
+    """Filtra y ordena la consulta de trámites con los términos dados."""
+    if dialect_name == 'sqlite':
+        fts = literal_column(FTS_TABLE)
+        query = (query.join(fts_table, fts_table.c.rowid == model.id)
+                 .filter(fts.op('MATCH')(match_expression(terms))))
+        if by_rank:
+            return query.order_by(func.bm25(fts, *FTS_WEIGHTS), model.id.desc())
+        # Ordenar por el rowid de la tabla FTS (y no por tramite.id) permite a SQLite
+        # recorrer el índice en orden en lugar de ordenar todas las coincidencias
+        return query.order_by(fts_table.c.rowid.desc())
+
+    # Otros backends: coincidencia parcial por columnas, sin ranking. % y _ del
+    # término se buscan literalmente (EXP_2024 no debe encontrar EXP-2024)
+    conditions = [or_(*(getattr(model, name).ilike(contains_pattern(term), escape='\\') for name in FTS_COLUMNS))
+                  for term in terms]
+    return query.filter(and_(*conditions)).order_by(model.fecha.desc(), model.id.desc())
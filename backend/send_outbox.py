@@ -0,0 +1,7 @@
+# Procesa la bandeja de salida de correos en un proceso independiente
+# (usar junto con EMAIL_WORKER_MODE=process en los workers web)
+if __name__ == "__main__":
+    from app import create_app
+    from background import outbox_worker
+    create_app()
+    outbox_worker.run_forever()
@@ -0,0 +1,112 @@
+import json
+import os
+from operator import itemgetter
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el módulo json estándar
+    orjson = None
+
+# Serialización de respuestas JSON.
+#
+# - RowSerializer convierte filas de consultas por columnas (query.with_entities)
+#   en dicts sin hidratar objetos ORM, con las listas de campos precalculadas.
+# - jsonify sustituye a flask.jsonify y usa orjson si está instalado (JSON_BACKEND
+#   permite forzar 'orjson' o 'json'). Flask 2.0 no permite cambiar el proveedor JSON
+#   de la aplicación, así que la aplicación importa este jsonify en lugar del de Flask.
+
+
+def format_fecha(value):
+    # Equivale a strftime('%d/%m/%Y'), pero bastante más rápido por fila
+    return f'{value.day:02d}/{value.month:02d}/{value.year}' if value is not None else None
+
+def format_fecha_hora(value):
+    # Equivale a strftime('%Y-%m-%d %H:%M:%S')
+    if value is None:
+        return None
+    return (f'{value.year}-{value.month:02d}-{value.day:02d} '
+            f'{value.hour:02d}:{value.minute:02d}:{value.second:02d}')
+
+
+class RowSerializer:
+    """Convierte filas (tuplas en el orden de columns) en dicts para la API.
+
+    variants añade campos que solo se incluyen según el valor de variant_field
+    (p. ej. los campos específicos de cada tipo de trámite). Los nombres, el
+    extractor de columnas y los formatos se calculan una vez, no en cada fila.
+    """
+
+    def __init__(self, fields, formatters=None, variant_field=None, variants=None):
+        formatters = formatters or {}
+        variants = variants or {}
+        extra = [name for names in variants.values() for name in names if name not in fields]
+        self.columns = tuple(fields) + tuple(dict.fromkeys(extra))
+        index = {name: position for position, name in enumerate(self.columns)}
+
+        def plan(names):
+            # Nombres de salida, extractor de valores y formatos por posición de salida
+            positions = [index[name] for name in names]
+            getter = itemgetter(*positions) if len(positions) > 1 else (lambda row: (row[positions[0]],))
+            formatted = tuple((position, formatters[name]) for position, name in enumerate(names)
+                              if name in formatters)
+            return tuple(names), getter, formatted
+
+        self._base = plan(fields)
+        self._variants = {value: plan(tuple(fields) + tuple(names)) for value, names in variants.items()}
+        self._variant_index = index[variant_field] if variant_field else None
+
+    def __call__(self, row):
+        names, getter, formatted = self._base
+        if self._variant_index is not None:
+            names, getter, formatted = self._variants.get(row[self._variant_index], self._base)
+        values = getter(row)
+        if formatted:
+            values = list(values)
+            for position, formatter in formatted:
+                values[position] = formatter(values[position])
+        return dict(zip(names, values))
+
+    def many(self, rows):
+        return [self(row) for row in rows]
+
+
+def _backend():
+    name = os.environ.get('JSON_BACKEND', 'orjson' if orjson is not None else 'json').lower()
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_BACKEND=orjson requiere instalar orjson')
+    return name
+
+BACKEND = _backend()
+
+def _default(value):
+    # Tipos que ni orjson ni json saben serializar: se delega en el codificador de Flask
+    # (fechas en formato HTTP, UUID, objetos con __html__...)
+    return current_app.json_encoder().default(value)
+
+def dumps(data, indent=False, sort_keys=False):
+    """Serializa a bytes con el backend configurado."""
+    if BACKEND == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(data, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits y otros casos que orjson no admite
+            pass
+    return json.dumps(data, default=_default, indent=2 if indent else None, sort_keys=sort_keys,
+                      separators=None if indent else (',', ':'), ensure_ascii=False).encode('utf-8')
+
+def jsonify(*args, **kwargs):
+    """Igual que flask.jsonify (mismos argumentos y configuración), con el backend rápido."""
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    data = args[0] if len(args) == 1 else (list(args) if args else kwargs)
+    app = current_app
+    indent = app.config['JSONIFY_PRETTYPRINT_REGULAR'] or app.debug
+    body = dumps(data, indent=indent, sort_keys=app.config['JSON_SORT_KEYS'])
+    return app.response_class(body + b'\n', mimetype=app.config['JSONIFY_MIMETYPE'])
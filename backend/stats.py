@@ -0,0 +1,121 @@
+from collections import Counter
+
+from sqlalchemy import func, select
+
+# Resumen materializado de trámites para el panel: una fila por (dimensión, valor)
+# con el número de trámites. Se actualiza con deltas en la misma transacción que
+# cada alta, cambio o borrado, de modo que leerlo cuesta lo mismo con 100 o con
+# un millón de trámites.
+
+DIMENSIONS = ('estado', 'tipo', 'formulario', 'mes')
+# Los trámites archivados (archive.py) se cuentan aparte en la misma tabla, con las
+# mismas dimensiones precedidas de este prefijo (archivo.estado, archivo.mes...)
+ARCHIVE_PREFIX = 'archivo.'
+# Columnas de tramite de las que dependen las dimensiones
+SOURCE_COLUMNS = ('estado', 'tipo', 'formulario', 'fecha')
+
+def month(fecha):
+    return fecha.strftime('%Y-%m') if fecha else ''
+
+def row_keys(estado, tipo, formulario, fecha):
+    return [('estado', estado or ''), ('tipo', tipo or ''), ('formulario', formulario or ''),
+            ('mes', month(fecha))]
+
+def deltas_for_rows(rows, sign=1):
+    """Deltas para filas nuevas (sign=1) o borradas (sign=-1); rows son dicts de valores."""
+    deltas = Counter()
+    for row in rows:
+        for key in row_keys(row.get('estado'), row.get('tipo'), row.get('formulario'), row.get('fecha')):
+            deltas[key] += sign
+    return deltas
+
+def deltas_for_change(old, new):
+    """Deltas de una fila cuyos valores pasan de old a new (dicts con SOURCE_COLUMNS)."""
+    deltas = deltas_for_rows([old], -1)
+    deltas.update(deltas_for_rows([new]))
+    return deltas
+
+def archived(deltas):
+    """Los mismos deltas aplicados a las dimensiones de los trámites archivados."""
+    return Counter({(ARCHIVE_PREFIX + dimension, valor): delta for (dimension, valor), delta in deltas.items()})
+
+def _upsert_statement(conn, table):
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update(total=table.c.total + stmt.inserted.total)
+    else:
+        return None
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(index_elements=['dimension', 'valor'],
+                                      set_={'total': table.c.total + stmt.excluded.total})
+
+def apply_deltas(conn, table, deltas):
+    """Suma los deltas {(dimensión, valor): n} al resumen con un único upsert."""
+    rows = [{'dimension': dimension, 'valor': valor, 'total': delta}
+            for (dimension, valor), delta in deltas.items() if delta]
+    if not rows:
+        return
+    stmt = _upsert_statement(conn, table)
+    if stmt is not None:
+        conn.execute(stmt, rows)
+        return
+    # Backends sin upsert: UPDATE y, si la fila no existía, INSERT
+    for row in rows:
+        updated = conn.execute(
+            table.update()
+            .where(table.c.dimension == row['dimension'], table.c.valor == row['valor'])
+            .values(total=table.c.total + row['total'])).rowcount
+        if not updated:
+            conn.execute(table.insert(), row)
+
+def group_deltas(conn, source, column, where, new_value):
+    """Deltas de un UPDATE masivo que asigna new_value a column en las filas de where.
+
+    Hace una sola consulta GROUP BY sobre los valores actuales; debe llamarse
+    antes de ejecutar el UPDATE.
+    """
+    deltas = Counter()
+    for old_value, count in conn.execute(
+            select(source.c[column], func.count()).where(where).group_by(source.c[column])):
+        deltas[(column, old_value or '')] -= count
+        deltas[(column, new_value or '')] += count
+    return deltas
+
+def count_rows(conn, source):
+    """Deltas de todas las filas de source calculados con GROUP BY."""
+    deltas = Counter()
+    for dimension in ('estado', 'tipo', 'formulario'):
+        column = source.c[dimension]
+        for value, count in conn.execute(select(column, func.count()).group_by(column)):
+            deltas[(dimension, value or '')] += count
+    # El mes se agrupa en Python para no depender de funciones de fecha de cada backend
+    for (fecha,) in conn.execute(select(source.c.fecha)):
+        deltas[('mes', month(fecha))] += 1
+    return deltas
+
+def rebuild(conn, table, source, archive=None):
+    """Recalcula el resumen completo a partir de tramite (y de tramite_archive si se indica)."""
+    deltas = count_rows(conn, source)
+    if archive is not None:
+        deltas.update(archived(count_rows(conn, archive)))
+    conn.execute(table.delete())
+    apply_deltas(conn, table, deltas)
+
+def read(conn, table, prefix=''):
+    """Devuelve {'total': n, 'estado': {...}, 'tipo': {...}, 'formulario': {...}, 'mes': {...}}.
+
+    Con prefix=ARCHIVE_PREFIX, el resumen de los trámites archivados.
+    """
+    summary = {dimension: {} for dimension in DIMENSIONS}
+    for dimension, valor, total in conn.execute(
+            select(table.c.dimension, table.c.valor, table.c.total).where(table.c.total > 0)):
+        if dimension.startswith(prefix) and dimension[len(prefix):] in summary:
+            summary[dimension[len(prefix):]][valor] = total
+    summary['mes'] = dict(sorted(summary['mes'].items()))
+    return {'total': sum(summary['estado'].values()), **summary}
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from collections import namedtuple
+from functools import lru_cache
+
+from flask import Request
+
+CHUNK_SIZE = 64 * 1024
+
+# Nombre con el que se guarda un documento en la base de datos: <sha256>_<nombre original>
+STORED_NAME_RE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?:_(?P<original>.+))?$')
+
+StoredFile = namedtuple('StoredFile', ['name', 'digest', 'size', 'path', 'deduplicated'])
+
+
+@lru_cache(maxsize=4096)
+def file_sha256(path, mtime_ns, size):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def digest_from_name(name):
+    # Hash incluido en el nombre de los ficheros direccionados por contenido (None en los antiguos)
+    match = STORED_NAME_RE.match(os.path.splitext(name)[0])
+    return match.group('digest') if match else None
+
+
+class HashingTempFile:
+    """Fichero temporal que calcula el SHA-256 a medida que se escribe.
+
+    Werkzeug escribe aquí cada trozo del cuerpo multipart según lo va leyendo,
+    de modo que el fichero nunca se mantiene entero en memoria y el hash está
+    listo al terminar el parseo. Si no se llega a guardar, se borra al cerrarse.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self.path = self._file.name
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self.persisted = False
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def close(self):
+        self._file.close()
+        if not self.persisted and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class ContentStore:
+    """Almacén de ficheros direccionado por contenido.
+
+    Cada fichero se guarda una sola vez en <root>/<ab>/<cd>/<sha256><ext>, así
+    que subir el mismo PDF varias veces no ocupa más disco ni vuelve a escribirse.
+    Los nombres antiguos (<timestamp>_<nombre>) siguen resolviéndose en la raíz.
+    """
+
+    def __init__(self, root, extension='.pdf', shard_levels=2, shard_width=2):
+        self.root = root
+        self.extension = extension
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+        self.tmp_dir = os.path.join(root, '.tmp')
+
+    def relative_path_for_digest(self, digest):
+        shards = [digest[i * self.shard_width:(i + 1) * self.shard_width] for i in range(self.shard_levels)]
+        return os.path.join(*shards, digest + self.extension)
+
+    def relative_path(self, name):
+        match = STORED_NAME_RE.match(os.path.splitext(name)[0])
+        if match:
+            return self.relative_path_for_digest(match.group('digest'))
+        return name
+
+    def download_name(self, name):
+        match = STORED_NAME_RE.match(os.path.splitext(name)[0])
+        if match and match.group('original'):
+            return match.group('original') + os.path.splitext(name)[1]
+        return name
+
+    def digest(self, relative):
+        # Los ficheros direccionados por contenido ya llevan su hash en el nombre;
+        # para los antiguos se calcula una vez por (ruta, mtime, tamaño)
+        match = STORED_NAME_RE.match(os.path.splitext(os.path.basename(relative))[0])
+        if match:
+            return match.group('digest')
+        stat = os.stat(os.path.join(self.root, relative))
+        return file_sha256(os.path.join(self.root, relative), stat.st_mtime_ns, stat.st_size)
+
+    def new_temp_file(self):
+        return HashingTempFile(self.tmp_dir)
+
+    def _commit(self, temp, original_name):
+        digest = temp.hexdigest()
+        relative = self.relative_path_for_digest(digest)
+        target = os.path.join(self.root, relative)
+        try:
+            # Se renueva el mtime del fichero existente para que el recolector de
+            # huérfanos (file_refs.py) no lo borre antes de que se confirme su referencia
+            os.utime(target)
+            deduplicated = True
+        except FileNotFoundError:
+            deduplicated = False
+        if not deduplicated:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Renombrar dentro del mismo sistema de ficheros no vuelve a copiar los datos
+            os.replace(temp.path, target)
+            temp.persisted = True
+        temp.close()
+        name = f'{digest}_{original_name}' if original_name else digest + self.extension
+        return StoredFile(name, digest, temp.size, relative, deduplicated)
+
+    def save(self, file_storage, original_name):
+        stream = file_storage.stream
+        if isinstance(stream, HashingTempFile):
+            stream.flush()
+            return self._commit(stream, original_name)
+        return self.save_stream(stream, original_name)
+
+    def save_stream(self, stream, original_name):
+        # Flujos que no pasaron por UploadRequest: se copian por trozos calculando el hash
+        temp = self.new_temp_file()
+        try:
+            shutil.copyfileobj(stream, temp, CHUNK_SIZE)
+            temp.flush()
+        except Exception:
+            temp.close()
+            raise
+        return self._commit(temp, original_name)
+
+
+class UploadRequest(Request):
+    # Los ficheros de un multipart se escriben directamente en el almacén temporal
+    upload_store = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_store is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return self.upload_store.new_temp_file()
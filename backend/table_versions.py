@@ -0,0 +1,75 @@
+import datetime
+import hashlib
+
+from flask import Response
+from sqlalchemy import select
+
+# Versión de cambios por tabla para las respuestas condicionales de los listados.
+# Cada alta, cambio o borrado incrementa la versión de su tabla en la misma
+# transacción; un cliente que repite la petición con el ETag recibido obtiene
+# 304 Not Modified con una sola lectura de table_versions.
+
+TRACKED_TABLES = ('tramite', 'solicitud', 'tramite_archive')
+
+def now():
+    return datetime.datetime.utcnow()
+
+def bump(conn, table, name):
+    """Incrementa la versión de la tabla name (crea la fila si no existe)."""
+    updated = conn.execute(
+        table.update().where(table.c.tabla == name)
+        .values(version=table.c.version + 1, updated_at=now())).rowcount
+    if not updated:
+        conn.execute(table.insert(), {'tabla': name, 'version': 1, 'updated_at': now()})
+
+def seed(conn, table):
+    """Crea las filas que falten con versión 0 (bases nuevas o anteriores a la tabla)."""
+    existing = {row[0] for row in conn.execute(select(table.c.tabla))}
+    rows = [{'tabla': name, 'version': 0, 'updated_at': now()} for name in TRACKED_TABLES if name not in existing]
+    if rows:
+        conn.execute(table.insert(), rows)
+
+def read(conn, table, name):
+    """Devuelve (versión, updated_at) de la tabla, o (None, None) si no se controla."""
+    row = conn.execute(select(table.c.version, table.c.updated_at).where(table.c.tabla == name)).first()
+    return (row[0], row[1]) if row else (None, None)
+
+def etag_for(name, version, updated_at, *scope):
+    # updated_at distingue versiones con el mismo número tras recrear la tabla
+    # (reset_db); scope son los parámetros de la petición y el usuario
+    digest = hashlib.sha1(repr((updated_at.isoformat(), scope)).encode('utf-8')).hexdigest()[:16]
+    return f'{name}-{version}-{digest}'
+
+def list_validators(conn, table, name, request, user_id):
+    """ETag y Last-Modified de un listado: versión de la tabla más la URL y el usuario.
+
+    Se leen antes que los datos, así un cambio concurrente solo puede dejar un ETag
+    más antiguo que la respuesta (y el siguiente sondeo la vuelve a descargar).
+    """
+    version, updated_at = read(conn, table, name)
+    if version is None:
+        return None, None
+    args = sorted((key, value) for key, value in request.args.items(multi=True) if key != 'token')
+    return etag_for(name, version, updated_at, request.path, args, user_id), updated_at
+
+def not_modified(request, etag):
+    """True si el If-None-Match de la petición coincide con la versión actual.
+
+    If-Modified-Since no se tiene en cuenta: su resolución es de segundos y un
+    cambio confirmado en el mismo segundo que la respuesta anterior daría un 304
+    con datos antiguos. El ETag, en cambio, es distinto en cada versión.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return False
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    # Datos de cada usuario: solo en la caché del navegador y revalidando siempre
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified_response(etag, last_modified):
+    return set_validators(Response(status=304), etag, last_modified)
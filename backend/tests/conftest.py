@@ -0,0 +1,55 @@
+import datetime
+import os
+import sys
+import tempfile
+
+import jwt
+import pytest
+
+# Los módulos del backend se importan como en la aplicación (desde backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# La configuración se lee del entorno al importar config.py: las pruebas usan un
+# directorio temporal, sin log en fichero ni hilos de fondo en los workers web
+_tmpdir = tempfile.mkdtemp(prefix='tramites-tests-')
+os.environ.update({
+    'DATABASE_URI': 'sqlite:///' + os.path.join(_tmpdir, 'tramites.db'),
+    'UPLOAD_FOLDER': os.path.join(_tmpdir, 'uploads'),
+    'LOG_FILE': '',
+    'EMAIL_WORKER_MODE': 'process',
+    'DOCUMENT_WORKER_MODE': 'process',
+    'JWT_SECRET': 'clave-de-pruebas',
+})
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    from extensions import db
+    from models import init_schema
+
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'tramites.db'))
+    with app.app_context():
+        init_schema()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.get_engine().dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers(app):
+    # Token como el que devuelve /api/login, sin pasar por el hash de la contraseña
+    from extensions import db
+    from models import User
+
+    with app.app_context():
+        user = User(name='Gestor', email='gestor@example.com', password='-')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,89 @@
+import pytest
+
+import metrics
+import response_cache
+from api import consulta
+from extensions import db
+from models import Tramite
+
+URL = '/api/expedientes/consulta'
+
+@pytest.fixture(autouse=True)
+def consulta_state(monkeypatch):
+    # La caché y el límite son del módulo: cada prueba parte de unos vacíos
+    monkeypatch.setattr(consulta, 'consulta_cache', response_cache.LocalResponseCache(ttl=30))
+    monkeypatch.setattr(consulta, 'consulta_limiter', response_cache.LocalRateLimiter(limit=100, window=60))
+
+def create_tramite(app):
+    # Del usuario de auth_headers (el primero de la base)
+    with app.app_context():
+        tramite = Tramite(numeroExpediente='EXP-1', tipo='Alta', nombreCliente='Ana', dni='1', email='ana@example.com',
+                          telefonoMovil='600000000', cups='ES0001', direccion='Calle 1', refCatastral='RC1',
+                          potenciaNumerica='5', estado='Pendiente', user_id=1)
+        db.session.add(tramite)
+        db.session.commit()
+        return tramite.id
+
+@pytest.fixture
+def tramite_id(app, auth_headers):
+    return create_tramite(app)
+
+def rate_limited_count(route):
+    return metrics.RATE_LIMITED._values.get(metrics.RATE_LIMITED._key({'route': route}), 0)
+
+def consultar(client, valor='EXP-1', tipo='expediente'):
+    return client.get(URL, query_string={'tipo': tipo, 'valor': valor})
+
+def test_second_query_is_served_from_cache(client, tramite_id):
+    first = consultar(client)
+    assert (first.status_code, first.headers['X-Cache']) == (200, 'MISS')
+
+    second = consultar(client)
+    assert (second.status_code, second.headers['X-Cache']) == (200, 'HIT')
+    assert second.get_json() == first.get_json()
+    assert consulta.consulta_cache.stats()['hits'] == 1
+
+def test_patch_invalidates_cached_consulta(client, auth_headers, tramite_id):
+    assert consultar(client).get_json()['estado'] == 'Pendiente'
+
+    response = client.patch(f'/api/tramites/{tramite_id}', json={'estado': 'Finalizado', 'numeroExpediente': 'EXP-2'},
+                            headers=auth_headers)
+    assert response.status_code == 200
+
+    updated = consultar(client, 'EXP-2')
+    assert (updated.headers['X-Cache'], updated.get_json()['estado']) == ('MISS', 'Finalizado')
+    # La clave con el valor anterior también se invalida
+    old = consultar(client, 'EXP-1')
+    assert (old.status_code, old.headers['X-Cache']) == (404, 'MISS')
+
+def test_delete_invalidates_cached_consulta(client, auth_headers, tramite_id):
+    assert consultar(client, 'ana@example.com', 'email').status_code == 200
+
+    assert client.delete(f'/api/tramites/{tramite_id}', headers=auth_headers).status_code == 200
+
+    response = consultar(client, 'ana@example.com', 'email')
+    assert (response.status_code, response.headers['X-Cache']) == (404, 'MISS')
+
+def test_not_found_is_invalidated_when_the_tramite_is_created(app, client, auth_headers):
+    assert consultar(client).status_code == 404
+    assert consultar(client).headers['X-Cache'] == 'HIT'
+
+    create_tramite(app)
+
+    response = consultar(client)
+    assert (response.status_code, response.headers['X-Cache']) == (200, 'MISS')
+
+def test_rate_limit_per_ip_returns_429_with_retry_after(monkeypatch, client, tramite_id):
+    monkeypatch.setattr(consulta, 'consulta_limiter', response_cache.LocalRateLimiter(limit=2, window=60))
+    before = rate_limited_count(URL)
+
+    assert [consultar(client).status_code for _ in range(2)] == [200, 200]
+    limited = consultar(client)
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers['Retry-After']) <= 60
+    assert rate_limited_count(URL) == before + 1
+
+    # Otra IP tiene su propio contador
+    other = client.get(URL, query_string={'tipo': 'expediente', 'valor': 'EXP-1'},
+                       environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 200
@@ -0,0 +1,138 @@
+import datetime
+
+import notifications
+from extensions import db
+from models import EmailOutbox
+
+class FlakyTransport(notifications.MemoryTransport):
+    # MemoryTransport que falla los primeros lotes y anota el tamaño de cada lote
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.batches.append(len(messages))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('Conexión rechazada')
+        return super().send_batch(messages)
+
+def make_worker(app, transport, **options):
+    options.setdefault('batch_size', 50)
+    return notifications.OutboxWorker(app, db, EmailOutbox, transport_factory=lambda: transport, **options)
+
+def enqueue(app, count=1):
+    with app.app_context():
+        for n in range(count):
+            db.session.add(EmailOutbox(to_email=f'cliente{n}@example.com', subject='Asunto',
+                                       html_content='<p>Hola</p>'))
+        db.session.commit()
+
+def outbox_rows(app):
+    with app.app_context():
+        rows = EmailOutbox.query.order_by(EmailOutbox.id).all()
+        db.session.expunge_all()
+        return rows
+
+def make_due(app):
+    # Adelanta el reloj: todos los mensajes pasan a estar vencidos
+    with app.app_context():
+        EmailOutbox.query.update({'next_attempt_at': datetime.datetime.utcnow() - datetime.timedelta(seconds=1)})
+        db.session.commit()
+
+def test_sends_pending_messages_in_batches(app):
+    enqueue(app, 5)
+    transport = FlakyTransport()
+    worker = make_worker(app, transport, batch_size=2)
+
+    assert [worker.process_batch() for _ in range(4)] == [2, 2, 1, 0]
+    assert transport.batches == [2, 2, 1]
+    assert sorted(message.to_email for message in transport.sent) == [f'cliente{n}@example.com' for n in range(5)]
+    for row in outbox_rows(app):
+        assert (row.estado, row.attempts, row.last_error) == (notifications.ENVIADO, 1, None)
+        assert row.sent_at is not None
+
+def test_transport_failure_retries_with_backoff(app):
+    enqueue(app)
+    transport = FlakyTransport(failures=1)
+    worker = make_worker(app, transport, backoff_base=30)
+
+    before = datetime.datetime.utcnow()
+    assert worker.process_batch() == 1
+    [row] = outbox_rows(app)
+    assert (row.estado, row.attempts) == (notifications.PENDIENTE, 1)
+    assert 'Conexión rechazada' in row.last_error
+    assert before + datetime.timedelta(seconds=30) <= row.next_attempt_at
+    assert row.next_attempt_at <= datetime.datetime.utcnow() + datetime.timedelta(seconds=30)
+
+    # No se reintenta antes de que venza la espera
+    assert worker.process_batch() == 0
+
+    make_due(app)
+    assert worker.process_batch() == 1
+    [row] = outbox_rows(app)
+    assert (row.estado, row.attempts, row.last_error) == (notifications.ENVIADO, 2, None)
+    assert len(transport.sent) == 1
+
+def test_backoff_grows_exponentially_up_to_the_maximum(app):
+    worker = make_worker(app, FlakyTransport(), backoff_base=30, backoff_max=100)
+    assert [worker.backoff(attempts) for attempts in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+def test_gives_up_after_max_attempts(app):
+    enqueue(app)
+    worker = make_worker(app, FlakyTransport(failures=2), max_attempts=2, backoff_base=0)
+
+    assert worker.process_batch() == 1
+    make_due(app)
+    assert worker.process_batch() == 1
+    [row] = outbox_rows(app)
+    assert (row.estado, row.attempts) == (notifications.FALLIDO, 2)
+    assert worker.process_batch() == 0
+
+def test_transport_factory_error_counts_attempt_until_failed(app):
+    def broken_factory():
+        raise ValueError('Falta SENDGRID_API_KEY')
+
+    enqueue(app)
+    worker = notifications.OutboxWorker(app, db, EmailOutbox, transport_factory=broken_factory,
+                                        max_attempts=2, backoff_base=0)
+
+    assert worker.process_batch() == 1
+    [row] = outbox_rows(app)
+    assert (row.estado, row.attempts) == (notifications.PENDIENTE, 1)
+    assert 'SENDGRID_API_KEY' in row.last_error
+
+    assert worker.process_batch() == 1
+    [row] = outbox_rows(app)
+    assert (row.estado, row.attempts) == (notifications.FALLIDO, 2)
+
+def test_claimed_messages_are_leased_until_released(app):
+    enqueue(app)
+    crashed = make_worker(app, FlakyTransport(), lease=300)
+    other = make_worker(app, FlakyTransport())
+
+    # Un proceso reclama el mensaje y muere antes de enviarlo
+    with app.app_context():
+        [claimed] = crashed.claim(datetime.datetime.utcnow())
+        assert claimed.estado == notifications.ENVIANDO
+        db.session.remove()
+
+    # Mientras dura la reserva ningún otro proceso lo toma
+    assert other.process_batch() == 0
+
+    # Vencida la reserva otro proceso lo recupera y lo envía
+    make_due(app)
+    assert other.process_batch() == 1
+    [row] = outbox_rows(app)
+    assert (row.estado, row.attempts) == (notifications.ENVIADO, 1)
+
+def test_failed_send_releases_the_lease(app):
+    enqueue(app)
+    worker = make_worker(app, FlakyTransport(failures=1), lease=300, backoff_base=5)
+
+    assert worker.process_batch() == 1
+    [row] = outbox_rows(app)
+    # El mensaje vuelve a pendiente con la espera del reintento, no con la de la reserva
+    assert row.estado == notifications.PENDIENTE
+    assert row.next_attempt_at <= datetime.datetime.utcnow() + datetime.timedelta(seconds=5)
@@ -0,0 +1,28 @@
+import search
+from extensions import db
+from models import Tramite
+
+def add_tramites(app, *expedientes):
+    with app.app_context():
+        for n, expediente in enumerate(expedientes):
+            db.session.add(Tramite(numeroExpediente=expediente, tipo='Alta', nombreCliente='Cliente', dni=str(n),
+                                   email=f'cliente{n}@example.com', telefonoMovil='600000000', cups='ES0001',
+                                   direccion='Calle 1', refCatastral='RC1', potenciaNumerica='5', user_id=1))
+        db.session.commit()
+
+def fallback_search(app, term):
+    # La rama sin FTS5 (PostgreSQL, MySQL) sobre la misma base de pruebas
+    with app.app_context():
+        query = search.apply_search(Tramite.query, Tramite, [term], 'postgresql')
+        return sorted(tramite.numeroExpediente for tramite in query)
+
+def test_fallback_matches_wildcards_literally(app, auth_headers):
+    add_tramites(app, 'EXP_2024', 'EXPA2024', 'EXP-2024', '50%_DTO', '50XXDTO', 'C:\\EXP')
+
+    assert fallback_search(app, 'EXP_2024') == ['EXP_2024']
+    assert fallback_search(app, '%') == ['50%_DTO']
+    assert fallback_search(app, '\\') == ['C:\\EXP']
+    assert fallback_search(app, 'exp') == ['C:\\EXP', 'EXP-2024', 'EXPA2024', 'EXP_2024']
+
+def test_contains_pattern_escapes_like_wildcards():
+    assert search.contains_pattern('a%b_c\\d') == '%a\\%b\\_c\\\\d%'
@@ -1,4 +1,8 @@
-from app import app
+# Punto de entrada WSGI para producción: gunicorn -c gunicorn.conf.py wsgi:app
+# Las tablas se crean antes con `flask init-db` (ver Dockerfile)
+from app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
-    app.run() 
\ No newline at end of file
+    app.run()
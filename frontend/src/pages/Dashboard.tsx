@@ -1,4 +1,4 @@
-import { useEffect, useState, useMemo } from 'react';
+import { useEffect, useState, useMemo, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Button, Table, Form, Badge, Spinner, Card, Modal, Row, Col, Pagination, InputGroup } from 'react-bootstrap';
 import { Container } from 'react-bootstrap';
@@ -30,11 +30,15 @@ interface Tramite {
   acometidaCentralizada?: boolean;
 }
 
+// Trámites por petición al backend; las páginas siguientes se piden con "Cargar más"
+const PAGE_SIZE = 100;
+
 const Dashboard = () => {
   const [userName, setUserName] = useState('');
   const [tramites, setTramites] = useState<Tramite[]>([]);
-  const [filteredTramites, setFilteredTramites] = useState<Tramite[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
   const [showModal, setShowModal] = useState(false);
   const [showDeleteModal, setShowDeleteModal] = useState(false);
@@ -57,6 +61,11 @@ const Dashboard = () => {
   const [itemsPerPage, setItemsPerPage] = useState(20);
   const [advancedSearch, setAdvancedSearch] = useState(false);
   const [filterEstado, setFilterEstado] = useState<string>('');
+  const [filterTipo, setFilterTipo] = useState<string>('');
+  const [fechaDesde, setFechaDesde] = useState<string>('');
+  const [fechaHasta, setFechaHasta] = useState<string>('');
+  // Identifica la última petición para descartar respuestas de filtros anteriores
+  const requestId = useRef(0);
   const navigate = useNavigate();
 
   // Efecto para registrar información del trámite seleccionado
@@ -101,77 +110,101 @@ const Dashboard = () => {
       }
     };
 
-    // Obtener los trámites desde el backend
-    const fetchTramites = async () => {
-      setLoading(true);
-      try {
-        const response = await fetch(`${API_URL}/tramites`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        
-        if (response.ok) {
-          const data = await response.json();
-          console.log('Trámites recibidos del backend:', data);
-          setTramites(data);
-        } else {
-          setError('Error al cargar los trámites. Por favor, inténtelo de nuevo.');
-        }
-      } catch (error) {
-        console.error('Error al obtener trámites:', error);
-        setError('Error de conexión con el servidor');
-      } finally {
-        setLoading(false);
-      }
-    };
-
     fetchUserData();
-    fetchTramites();
   }, [navigate]);
 
-  // Efecto para aplicar filtros
-  useEffect(() => {
-    let results = tramites;
-    
-    // Filtrar por número de expediente
-    if (searchExpediente) {
-      results = results.filter(tramite => 
-        tramite.numeroExpediente?.toLowerCase().includes(searchExpediente.toLowerCase())
-      );
+  const searchText = [searchExpediente, searchNombre, searchCUPS].map(text => text.trim()).filter(Boolean).join(' ');
+  const hasFilters = Boolean(searchText || filterEstado || filterTipo || fechaDesde || fechaHasta);
+
+  // Obtener una página de trámites desde el backend. Los filtros se aplican en el
+  // servidor: estado, tipo y fechas en el listado y los textos con /tramites/search
+  const fetchTramites = useCallback(async (cursor: string | null) => {
+    const token = localStorage.getItem('token');
+    if (!token) {
+      return;
     }
-    
-    // Filtrar por nombre de cliente
-    if (searchNombre) {
-      results = results.filter(tramite => 
-        tramite.nombreCliente?.toLowerCase().includes(searchNombre.toLowerCase())
-      );
+    const current = ++requestId.current;
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
     }
-    
-    // Filtrar por CUPS
-    if (searchCUPS) {
-      results = results.filter(tramite => 
-        tramite.cups?.toLowerCase().includes(searchCUPS.toLowerCase())
-      );
+    try {
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (searchText) {
+        params.set('q', searchText);
+      }
+      if (filterEstado) {
+        params.set('estado', filterEstado);
+      }
+      if (filterTipo) {
+        params.set('tipo', filterTipo);
+      }
+      if (fechaDesde) {
+        params.set('fecha_desde', fechaDesde);
+      }
+      if (fechaHasta) {
+        params.set('fecha_hasta', fechaHasta);
+      }
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const path = searchText ? 'tramites/search' : 'tramites';
+      const response = await fetch(`${API_URL}/${path}?${params.toString()}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      });
+
+      if (current !== requestId.current) {
+        return;
+      }
+      if (!response.ok) {
+        setError('Error al cargar los trámites. Por favor, inténtelo de nuevo.');
+        return;
+      }
+      const data: Tramite[] = await response.json();
+      if (current !== requestId.current) {
+        return;
+      }
+      setError('');
+      setTramites(previous => cursor ? [...previous, ...data] : data);
+      setNextCursor(response.headers.get('X-Next-Cursor'));
+    } catch (error) {
+      console.error('Error al obtener trámites:', error);
+      setError('Error de conexión con el servidor');
+    } finally {
+      if (current === requestId.current) {
+        setLoading(false);
+        setLoadingMore(false);
+      }
     }
-    
-    // Filtrar por estado
-    if (filterEstado) {
-      results = results.filter(tramite => tramite.estado === filterEstado);
+  }, [searchText, filterEstado, filterTipo, fechaDesde, fechaHasta]);
+
+  // Primera página al entrar y cada vez que cambian los filtros (con los textos se
+  // espera a que el usuario deje de escribir para no buscar en cada tecla)
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setCurrentPage(1);
+      fetchTramites(null);
+    }, searchText ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [fetchTramites, searchText]);
+
+  const loadMore = () => {
+    if (nextCursor && !loadingMore) {
+      fetchTramites(nextCursor);
     }
-    
-    setFilteredTramites(results);
-    setCurrentPage(1); // Regresar a la primera página después de aplicar filtros
-  }, [tramites, searchExpediente, searchNombre, searchCUPS, filterEstado]);
+  };
 
   // Cálculo de páginas y elementos a mostrar
-  const totalPages = Math.ceil(filteredTramites.length / itemsPerPage);
+  const totalPages = Math.ceil(tramites.length / itemsPerPage);
   
   const currentTramites = useMemo(() => {
     const indexOfLastItem = currentPage * itemsPerPage;
     const indexOfFirstItem = indexOfLastItem - itemsPerPage;
-    return filteredTramites.slice(indexOfFirstItem, indexOfLastItem);
-  }, [filteredTramites, currentPage, itemsPerPage]);
+    return tramites.slice(indexOfFirstItem, indexOfLastItem);
+  }, [tramites, currentPage, itemsPerPage]);
 
   // Navegación por páginas
   const paginate = (pageNumber: number) => setCurrentPage(pageNumber);
@@ -214,6 +247,9 @@ const Dashboard = () => {
     setSearchNombre('');
     setSearchCUPS('');
     setFilterEstado('');
+    setFilterTipo('');
+    setFechaDesde('');
+    setFechaHasta('');
     setAdvancedSearch(false);
   };
 
@@ -561,7 +597,7 @@ const Dashboard = () => {
                 >
                   {advancedSearch ? "Búsqueda simple" : "Búsqueda avanzada"}
                 </Button>
-                {(searchExpediente || searchNombre || searchCUPS || filterEstado) && (
+                {hasFilters && (
                   <Button 
                     variant="outline-secondary" 
                     onClick={resetFilters}
@@ -628,6 +664,40 @@ const Dashboard = () => {
                 </Form.Select>
               </Form.Group>
             </Col>
+            <Col md={4} className="mt-3">
+              <Form.Group>
+                <Form.Label>Tipo</Form.Label>
+                <Form.Select
+                  value={filterTipo}
+                  onChange={(e) => setFilterTipo(e.target.value)}
+                >
+                  <option value="">Todos los tipos</option>
+                  <option value="Alta">Alta</option>
+                  <option value="Modificación">Modificación</option>
+                  <option value="Individual">Individual</option>
+                </Form.Select>
+              </Form.Group>
+            </Col>
+            <Col md={4} className="mt-3">
+              <Form.Group>
+                <Form.Label>Desde</Form.Label>
+                <Form.Control
+                  type="date"
+                  value={fechaDesde}
+                  onChange={e => setFechaDesde(e.target.value)}
+                />
+              </Form.Group>
+            </Col>
+            <Col md={4} className="mt-3">
+              <Form.Group>
+                <Form.Label>Hasta</Form.Label>
+                <Form.Control
+                  type="date"
+                  value={fechaHasta}
+                  onChange={e => setFechaHasta(e.target.value)}
+                />
+              </Form.Group>
+            </Col>
           </Row>
         )}
 
@@ -647,7 +717,7 @@ const Dashboard = () => {
                 <div className="d-flex align-items-center">
                   <span className="me-3">
                     <Badge bg="primary" pill>
-                      {filteredTramites.length} {filteredTramites.length === 1 ? 'registro' : 'registros'}
+                      {tramites.length}{nextCursor ? '+' : ''} {tramites.length === 1 && !nextCursor ? 'registro' : 'registros'}
                     </Badge>
                   </span>
                   <Form.Select 
@@ -671,9 +741,9 @@ const Dashboard = () => {
                     </Spinner>
                     <p className="mt-3 text-muted">Cargando trámites...</p>
                   </div>
-                ) : filteredTramites.length === 0 ? (
+                ) : tramites.length === 0 ? (
                   <div className="alert alert-info m-3">
-                    <p className="mb-0">No hay trámites que coincidan con los criterios de búsqueda. {searchExpediente || searchNombre || searchCUPS || filterEstado ? <Button variant="link" onClick={resetFilters} className="p-0">Limpiar filtros</Button> : 'Use el botón "Solicitud Expediente" para crear uno nuevo.'}</p>
+                    <p className="mb-0">No hay trámites que coincidan con los criterios de búsqueda. {hasFilters ? <Button variant="link" onClick={resetFilters} className="p-0">Limpiar filtros</Button> : 'Use el botón "Solicitud Expediente" para crear uno nuevo.'}</p>
                   </div>
                 ) : (
                   <div className="table-responsive">
@@ -809,14 +879,27 @@ const Dashboard = () => {
                     </Table>
                   </div>
                 )}
-                {filteredTramites.length > 0 && (
+                {!loading && tramites.length > 0 && (
                   <div className="d-flex justify-content-between align-items-center p-3 border-top">
                     <div>
-                      Mostrando {(currentPage - 1) * itemsPerPage + 1} a {Math.min(currentPage * itemsPerPage, filteredTramites.length)} de {filteredTramites.length} trámites
+                      Mostrando {(currentPage - 1) * itemsPerPage + 1} a {Math.min(currentPage * itemsPerPage, tramites.length)} de {tramites.length}{nextCursor ? '+' : ''} trámites
+                    </div>
+                    <div className="d-flex align-items-center">
+                      {nextCursor && (
+                        <Button
+                          variant="outline-primary"
+                          size="sm"
+                          className="me-3"
+                          onClick={loadMore}
+                          disabled={loadingMore}
+                        >
+                          {loadingMore ? <Spinner animation="border" size="sm" /> : 'Cargar más'}
+                        </Button>
+                      )}
+                      <Pagination className="mb-0">
+                        {paginationItems}
+                      </Pagination>
                     </div>
-                    <Pagination className="mb-0">
-                      {paginationItems}
-                    </Pagination>
                   </div>
                 )}
               </Card.Body>